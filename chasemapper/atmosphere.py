@@ -6,6 +6,39 @@
 # 	Released under GNU GPL v3 or later
 #
 import math
+import numpy as np
+
+# Atmosphere model constants
+AIR_MOL_WEIGHT = 28.9644  # Molecular weight of air
+DENSITY_SL = 1.225  # Density at sea level [kg/m3]
+PRESSURE_SL = 101325  # Pressure at sea level [Pa]
+TEMPERATURE_SL = 288.15  # Temperature at sea level [deg K]
+GAMMA = 1.4
+GRAVITY = 9.80665  # Acceleration of gravity [m/s2]
+R_GAS = 8.31432  # Gas constant [kg/Mol/K]
+R_AIR = 287.053
+GMR = GRAVITY * AIR_MOL_WEIGHT / R_GAS
+
+# Lookup Tables
+LAYER_ALTITUDES = [0, 11000, 20000, 32000, 47000, 51000, 71000, 84852]
+LAYER_PRESSURE_RELS = [
+    1,
+    2.23361105092158e-1,
+    5.403295010784876e-2,
+    8.566678359291667e-3,
+    1.0945601337771144e-3,
+    6.606353132858367e-4,
+    3.904683373343926e-5,
+    3.6850095235747942e-6,
+]
+LAYER_TEMPERATURES = [288.15, 216.65, 216.65, 228.65, 270.65, 270.65, 214.65, 186.946]
+LAYER_TEMP_GRADS = [-6.5, 0, 1, 2.8, 0, -2.8, -2, 0]
+
+# Numpy copies of the lookup tables, for use by the array functions.
+_LAYER_ALTITUDES_NP = np.array(LAYER_ALTITUDES, dtype=np.float64)
+_LAYER_PRESSURE_RELS_NP = np.array(LAYER_PRESSURE_RELS, dtype=np.float64)
+_LAYER_TEMPERATURES_NP = np.array(LAYER_TEMPERATURES, dtype=np.float64)
+_LAYER_TEMP_GRADS_NP = np.array(LAYER_TEMP_GRADS, dtype=np.float64) / 1000.0
 
 
 def getDensity(altitude):
@@ -14,64 +47,36 @@ def getDensity(altitude):
 	This is a direct port of the oziplotter Atmosphere class
 	"""
 
-    # Constants
-    airMolWeight = 28.9644  # Molecular weight of air
-    densitySL = 1.225  # Density at sea level [kg/m3]
-    pressureSL = 101325  # Pressure at sea level [Pa]
-    temperatureSL = 288.15  # Temperature at sea level [deg K]
-    gamma = 1.4
-    gravity = 9.80665  # Acceleration of gravity [m/s2]
-    tempGrad = -0.0065  # Temperature gradient [deg K/m]
-    RGas = 8.31432  # Gas constant [kg/Mol/K]
-    R = 287.053
     deltaTemperature = 0.0
 
-    # Lookup Tables
-    altitudes = [0, 11000, 20000, 32000, 47000, 51000, 71000, 84852]
-    pressureRels = [
-        1,
-        2.23361105092158e-1,
-        5.403295010784876e-2,
-        8.566678359291667e-3,
-        1.0945601337771144e-3,
-        6.606353132858367e-4,
-        3.904683373343926e-5,
-        3.6850095235747942e-6,
-    ]
-    temperatures = [288.15, 216.65, 216.65, 228.65, 270.65, 270.65, 214.65, 186.946]
-    tempGrads = [-6.5, 0, 1, 2.8, 0, -2.8, -2, 0]
-    gMR = gravity * airMolWeight / RGas
-
     # Pick a region to work in
     i = 0
     if altitude > 0:
-        while altitude > altitudes[i + 1]:
+        while altitude > LAYER_ALTITUDES[i + 1]:
             i = i + 1
 
     # Lookup based on region
-    baseTemp = temperatures[i]
-    tempGrad = tempGrads[i] / 1000.0
-    pressureRelBase = pressureRels[i]
-    deltaAltitude = altitude - altitudes[i]
+    baseTemp = LAYER_TEMPERATURES[i]
+    tempGrad = LAYER_TEMP_GRADS[i] / 1000.0
+    pressureRelBase = LAYER_PRESSURE_RELS[i]
+    deltaAltitude = altitude - LAYER_ALTITUDES[i]
     temperature = baseTemp + tempGrad * deltaAltitude
 
     # Calculate relative pressure
     if math.fabs(tempGrad) < 1e-10:
         pressureRel = pressureRelBase * math.exp(
-            -1 * gMR * deltaAltitude / 1000.0 / baseTemp
+            -1 * GMR * deltaAltitude / 1000.0 / baseTemp
         )
     else:
         pressureRel = pressureRelBase * math.pow(
-            baseTemp / temperature, gMR / tempGrad / 1000.0
+            baseTemp / temperature, GMR / tempGrad / 1000.0
         )
 
     # Add temperature offset
     temperature = temperature + deltaTemperature
 
     # Finally, work out the density...
-    speedOfSound = math.sqrt(gamma * R * temperature)
-    pressure = pressureRel * pressureSL
-    density = densitySL * pressureRel * temperatureSL / temperature
+    density = DENSITY_SL * pressureRel * TEMPERATURE_SL / temperature
 
     return density
 
@@ -83,10 +88,104 @@ def seaLevelDescentRate(descent_rate, altitude):
     return math.sqrt((rho / 1.225) * math.pow(descent_rate, 2))
 
 
+def getDensityArray(altitudes):
+    """
+    Calculate the atmospheric density for an array of altitudes in metres.
+    Array version of getDensity - the atmosphere layer for each altitude is found using
+    a binary search over the layer boundaries, with no per-element Python work.
+    """
+    _alts = np.asarray(altitudes, dtype=np.float64)
+
+    # Pick a region to work in. An altitude exactly on a boundary uses the lower layer,
+    # and anything above the top boundary is extrapolated from the top layer.
+    _i = np.searchsorted(_LAYER_ALTITUDES_NP[1:], _alts, side="left")
+    _i = np.clip(_i, 0, len(LAYER_ALTITUDES) - 2)
+
+    # Lookup based on region
+    _base_temp = _LAYER_TEMPERATURES_NP[_i]
+    _temp_grad = _LAYER_TEMP_GRADS_NP[_i]
+    _pressure_rel_base = _LAYER_PRESSURE_RELS_NP[_i]
+    _delta_alt = _alts - _LAYER_ALTITUDES_NP[_i]
+    _temperature = _base_temp + _temp_grad * _delta_alt
+
+    # Calculate relative pressure, using the isothermal formula for layers without a temperature gradient.
+    _isothermal = np.abs(_temp_grad) < 1e-10
+    _safe_grad = np.where(_isothermal, 1.0, _temp_grad)
+    _pressure_rel = np.where(
+        _isothermal,
+        _pressure_rel_base * np.exp(-1 * GMR * _delta_alt / 1000.0 / _base_temp),
+        _pressure_rel_base
+        * np.power(_base_temp / _temperature, GMR / _safe_grad / 1000.0),
+    )
+
+    return DENSITY_SL * _pressure_rel * TEMPERATURE_SL / _temperature
+
+
+def seaLevelDescentRateArray(descent_rates, altitudes):
+    """ Calculate the descent rates at sea level, for arrays of descent rates and altitudes """
+
+    _rho = getDensityArray(altitudes)
+    return np.abs(np.asarray(descent_rates, dtype=np.float64)) * np.sqrt(_rho / 1.225)
+
+
+# Fall-time table.
+# A payload falling at terminal velocity has a descent rate of k/sqrt(rho(h)), where k is the sea-level
+# descent rate multiplied by sqrt(1.225). The time taken to fall from altitude h to altitude g is then
+# (F(h) - F(g)) / k, where F(h) is the integral of sqrt(rho) from FALL_TABLE_MIN_ALT up to h.
+# F is tabulated once here, so time-to-landing calculations are an interpolation and a difference.
+FALL_TABLE_STEP = 5.0
+FALL_TABLE_MIN_ALT = -1000.0
+# Top of the table, which is the highest grid point within the atmosphere model.
+FALL_TABLE_MAX_ALT = FALL_TABLE_MIN_ALT + FALL_TABLE_STEP * math.floor(
+    (LAYER_ALTITUDES[-1] - FALL_TABLE_MIN_ALT) / FALL_TABLE_STEP
+)
+
+
+def _build_fall_table():
+    """ Tabulate the cumulative integral of sqrt(density) against altitude """
+    _num_points = int(round((FALL_TABLE_MAX_ALT - FALL_TABLE_MIN_ALT) / FALL_TABLE_STEP)) + 1
+    _alts = np.linspace(FALL_TABLE_MIN_ALT, FALL_TABLE_MAX_ALT, _num_points)
+    _sqrt_rho = np.sqrt(getDensityArray(_alts))
+    # Trapezoidal integration.
+    _integral = np.concatenate(
+        ([0.0], np.cumsum(0.5 * (_sqrt_rho[1:] + _sqrt_rho[:-1]) * np.diff(_alts)))
+    )
+    return (_alts, _integral)
+
+
+(FALL_TABLE_ALTITUDES, FALL_TABLE_INTEGRAL) = _build_fall_table()
+# Plain-list copy of the table, which is faster to index for scalar lookups.
+_FALL_TABLE_INTEGRAL_LIST = FALL_TABLE_INTEGRAL.tolist()
+
+
+def _fall_integral(altitude):
+    """ Linearly interpolate the fall-time table at a single altitude within the table range """
+    _pos = (altitude - FALL_TABLE_MIN_ALT) / FALL_TABLE_STEP
+    _idx = min(int(_pos), len(_FALL_TABLE_INTEGRAL_LIST) - 2)
+    _frac = _pos - _idx
+    _lower = _FALL_TABLE_INTEGRAL_LIST[_idx]
+    return _lower + _frac * (_FALL_TABLE_INTEGRAL_LIST[_idx + 1] - _lower)
+
+
+def _time_to_landing_stepped(altitude, drag_coeff, ground_asl=0.0, step_size=1):
+    """ Step down through the atmosphere in <step_size> second steps, until below ground level, and return the elapsed time. """
+    _alt = altitude
+    _start_time = 0
+    while _alt >= ground_asl:
+        _alt += step_size * -1 * (drag_coeff / math.sqrt(getDensity(_alt)))
+        _start_time += step_size
+
+    return _start_time
+
+
 def time_to_landing(
     current_altitude, current_descent_rate=-5.0, ground_asl=0.0, step_size=1
 ):
-    """ Calculate an estimated time to landing (in seconds) of a payload, based on its current altitude and descent rate """
+    """ Calculate an estimated time to landing (in seconds) of a payload, based on its current altitude and descent rate.
+
+    The fall time is calculated using a precomputed table of integrated air density. Altitudes outside
+    of the range of this table fall back to stepping down through the atmosphere in <step_size> second steps.
+    """
 
     # A few checks on the input data.
     if current_descent_rate > 0.0:
@@ -103,18 +202,23 @@ def time_to_landing(
         _desc_rate * 1.106797
     )  # Multiply descent rate by square root of sea-level air density (1.225).
 
-    _alt = current_altitude
-    _start_time = 0
-    # Now step through the flight in <step_size> second steps.
-    # Once the altitude is below our ground level, stop, and return the elapsed time.
-    while _alt >= ground_asl:
-        _alt += step_size * -1 * (_drag_coeff / math.sqrt(getDensity(_alt)))
-        _start_time += step_size
+    if _drag_coeff == 0:
+        # If we are not descending at all, we will never land.
+        return None
 
-    return _start_time
+    if (current_altitude > FALL_TABLE_MAX_ALT) or (ground_asl < FALL_TABLE_MIN_ALT):
+        return _time_to_landing_stepped(
+            current_altitude, _drag_coeff, ground_asl=ground_asl, step_size=step_size
+        )
+
+    _fall_time = (_fall_integral(current_altitude) - _fall_integral(ground_asl)) / _drag_coeff
+
+    return int(round(_fall_time))
 
 
 if __name__ == "__main__":
+    import time
+
     # Test Cases
     _altitudes = [1000, 10000, 30000, 1000, 10000, 30000]
     _rates = [-10.0, -10.0, -10.0, -30.0, -30.0, -30.0]
@@ -133,3 +237,37 @@ if __name__ == "__main__":
             "Time to landing: %d sec, %s:%s " % (_landing, _landing_min, _landing_sec)
         )
         print("")
+
+    # Array versions of the above, which should match the scalar results.
+    print("Array Densities: %s" % str(getDensityArray(_altitudes)))
+    print("Array Sea Level Descent Rates: %s" % str(seaLevelDescentRateArray(_rates, _altitudes)))
+    print("")
+
+    # Benchmark the table-driven time to landing calculation against stepping down through the atmosphere,
+    # across a grid of altitudes and descent rates.
+    _bench_altitudes = np.arange(500, 40001, 500)
+    _bench_rates = [-3.0, -5.0, -8.0, -12.0, -20.0, -30.0, -50.0]
+
+    _stepped_time = 0.0
+    _table_time = 0.0
+    _max_error = 0
+    _count = 0
+    for _alt in _bench_altitudes:
+        for _rate in _bench_rates:
+            _drag_coeff = math.fabs(seaLevelDescentRate(_rate, _alt)) * 1.106797
+
+            _start = time.perf_counter()
+            _stepped = _time_to_landing_stepped(_alt, _drag_coeff)
+            _stepped_time += time.perf_counter() - _start
+
+            _start = time.perf_counter()
+            _table = time_to_landing(_alt, _rate)
+            _table_time += time.perf_counter() - _start
+
+            _max_error = max(_max_error, abs(_table - _stepped))
+            _count += 1
+
+    print("Time to landing benchmark (%d altitude/rate combinations):" % _count)
+    print("  Stepped: %.1f us/call" % (1e6 * _stepped_time / _count))
+    print("  Table:   %.1f us/call" % (1e6 * _table_time / _count))
+    print("  Maximum difference: %d sec" % _max_error)
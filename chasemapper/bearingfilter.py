@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Bearing Outlier Filter
+#
+#   Reject bearings which are well away from the recent bearings from the same source (e.g. due to reflections
+#   or multipath), using exponentially-weighted circular statistics of each source's true bearings.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+from math import atan2, cos, degrees, exp, hypot, log, radians, sin, sqrt
+from .triangulation import METRES_PER_DEGREE, bearing_contributions, solve_fix
+
+
+class SourceBearingFilter(object):
+    """ Circular mean and standard deviation of the recent true bearings from a single source.
+
+    Bearings are weighted by exp(-(dt / time_constant + distance / distance_constant)), where dt is the time since
+    the bearing, and distance is how far the car has moved since. The bearing to the transmitter changes as the car
+    moves, so bearings taken further back along the car's path say less about the next bearing. The weighted sums of
+    sin and cos of the bearings are decayed as each bearing arrives, so each bearing costs O(1).
+
+    The mean does not follow the bearing when it changes quickly - driving close past the transmitter, the bearing
+    swings around within seconds. So the least-squares intersection of the recent bearing lines (as in
+    chasemapper.triangulation) is tracked too, with the bearing lines weighted the same way, and a bearing well away
+    from the mean is still accepted if the recent bearing lines show the car is closing on the transmitter - see
+    is_close_pass. The normal equations are kept relative to the car's latest position, so this is O(1) too.
+    """
+
+    def __init__(
+        self,
+        source,
+        threshold=3.0,
+        min_deviation=20.0,
+        time_constant=60.0,
+        distance_constant=500.0,
+        min_bearings=5.0,
+        max_rejects=10,
+    ):
+        """ Create a SourceBearingFilter.
+
+        Args:
+            source (str): Bearing source.
+            threshold (float): Bearings more than this many circular standard deviations from the mean are rejected.
+            min_deviation (float): Bearings within this many degrees of the mean are always accepted.
+            time_constant (float): Time constant of the bearing weights, in seconds.
+            distance_constant (float): Distance constant of the bearing weights, in metres.
+            min_bearings (float): Bearings are accepted until the total weight of the recent bearings reaches this.
+            max_rejects (int): After this many consecutive rejections, the statistics are restarted, in case
+                the bearings have genuinely changed (e.g. the transmitter has moved).
+        """
+        self.source = source
+        self.threshold = threshold
+        self.min_deviation = min_deviation
+        self.time_constant = time_constant
+        self.distance_constant = distance_constant
+        self.min_bearings = min_bearings
+        self.max_rejects = max_rejects
+
+        # Weighted sums of sin and cos of the accepted bearings, and of the weights.
+        self.sin_sum = 0.0
+        self.cos_sum = 0.0
+        self.weight = 0.0
+        # Weighted sums of the origins of the accepted bearings, and of the least-squares normal equations of their
+        # bearing lines, in metres east and north of the latest bearing's origin.
+        self.x_sum = 0.0
+        self.y_sum = 0.0
+        self.fix_sums = [0.0] * 7
+        # Origin (relative to the latest bearing's origin) and true bearing of the latest accepted bearing.
+        self.last_accepted = None
+
+        # Time and position of the latest bearing.
+        self.timestamp = None
+        self.lat = 0.0
+        self.lon = 0.0
+
+        self.consecutive_rejects = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.resets = 0
+
+    def decay(self, timestamp, lat, lon):
+        """ Decay the weights of the previous bearings, for the time passed and the distance moved since the latest """
+        if self.timestamp is not None:
+            _dt = max(0.0, timestamp - self.timestamp)
+            _dx = ((lon - self.lon + 180.0) % 360.0 - 180.0) * METRES_PER_DEGREE * cos(radians(lat))
+            _dy = (lat - self.lat) * METRES_PER_DEGREE
+            _factor = exp(-(_dt / self.time_constant + hypot(_dx, _dy) / self.distance_constant))
+
+            # Move the origin of the bearing lines to the new position: d' = n.(p - o) = d - n.o
+            (_axx, _axy, _ayy, _bx, _by, _c, _w) = self.fix_sums
+            self.fix_sums = [
+                _axx * _factor,
+                _axy * _factor,
+                _ayy * _factor,
+                (_bx - _axx * _dx - _axy * _dy) * _factor,
+                (_by - _axy * _dx - _ayy * _dy) * _factor,
+                (_c - 2.0 * (_dx * _bx + _dy * _by) + _axx * _dx * _dx + 2.0 * _axy * _dx * _dy + _ayy * _dy * _dy)
+                * _factor,
+                _w * _factor,
+            ]
+            self.x_sum = (self.x_sum - self.weight * _dx) * _factor
+            self.y_sum = (self.y_sum - self.weight * _dy) * _factor
+            if self.last_accepted is not None:
+                (_x, _y, _bearing) = self.last_accepted
+                self.last_accepted = (_x - _dx, _y - _dy, _bearing)
+
+            self.sin_sum *= _factor
+            self.cos_sum *= _factor
+            self.weight *= _factor
+
+        self.timestamp = timestamp
+        self.lat = lat
+        self.lon = lon
+
+    def get_mean(self):
+        """ Return the weighted circular mean and circular standard deviation of the recent bearings, in degrees.
+        Returns (None, None) if there are no recent bearings. """
+        if self.weight <= 0.0:
+            return (None, None)
+
+        # Mean resultant length, which is 1 if all bearings are identical, and near 0 if they are spread around the circle.
+        _r = min(1.0, hypot(self.sin_sum, self.cos_sum) / self.weight)
+        if _r <= 0.0:
+            return (degrees(atan2(self.sin_sum, self.cos_sum)) % 360.0, 180.0)
+
+        return (degrees(atan2(self.sin_sum, self.cos_sum)) % 360.0, degrees(sqrt(-2.0 * log(_r))))
+
+    def is_close_pass(self, bearing, mean, std):
+        """ Check whether a bearing from the latest bearing's origin, well away from the mean, agrees with the recent
+        bearing lines - as it does when the car is driving close past the transmitter """
+        _fix = solve_fix(self.fix_sums, self.weight)
+        _sums = [_a + _b for (_a, _b) in zip(self.fix_sums, bearing_contributions(0.0, 0.0, bearing, 1.0))]
+        _new_fix = solve_fix(_sums, self.weight + 1.0)
+        if (_fix is None) or (_new_fix is None):
+            return False
+
+        _gate = max(self.min_deviation, self.threshold * std)
+
+        # The new intersection must be ahead of the car along the bearing...
+        if _new_fix["x"] * sin(radians(bearing)) + _new_fix["y"] * cos(radians(bearing)) <= 0.0:
+            return False
+
+        # ... in the direction of the mean, as seen from where the recent bearings were taken...
+        (_dx, _dy) = (_new_fix["x"] - self.x_sum / self.weight, _new_fix["y"] - self.y_sum / self.weight)
+        if abs((degrees(atan2(_dx, _dy)) - mean + 180.0) % 360.0 - 180.0) > _gate:
+            return False
+
+        # ... and along the latest accepted bearing.
+        (_x, _y, _bearing) = self.last_accepted
+        _bearing = degrees(atan2(_new_fix["x"] - _x, _new_fix["y"] - _y)) - _bearing
+        if abs((_bearing + 180.0) % 360.0 - 180.0) > _gate:
+            return False
+
+        # The bearing lines must converge there - seen from where they were taken, they must pass as close to the
+        # intersection as the bearings are to their mean.
+        if degrees(atan2(_new_fix["rms"], hypot(_dx, _dy))) > self.threshold * std:
+            return False
+
+        # Adding the bearing line must not increase the weighted sum of squared distances between the intersection
+        # and the bearing lines by more than threshold^2 times that of an average bearing line.
+        _ssr = _fix["rms"] ** 2 * self.fix_sums[6]
+        _increase = _new_fix["rms"] ** 2 * _sums[6] - _ssr
+        return _increase <= self.threshold ** 2 * _ssr / max(1.0, self.weight - 2.0)
+
+    def check(self, timestamp, lat, lon, bearing):
+        """ Check a bearing against the recent bearings, and add it to the statistics if it is accepted.
+
+        Args:
+            timestamp (float): Bearing time.
+            lat, lon (float): Bearing origin.
+            bearing (float): True bearing, in degrees.
+
+        Returns:
+            bool: True if the bearing is accepted.
+        """
+        self.decay(timestamp, lat, lon)
+
+        _line_weight = 1.0
+        if self.weight >= self.min_bearings:
+            (_mean, _std) = self.get_mean()
+            _deviation = abs((bearing - _mean + 180.0) % 360.0 - 180.0)
+
+            if (_deviation > max(self.min_deviation, self.threshold * _std)) and not self.is_close_pass(
+                bearing, _mean, _std
+            ):
+                self.consecutive_rejects += 1
+                if self.consecutive_rejects < self.max_rejects:
+                    self.rejected += 1
+                    return False
+
+                # The bearings have consistently moved away from the mean - restart from this bearing.
+                self.sin_sum = 0.0
+                self.cos_sum = 0.0
+                self.weight = 0.0
+                self.x_sum = 0.0
+                self.y_sum = 0.0
+                self.fix_sums = [0.0] * 7
+                self.resets += 1
+            else:
+                # Accepted bearings well away from the mean may still be outliers, which would drag the intersection
+                # away from the transmitter, so their bearing lines are down-weighted.
+                _line_weight = 1.0 / (1.0 + (_deviation / max(1.0, 2.0 * _std)) ** 2)
+
+        self.consecutive_rejects = 0
+        self.accepted += 1
+        self.sin_sum += sin(radians(bearing))
+        self.cos_sum += cos(radians(bearing))
+        self.weight += 1.0
+        _line = bearing_contributions(0.0, 0.0, bearing, _line_weight)
+        self.fix_sums = [_a + _b for (_a, _b) in zip(self.fix_sums, _line)]
+        self.last_accepted = (0.0, 0.0, bearing)
+        return True
+
+    def get_stats(self):
+        """ Return the acceptance statistics and the current circular mean of the source """
+        (_mean, _std) = self.get_mean()
+        _total = self.accepted + self.rejected
+        return {
+            "source": self.source,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "acceptance_rate": (self.accepted / _total) if _total > 0 else 1.0,
+            "resets": self.resets,
+            "mean": _mean,
+            "std": _std,
+            "weight": self.weight,
+        }
+
+
+class BearingFilter(object):
+    """ Outlier filter for each source of bearings (including each time-sequenced fox source).
+    Bearings from stationary cars (heading_valid False) are not checked, as their true bearing is unreliable.
+    """
+
+    def __init__(self, **kwargs):
+        """ Create a BearingFilter. Keyword arguments are passed to each SourceBearingFilter. """
+        self.filter_args = kwargs
+        self.sources = {}
+
+    def check(self, bearing):
+        """ Check a bearing (a bearing store record) against the recent bearings from its source.
+
+        Returns:
+            bool: True if the bearing is accepted.
+        """
+        if not bearing["heading_valid"]:
+            return True
+
+        _source = bearing["source"]
+        if _source not in self.sources:
+            self.sources[_source] = SourceBearingFilter(_source, **self.filter_args)
+
+        return self.sources[_source].check(
+            bearing["timestamp"], bearing["lat"], bearing["lon"], bearing["true_bearing"]
+        )
+
+    def get_stats(self):
+        """ Return the acceptance statistics of each source, as a dictionary keyed by source """
+        return {_source: _filter.get_stats() for (_source, _filter) in self.sources.items()}
+
+    def flush(self):
+        """ Clear the statistics of all sources """
+        self.sources = {}
+
+
+if __name__ == "__main__":
+    # Simulate a car driving past a transmitter, with bearings corrupted by multipath, and compare the bearing
+    # errors with and without the filter. Then simulate driving 50 m past the transmitter, where the bearing swings
+    # around within seconds, and check that no genuine bearings are rejected.
+    #   python -m chasemapper.bearingfilter [--outliers 0.2]
+    import argparse
+    import time
+    import numpy as np
+    from .earthmaths import position_info
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--outliers", type=float, default=0.2, help="Fraction of bearings which are outliers.")
+    args = parser.parse_args()
+
+    _tx = (-34.85, 138.66)
+
+    def simulate(position, noise, outliers):
+        """ Run 20 minutes of bearings, once a second, from a car at position(i) at time i, through the filter """
+        _rng = np.random.default_rng(1)
+        _filter = BearingFilter()
+        _errors = {"all": [], "accepted": []}
+        _outliers = {"rejected": 0, "total": 0}
+        _genuine_rejected = 0
+        _times = []
+
+        for _i in range(1200):
+            (_lat, _lon) = position(_i)
+            _truth = position_info((_lat, _lon, 0), (_tx[0], _tx[1], 0))["bearing"]
+
+            _outlier = _rng.random() < outliers
+            if _outlier:
+                _bearing = _rng.uniform(0.0, 360.0)
+            else:
+                _bearing = _truth + _rng.normal(0.0, noise)
+
+            _record = {
+                "timestamp": float(_i),
+                "lat": _lat,
+                "lon": _lon,
+                "true_bearing": _bearing % 360.0,
+                "heading_valid": True,
+                "source": "sim",
+            }
+            _start = time.time()
+            _accepted = _filter.check(_record)
+            _times.append(time.time() - _start)
+
+            _error = abs((_bearing - _truth + 180.0) % 360.0 - 180.0)
+            _errors["all"].append(_error)
+            if _accepted:
+                _errors["accepted"].append(_error)
+            if _outlier:
+                _outliers["total"] += 1
+                _outliers["rejected"] += 0 if _accepted else 1
+            elif not _accepted:
+                _genuine_rejected += 1
+
+        _stats = _filter.get_stats()["sim"]
+        print(
+            "%.1f us per bearing. Accepted %d of %d bearings (%.0f%%), %d resets. Rejected %d of %d outliers, "
+            "and %d genuine bearings."
+            % (
+                np.mean(_times) * 1e6,
+                _stats["accepted"],
+                _stats["accepted"] + _stats["rejected"],
+                _stats["acceptance_rate"] * 100,
+                _stats["resets"],
+                _outliers["rejected"],
+                _outliers["total"],
+                _genuine_rejected,
+            )
+        )
+        print(
+            "RMS bearing error: %.1f degrees unfiltered, %.1f degrees filtered. "
+            "Bearings over 30 degrees off: %d unfiltered, %d filtered."
+            % (
+                np.sqrt(np.mean(np.square(_errors["all"]))),
+                np.sqrt(np.mean(np.square(_errors["accepted"]))),
+                np.sum(np.array(_errors["all"]) > 30.0),
+                np.sum(np.array(_errors["accepted"]) > 30.0),
+            )
+        )
+
+    # Driving north-east at 15 m/s, passing about 2 km from the transmitter, with 5 degree bearing noise.
+    print("Driving past the transmitter:")
+    simulate(
+        lambda i: (
+            -34.9 + 15.0 * i * 0.5 / METRES_PER_DEGREE,
+            138.6 + 15.0 * i * 0.866 / (METRES_PER_DEGREE * np.cos(np.radians(-34.9))),
+        ),
+        5.0,
+        args.outliers,
+    )
+
+    # Driving east at 15 m/s, passing 50 m south of the transmitter after 10 minutes, with 3 degree bearing noise.
+    print("Driving 50 m past the transmitter:")
+    _lat = _tx[0] - 50.0 / METRES_PER_DEGREE
+    simulate(
+        lambda i: (_lat, _tx[1] + 15.0 * (i - 600) / (METRES_PER_DEGREE * np.cos(np.radians(_lat)))),
+        3.0,
+        args.outliers,
+    )
@@ -7,13 +7,141 @@
 #
 #
 #   TODO:
-#       [ ] Store a rolling buffer of car positions, to enable fusing of 'old' bearings with previous car positions.
+#       [x] Store a rolling buffer of car positions, to enable fusing of 'old' bearings with previous car positions.
 #
 
+import hashlib
 import logging
 import time
+import numpy as np
 
-from threading import Lock
+from collections import OrderedDict, deque
+from threading import Lock, Timer
+from .bearingfilter import BearingFilter
+from .deltasync import ChangeLog
+from .heatmap import BearingHeatmaps, render_snapshot
+from .triangulation import Triangulator
+
+
+def encode_raw_doa(angles, doa):
+    """ Encode raw DOA data compactly, for sending to web clients.
+
+    The angles (which are the same for every bearing from a source) are identified by a short hash, and the
+    DOA values are quantised to 8 bits, between their minimum and maximum values.
+
+    Returns:
+        tuple: (angle grid ID, angle list, dict of encoded DOA fields)
+    """
+    _angles = np.asarray(angles, dtype=np.float32)
+    _grid_id = hashlib.md5(_angles.tobytes()).hexdigest()[:12]
+
+    _doa = np.asarray(doa, dtype=float)
+    _min = float(_doa.min()) if len(_doa) > 0 else 0.0
+    _max = float(_doa.max()) if len(_doa) > 0 else 0.0
+    if _max > _min:
+        _quantised = np.round((_doa - _min) * (255.0 / (_max - _min))).astype(np.uint8)
+    else:
+        _quantised = np.zeros(len(_doa), dtype=np.uint8)
+
+    return (
+        _grid_id,
+        _angles.tolist(),
+        {"raw_doa_grid": _grid_id, "raw_doa_q": _quantised.tobytes(), "raw_doa_min": _min, "raw_doa_max": _max},
+    )
+
+
+class CarPoseHistory(object):
+    """ Rolling buffer of chase car poses, used to find the car position and heading at the time a bearing
+    was measured, rather than the time it arrived.
+
+    Poses are held in fixed-size arrays, twice the length of the history. New poses are appended until the
+    end of the arrays is reached, and the history is then moved back to the start of the arrays, so the
+    history is always contiguous and in time order, and can be binary-searched.
+    """
+
+    def __init__(self, max_length=600):
+        """ Create a CarPoseHistory.
+
+        Args:
+            max_length (int): Number of poses to keep.
+        """
+        self.max_length = max_length
+        self.times = np.zeros(2 * max_length)
+        self.lats = np.zeros(2 * max_length)
+        self.lons = np.zeros(2 * max_length)
+        self.headings = np.zeros(2 * max_length)
+        self.speeds = np.zeros(2 * max_length)
+        self.heading_valid = np.zeros(2 * max_length, dtype=bool)
+
+        # The history is held in [start, end) of the arrays.
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def add(self, timestamp, lat, lon, heading, speed, heading_valid):
+        """ Add a car pose to the history. Poses must be added in time order. """
+        if len(self) > 0 and timestamp <= self.times[self.end - 1]:
+            if timestamp == self.times[self.end - 1]:
+                # Replace the latest pose.
+                self.end -= 1
+            else:
+                # Time has gone backwards (e.g. the system clock was stepped) - start a new history.
+                self.start = 0
+                self.end = 0
+
+        if self.end == len(self.times):
+            # Move the history back to the start of the arrays.
+            _count = len(self)
+            for _array in (self.times, self.lats, self.lons, self.headings, self.speeds, self.heading_valid):
+                _array[:_count] = _array[self.start : self.end]
+            self.start = 0
+            self.end = _count
+
+        self.times[self.end] = timestamp
+        self.lats[self.end] = lat
+        self.lons[self.end] = lon
+        self.headings[self.end] = heading
+        self.speeds[self.end] = speed
+        self.heading_valid[self.end] = heading_valid
+        self.end += 1
+
+        if len(self) > self.max_length:
+            self.start += 1
+
+    def interpolate(self, timestamp):
+        """ Interpolate the car pose at a timestamp.
+
+        Returns:
+            dict: Car pose (lat, lon, heading, speed, heading_valid), or None if the timestamp is not within
+                the history.
+        """
+        if (len(self) == 0) or (timestamp < self.times[self.start]) or (timestamp > self.times[self.end - 1]):
+            return None
+
+        # Find the first pose at or after the timestamp.
+        _i = self.start + int(np.searchsorted(self.times[self.start : self.end], timestamp))
+        if self.times[_i] == timestamp:
+            return {
+                "lat": float(self.lats[_i]),
+                "lon": float(self.lons[_i]),
+                "heading": float(self.headings[_i]),
+                "speed": float(self.speeds[_i]),
+                "heading_valid": bool(self.heading_valid[_i]),
+            }
+
+        _frac = (timestamp - self.times[_i - 1]) / (self.times[_i] - self.times[_i - 1])
+        _dlon = (self.lons[_i] - self.lons[_i - 1] + 180.0) % 360.0 - 180.0
+        _dheading = (self.headings[_i] - self.headings[_i - 1] + 180.0) % 360.0 - 180.0
+
+        return {
+            "lat": float(self.lats[_i - 1] + _frac * (self.lats[_i] - self.lats[_i - 1])),
+            "lon": float((self.lons[_i - 1] + _frac * _dlon + 180.0) % 360.0 - 180.0),
+            "heading": float((self.headings[_i - 1] + _frac * _dheading) % 360.0),
+            "speed": float(self.speeds[_i - 1] + _frac * (self.speeds[_i] - self.speeds[_i - 1])),
+            "heading_valid": bool(self.heading_valid[_i - 1] and self.heading_valid[_i]),
+        }
 
 
 class Bearings(object):
@@ -27,6 +155,20 @@ class Bearings(object):
         time_seq_active=25,
         time_seq_cycle=120,
         doa_confidence_threshold=4.0,
+        car_history_length=600,
+        change_window=0.2,
+        triangulation_enabled=True,
+        triangulation_min_bearings=3,
+        heatmap_enabled=False,
+        heatmap_extent=20000.0,
+        heatmap_resolution=256,
+        heatmap_sigma=10.0,
+        heatmap_interval=1.0,
+        outlier_filter_enabled=True,
+        outlier_filter_threshold=3.0,
+        outlier_filter_min_deviation=20.0,
+        outlier_filter_time_constant=60.0,
+        outlier_filter_distance=500.0,
     ):
 
         # Reference to the socketio instance which will be used to pass data onto web clients
@@ -53,10 +195,78 @@ class Bearings(object):
         # }
         self.bearings = {}
 
+        # Keys of the bearing store, in order of arrival. Used to find the oldest bearings without sorting the store.
+        # Keys of bearings which have been deleted from the store may still be present, and are skipped over.
+        self.bearing_order = deque()
+
+        # Keys of the bearing store from each source, in order of arrival, keyed by source. Used to find the newest
+        # bearings from a source without searching the store. Unlike bearing_order, these only hold keys of
+        # stored bearings - as bearings are evicted oldest first, an evicted bearing is always the oldest of its source.
+        self.source_order = {}
+
         self.bearing_sources = []
 
+        # Angle grids of raw DOA data, keyed by angle grid ID. These are sent to the web clients once, when first
+        # seen, and raw DOA data then refers to them by ID.
+        self.doa_angle_grids = {}
+
         self.bearing_lock = Lock()
 
+        # Sequence numbers of changes to the bearing store, so reconnecting clients can request only what
+        # has changed since they last synchronised.
+        self.change_log = ChangeLog(max_removals=max(1000, 2 * max_bearings))
+
+        # Changes to the bearing store are sent to the web clients in batches, at most once every change_window
+        # seconds (or immediately, if change_window is 0). Bearings which are removed in the same window
+        # they were added in are never sent.
+        self.change_window = change_window
+        self.pending_adds = OrderedDict()
+        self.pending_removes = []
+        self.pending_fixes = {}
+        # Change log sequence number of the latest queued change.
+        self.pending_seq = 0
+        self.change_timer = None
+        self.change_stats = {
+            "bearing_change_events": 0,
+            "bearing_fix_events": 0,
+            "bearings_added": 0,
+            "bearings_removed": 0,
+            "bearings_cancelled": 0,
+        }
+        # Times of recent bearing_change events, used to calculate the event rate.
+        self.change_event_times = deque()
+
+        # Least-squares transmitter location estimates, updated as bearings are added and removed.
+        if triangulation_enabled:
+            self.triangulator = Triangulator(min_bearings=triangulation_min_bearings)
+        else:
+            self.triangulator = None
+
+        # Bearing likelihood heatmaps, also updated as bearings are added and removed.
+        # Rendered heatmaps are sent to clients at most once every heatmap_interval seconds.
+        if heatmap_enabled:
+            self.heatmaps = BearingHeatmaps(
+                extent=heatmap_extent, resolution=heatmap_resolution, sigma=heatmap_sigma
+            )
+        else:
+            self.heatmaps = None
+        self.heatmap_interval = heatmap_interval
+        self.heatmap_pending = set()
+        self.heatmap_timer = None
+        self.heatmap_last_emit = 0.0
+
+        # Outlier filter, which rejects bearings well away from the recent bearings from the same source,
+        # before they are stored.
+        if outlier_filter_enabled:
+            self.outlier_filter = BearingFilter(
+                threshold=outlier_filter_threshold,
+                min_deviation=outlier_filter_min_deviation,
+                time_constant=outlier_filter_time_constant,
+                distance_constant=outlier_filter_distance,
+            )
+        else:
+            self.outlier_filter = None
+
         # Internal record of the chase car position, which is updated with incoming GPS data.
         # If incoming bearings do not contain lat/lon information, we fuse them with this position,
         # as long as it is valid.
@@ -72,6 +282,10 @@ class Bearings(object):
             "position_valid": False,
         }
 
+        # History of recent car positions, used to fuse relative bearings with the car position at the time
+        # given by the bearing source.
+        self.car_history = CarPoseHistory(car_history_length)
+
         self.time_seq_enabled = time_seq_enabled
         if time_seq_times is None:
             time_seq_times = [0, 0, 0, 0]
@@ -128,20 +342,36 @@ class Bearings(object):
             return f"{source}_Fox{_fox_number}"
         return source
 
+    def encode_raw_doa(self, bearing):
+        """ Encode the raw DOA data of a bearing for the web clients, sending its angle grid to the clients if it
+        has not been seen before.
+
+        Returns:
+            dict: Encoded raw DOA fields, or an empty dict if the bearing has no raw DOA data.
+        """
+        if "raw_bearing_angles" not in bearing or "raw_doa" not in bearing:
+            return {}
+
+        (_grid_id, _angles, _encoded) = encode_raw_doa(bearing["raw_bearing_angles"], bearing["raw_doa"])
+        if _grid_id not in self.doa_angle_grids:
+            self.doa_angle_grids[_grid_id] = _angles
+            self.sio.emit("doa_angle_grid", {"id": _grid_id, "angles": _angles}, namespace="/chasemapper")
+
+        return _encoded
+
     def emit_bearing_plot_update(self, bearing, confidence, power, data_valid):
         """Send live raw DOA data to clients without storing a bearing."""
         if self.sio is None or "raw_bearing_angles" not in bearing or "raw_doa" not in bearing:
             return
 
         _plot_update = {
-            "raw_bearing_angles": bearing["raw_bearing_angles"],
-            "raw_doa": bearing["raw_doa"],
             "raw_bearing": bearing["bearing"],
             "confidence": confidence,
             "power": power,
             "data_valid": data_valid,
             "server_timestamp": time.time(),
         }
+        _plot_update.update(self.encode_raw_doa(bearing))
 
         self.sio.emit("bearing_plot_update", _plot_update, namespace="/chasemapper")
 
@@ -189,10 +419,20 @@ class Bearings(object):
             # Replace car position state with new data
             self.current_car_position = _car_pos
 
+            if _car_pos["position_valid"]:
+                self.car_history.add(
+                    _car_pos["timestamp"],
+                    _car_pos["lat"],
+                    _car_pos["lon"],
+                    _car_pos["heading"],
+                    _car_pos["speed"],
+                    _car_pos["heading_valid"],
+                )
+
         except Exception as e:
             logging.error("Bearing Handler - Invalid car position: %s" % str(e))
 
-    def add_bearing(self, bearing):
+    def add_bearing(self, bearing, check_outliers=True):
         """ Add a bearing into the store, fusing incoming data with the latest car position as required.
 
         bearing must be a dictionary with the following keys:
@@ -214,6 +454,9 @@ class Bearings(object):
             'raw_bearing_angles': A list of angles, associated with...
             'raw_doa': A list of TDOA result values, for each of the provided angles.
 
+        If check_outliers is True, and the outlier filter is enabled, bearings well away from the recent bearings
+        from the same source are rejected.
+
         """
 
         # Should never be passed a non-bearing dict, but check anyway,
@@ -271,8 +514,9 @@ class Bearings(object):
                 _reverse_bearing["bearing"] + 180.0
             ) % 360.0
 
-            _forward_stored = self.add_bearing(_forward_bearing)
-            _reverse_stored = self.add_bearing(_reverse_bearing)
+            # The forward and reverse bearings are 180 degrees apart, so can't be checked against each other.
+            _forward_stored = self.add_bearing(_forward_bearing, check_outliers=False)
+            _reverse_stored = self.add_bearing(_reverse_bearing, check_outliers=False)
             return _forward_stored or _reverse_stored
 
         _arrival_time = time.time()
@@ -282,6 +526,15 @@ class Bearings(object):
 
         if "timestamp" in bearing:
             _src_timestamp = bearing["timestamp"]
+
+            # Use the car position at the time the bearing was measured, if we have it.
+            try:
+                _history_pos = self.car_history.interpolate(float(_src_timestamp))
+            except (TypeError, ValueError):
+                _history_pos = None
+
+            if _history_pos is not None:
+                _current_car_pos.update(_history_pos)
         else:
             _src_timestamp = _arrival_time
 
@@ -341,6 +594,15 @@ class Bearings(object):
         # We now have our bearing - now we need to store it
         self.bearing_lock.acquire()
 
+        if check_outliers and (self.outlier_filter is not None) and not self.outlier_filter.check(_new_bearing):
+            self.bearing_lock.release()
+            logging.debug(
+                "Bearing Handler - Rejected outlier bearing %.1f from source %s."
+                % (_new_bearing["true_bearing"], _new_bearing["source"])
+            )
+            self.emit_bearing_plot_update(bearing, _confidence, _power, False)
+            return False
+
         # Try and ensure the key is going to be consistent between client and server.
         # Keep it numeric because the client uses this key as a timestamp for opacity.
         _key_time = _arrival_time
@@ -351,6 +613,9 @@ class Bearings(object):
         _new_bearing["key"] = _new_key
 
         self.bearings[_new_key] = _new_bearing
+        self.bearing_order.append(_new_key)
+        self.source_order.setdefault(_source, deque()).append(_new_key)
+        self.change_log.update(_new_key)
 
         if _source not in self.bearing_sources:
             self.bearing_sources.append(_source)
@@ -358,49 +623,253 @@ class Bearings(object):
 
         # Keep a list of what we remove, so we can pass it on to the web clients.
         _removal_list = []
-
-        # Now we need to do a clean-up of our bearing list.
-        # Grab the list of bearing entries, and sort them by time
-        _bearing_list = list(self.bearings.keys())
-        _bearing_list.sort()
-
-        # First remove any excess entries - we only get one bearing at a time, so we can do this simply:
-        if len(_bearing_list) > self.max_bearings:
-            self.bearings.pop(_bearing_list[0])
-            _removal_list.append(_bearing_list[0])
-            _bearing_list = _bearing_list[1:]
+        _removed_bearings = []
+
+        # Now we need to do a clean-up of our bearing store, working from the oldest entry.
+        # First remove any excess entries.
+        while len(self.bearings) > self.max_bearings:
+            _oldest = self.bearing_order.popleft()
+            _removed = self.bearings.pop(_oldest, None)
+            if _removed is not None:
+                self.source_order[_removed["source"]].popleft()
+                _removal_list.append(_oldest)
+                _removed_bearings.append(_removed)
 
         # Now we need to remove *old* bearings.
         _min_time = time.time() - self.max_age
 
-        _curr_time = float(_bearing_list[0])
+        while len(self.bearing_order) > 0:
+            _oldest = self.bearing_order[0]
+            if _oldest in self.bearings:
+                if self.bearings[_oldest]["timestamp"] >= _min_time:
+                    break
+                # Current entry is older than our limit, remove it.
+                _removed = self.bearings.pop(_oldest)
+                self.source_order[_removed["source"]].popleft()
+                _removed_bearings.append(_removed)
+                _removal_list.append(_oldest)
 
-        while _curr_time < _min_time:
-            # Current entry is older than our limit, remove it.
-            self.bearings.pop(_bearing_list[0])
-            _removal_list.append(_bearing_list[0])
-            _bearing_list = _bearing_list[1:]
+            self.bearing_order.popleft()
 
-            # Advance to the next entry in the list.
-            _curr_time = float(_bearing_list[0])
+        for _key in _removal_list:
+            self.change_log.remove(_key)
+
+        # Sequence number of these changes, which the clients use as their cursor once they have received them.
+        _seq = self.change_log.seq
+
+        _fixes = self.update_estimates([_new_bearing], _removed_bearings)
 
         self.bearing_lock.release()
 
-        # Add in any raw DOA data we may have been given.
-        if "raw_bearing_angles" in bearing:
-            _new_bearing["raw_bearing_angles"] = bearing["raw_bearing_angles"]
-            _new_bearing["raw_doa"] = bearing["raw_doa"]
+        # Add in any raw DOA data we may have been given. This is only sent to the web clients for live plotting,
+        # and is not kept in the bearing store.
+        _client_bearing = _new_bearing.copy()
+        _client_bearing.update(self.encode_raw_doa(bearing))
 
         # Now we need to update the web clients on what has changed.
-        _client_update = {
-            "add": _new_bearing,
-            "remove": _removal_list,
-            "server_timestamp": time.time(),
-        }
-
-        self.sio.emit("bearing_change", _client_update, namespace="/chasemapper")
+        self.queue_changes(_client_bearing, _removal_list, _fixes, _seq)
+        self.schedule_heatmaps()
         return True
 
+    def update_estimates(self, added, removed):
+        """ Update the triangulated fixes and likelihood heatmaps with added and removed bearings.
+        Must be called with bearing_lock held.
+
+        Returns:
+            list: The updated fixes, for each source which has changed.
+        """
+        if self.heatmaps is not None:
+            for _bearing in added:
+                self.heatmap_pending.add(self.heatmaps.add(_bearing))
+            for _bearing in removed:
+                self.heatmap_pending.add(self.heatmaps.remove(_bearing))
+            self.heatmap_pending.discard(None)
+
+        if self.triangulator is None:
+            return []
+
+        _sources = set()
+        for _bearing in added:
+            _sources.add(self.triangulator.add(_bearing))
+        for _bearing in removed:
+            _sources.add(self.triangulator.remove(_bearing))
+        _sources.discard(None)
+
+        return [self.triangulator.get_fix(_source) for _source in _sources]
+
+    def schedule_heatmaps(self):
+        """ Send any updated heatmaps to the web clients, once heatmap_interval has passed since the last update.
+        Heatmaps are re-centred and rendered in a timer thread, so this does not hold up the caller. """
+        with self.bearing_lock:
+            if (len(self.heatmap_pending) == 0) or (self.heatmap_timer is not None):
+                return
+
+            _wait = self.heatmap_interval - (time.time() - self.heatmap_last_emit)
+            self.heatmap_timer = Timer(max(0.0, _wait), self.emit_heatmaps)
+            self.heatmap_timer.daemon = True
+            self.heatmap_timer.start()
+
+    def emit_heatmaps(self):
+        """ Re-centre any heatmaps which need it, then render and send any updated heatmaps to the web clients.
+        The slow parts (rebuilding re-centred grids, and rendering) are done without holding bearing_lock. """
+        with self.bearing_lock:
+            _recentres = self.heatmaps.start_recentres()
+
+        for (_heatmap, _lat, _lon, _bearings) in _recentres:
+            _grid = _heatmap.build_grid(_lat, _lon, _bearings)
+            with self.bearing_lock:
+                self.heatmap_pending.add(self.heatmaps.finish_recentre(_heatmap, _lat, _lon, _bearings, _grid))
+                self.heatmap_pending.discard(None)
+
+        with self.bearing_lock:
+            _snapshots = [self.heatmaps.snapshot(_source) for _source in self.heatmap_pending]
+            self.heatmap_pending = set()
+            self.heatmap_timer = None
+            self.heatmap_last_emit = time.time()
+
+        for _snapshot in _snapshots:
+            _heatmap = render_snapshot(_snapshot)
+            _heatmap["server_timestamp"] = time.time()
+            self.sio.emit("bearing_heatmap", _heatmap, namespace="/chasemapper")
+
+    def get_heatmaps(self):
+        """ Return the current rendered heatmap for each bearing source, as a dictionary keyed by source """
+        if self.heatmaps is None:
+            return {}
+
+        with self.bearing_lock:
+            _snapshots = self.heatmaps.snapshot_all()
+
+        return {_source: render_snapshot(_snapshot) for (_source, _snapshot) in _snapshots.items()}
+
+    def queue_changes(self, add, remove, fixes, seq):
+        """ Queue changes to the bearing store, to be sent to the web clients at the end of the current window.
+
+        Args:
+            add (dict): Added bearing, or None.
+            remove (list): Keys of removed bearings.
+            fixes (list): Updated triangulated fixes.
+            seq (int): Change log sequence number of the changes, taken when the changes were made.
+        """
+        with self.bearing_lock:
+            for _key in remove:
+                if _key in self.pending_adds:
+                    # The clients have not seen this bearing yet, so don't send it at all.
+                    self.pending_adds.pop(_key)
+                    self.change_stats["bearings_cancelled"] += 1
+                else:
+                    self.pending_removes.append(_key)
+
+            if add is not None:
+                self.pending_adds[add["key"]] = add
+
+            for _fix in fixes:
+                self.pending_fixes[_fix["source"]] = _fix
+
+            # Changes from another thread may have been queued first.
+            self.pending_seq = max(self.pending_seq, seq)
+
+            if self.change_window > 0:
+                if self.change_timer is None:
+                    self.change_timer = Timer(self.change_window, self.emit_changes)
+                    self.change_timer.daemon = True
+                    self.change_timer.start()
+                return
+
+        self.emit_changes()
+
+    def emit_changes(self):
+        """ Send the queued changes to the web clients, as a single bearing_change event """
+        with self.bearing_lock:
+            _adds = list(self.pending_adds.values())
+            _removes = self.pending_removes
+            _fixes = list(self.pending_fixes.values())
+            _seq = self.pending_seq
+            self.pending_adds = OrderedDict()
+            self.pending_removes = []
+            self.pending_fixes = {}
+            self.change_timer = None
+
+        if len(_adds) > 0 or len(_removes) > 0:
+            # Only the latest raw DOA data is plotted by the clients, so don't send any earlier raw DOA data.
+            _raw_doa_seen = False
+            for _i in range(len(_adds) - 1, -1, -1):
+                if "raw_doa_q" in _adds[_i]:
+                    if _raw_doa_seen:
+                        _adds[_i] = {
+                            _k: _v for (_k, _v) in _adds[_i].items() if not _k.startswith("raw_doa_")
+                        }
+                    _raw_doa_seen = True
+
+            _client_update = {
+                "add": _adds,
+                "remove": _removes,
+                "seq": _seq,
+                "server_timestamp": time.time(),
+            }
+            self.sio.emit("bearing_change", _client_update, namespace="/chasemapper")
+
+            self.change_stats["bearing_change_events"] += 1
+            self.change_stats["bearings_added"] += len(_adds)
+            self.change_stats["bearings_removed"] += len(_removes)
+            self.change_event_times.append(time.time())
+
+        for _fix in _fixes:
+            _fix["server_timestamp"] = time.time()
+            self.sio.emit("bearing_fix", _fix, namespace="/chasemapper")
+            self.change_stats["bearing_fix_events"] += 1
+
+    def get_change_stats(self):
+        """ Return counters of the changes sent to the web clients, including the recent rate of
+        bearing_change events, in events per second.
+        """
+        _now = time.time()
+        while len(self.change_event_times) > 0 and self.change_event_times[0] < _now - 10.0:
+            self.change_event_times.popleft()
+
+        _stats = self.change_stats.copy()
+        _stats["bearing_change_rate"] = len(self.change_event_times) / 10.0
+        _stats["change_window"] = self.change_window
+        return _stats
+
+    def get_changes(self, since, instance):
+        """ Return the changes to the bearing store since a client's cursor.
+
+        Args:
+            since (int): Sequence number of the client's cursor.
+            instance (str): Instance ID of the client's cursor.
+
+        Returns:
+            dict: The new cursor ('instance', 'seq'), and 'full'. If full is True, 'bearings' is the whole bearing
+                store. Otherwise, 'add' contains the bearings added since the cursor, keyed by bearing key, and
+                'remove' lists the keys of the bearings removed since.
+        """
+        with self.bearing_lock:
+            _changes = self.change_log.changes_since(since, instance)
+            if _changes["full"]:
+                _changes["bearings"] = self.bearings.copy()
+                return _changes
+
+            _changes["add"] = {_key: self.bearings[_key] for _key in _changes.pop("updated") if _key in self.bearings}
+            _changes["remove"] = _changes.pop("removed")
+            return _changes
+
+    def get_filter_stats(self):
+        """ Return the outlier filter acceptance statistics of each bearing source, as a dictionary keyed by source """
+        if self.outlier_filter is None:
+            return {}
+
+        with self.bearing_lock:
+            return self.outlier_filter.get_stats()
+
+    def get_fixes(self):
+        """ Return the current triangulated fix for each bearing source, as a dictionary keyed by source """
+        if self.triangulator is None:
+            return {}
+
+        with self.bearing_lock:
+            return self.triangulator.get_fixes()
+
     def source_matches_delete_request(self, stored_source, requested_source):
         """Check whether a stored source matches a delete request source."""
         stored_source = str(stored_source)
@@ -438,20 +907,37 @@ class Bearings(object):
 
         self.bearing_lock.acquire()
         _removal_list = []
+        _removed_bearings = []
 
         try:
-            _bearing_list = sorted(self.bearings.keys(), key=float, reverse=True)
-
-            for _key in _bearing_list:
-                _bearing = self.bearings[_key]
-                if self.source_matches_delete_request(
-                    _bearing.get("source", ""), _source
-                ):
-                    self.bearings.pop(_key)
-                    _removal_list.append(_key)
-
-                    if len(_removal_list) >= _quantity:
-                        break
+            # Keys of the bearings from each matching source, newest at the right.
+            _orders = [
+                _order
+                for (_stored_source, _order) in self.source_order.items()
+                if self.source_matches_delete_request(_stored_source, _source)
+            ]
+
+            while len(_removal_list) < _quantity:
+                _orders = [_order for _order in _orders if len(_order) > 0]
+                if len(_orders) == 0:
+                    break
+
+                # Take the newest bearing from any of the matching sources.
+                _key = max(_orders, key=lambda _order: float(_order[-1])).pop()
+                _removed_bearings.append(self.bearings.pop(_key))
+                _removal_list.append(_key)
+
+            # Drop the keys of deleted bearings from the arrival order, if they have built up.
+            if len(self.bearing_order) > 2 * len(self.bearings) + 100:
+                self.bearing_order = deque(
+                    [_key for _key in self.bearing_order if _key in self.bearings]
+                )
+
+            for _key in _removal_list:
+                self.change_log.remove(_key)
+            _seq = self.change_log.seq
+
+            _fixes = self.update_estimates([], _removed_bearings)
         finally:
             self.bearing_lock.release()
 
@@ -468,16 +954,226 @@ class Bearings(object):
             _source,
         )
 
-        _client_update = {
-            "add": None,
-            "remove": _removal_list,
-            "server_timestamp": time.time(),
-        }
-
-        self.sio.emit("bearing_change", _client_update, namespace="/chasemapper")
+        self.queue_changes(None, _removal_list, _fixes, _seq)
+        self.schedule_heatmaps()
 
     def flush(self):
         """ Clear the bearing store """
         self.bearing_lock.acquire()
         self.bearings = {}
+        self.bearing_order = deque()
+        self.source_order = {}
+        self.change_log.reset()
+        if self.triangulator is not None:
+            self.triangulator.flush()
+        if self.heatmaps is not None:
+            self.heatmaps.flush()
+        if self.outlier_filter is not None:
+            self.outlier_filter.flush()
+        self.heatmap_pending = set()
+        # Drop any changes which have not been sent yet.
+        self.pending_adds = OrderedDict()
+        self.pending_removes = []
+        self.pending_fixes = {}
         self.bearing_lock.release()
+
+
+if __name__ == "__main__":
+    # Benchmark adding bearings to a full bearing store.
+    #   python -m chasemapper.bearings [--bearings 10000] [--count 20000]
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bearings", type=int, default=10000, help="Maximum number of stored bearings.")
+    parser.add_argument("--count", type=int, default=20000, help="Number of bearings to add.")
+    args = parser.parse_args()
+
+    class _NullSocketIO(object):
+        def emit(self, *args, **kwargs):
+            pass
+
+    _store = Bearings(socketio_instance=_NullSocketIO(), max_bearings=args.bearings, change_window=0)
+    _store.update_car_position(
+        {"time": None, "lat": -34.9, "lon": 138.6, "alt": 0.0, "heading": 90.0, "heading_valid": True, "speed": 10.0}
+    )
+
+    # Fill the store, then time adding bearings while bearings are being evicted.
+    for _i in range(args.bearings):
+        _store.add_bearing({"type": "BEARING", "bearing_type": "relative", "bearing": _i % 360, "source": "bench"})
+
+    _start = time.time()
+    for _i in range(args.count):
+        _store.add_bearing({"type": "BEARING", "bearing_type": "relative", "bearing": _i % 360, "source": "bench"})
+    _elapsed = time.time() - _start
+
+    _bearings = json.loads(json.dumps(_store.bearings))
+    _keys = list(_bearings.keys())
+    print(
+        "%d stored bearings: %.1f us per add_bearing, %d stored, keys in order: %s"
+        % (args.bearings, _elapsed / args.count * 1e6, len(_bearings), _keys == sorted(_keys, key=float))
+    )
+
+    # Time deleting the most recent bearings from one of several sources (including time-sequenced fox sources),
+    # and check the deleted bearings are the newest from the matching sources.
+    _store = Bearings(socketio_instance=_NullSocketIO(), max_bearings=args.bearings, change_window=0)
+    _sources = ["kraken", "kraken_Fox1", "kraken_Fox2", "other"]
+    for _i in range(args.bearings):
+        _store.add_bearing(
+            {"type": "BEARING", "bearing_type": "absolute", "latitude": -34.9, "longitude": 138.6,
+             "bearing": _i % 360, "source": _sources[_i % len(_sources)]}
+        )
+
+    _expected = sorted(
+        [_key for (_key, _bearing) in _store.bearings.items() if _bearing["source"] != "other"], key=float
+    )
+    # Hold the changes, so the deleted keys can be checked.
+    _store.change_window = 3600.0
+    _start = time.time()
+    for _i in range(100):
+        _store.delete_recent_bearings({"source": "kraken", "quantity": 5})
+    _elapsed = time.time() - _start
+    _deleted = _store.pending_removes
+    _store.change_timer.cancel()
+
+    print(
+        "%d stored bearings: %.1f us per delete_recent_bearings (5 bearings), %d deleted, newest first: %s"
+        % (args.bearings, _elapsed / 100 * 1e6, len(_deleted), _deleted == _expected[::-1][: len(_deleted)])
+    )
+
+    # Car driving at 100 km/h around a 500 m radius curve, with a position every second, and bearings
+    # measured 0.25 and 0.5 seconds before the latest position. Compare the bearing origins and headings
+    # with the truth.
+    from .earthmaths import position_info
+
+    def _car_pose(t):
+        _angle = 27.8 * t / 500.0
+        return (
+            -34.9 + 500.0 * np.sin(_angle) / 111000.0,
+            138.6 + 500.0 * (1 - np.cos(_angle)) / (111000.0 * np.cos(np.radians(34.9))),
+            np.degrees(np.pi / 2 - _angle) % 360.0,
+        )
+
+    for _use_timestamps in (False, True):
+        _store = Bearings(socketio_instance=_NullSocketIO(), change_window=0)
+        _position_errors = []
+        _heading_errors = []
+        # Positions are back-dated to known times (in the past, so the history stays in time order).
+        _t0 = time.time() - 1000.0
+        for _i in range(60):
+            (_lat, _lon, _heading) = _car_pose(_i)
+            _store.update_car_position(
+                {"time": None, "lat": _lat, "lon": _lon, "alt": 0.0, "heading": _heading, "heading_valid": True, "speed": 27.8}
+            )
+            _store.car_history.times[_store.car_history.end - 1] = _t0 + _i
+            if _i == 0:
+                continue
+
+            for _latency in (0.25, 0.5):
+                _bearing = {"type": "BEARING", "bearing_type": "relative", "bearing": 0.0, "source": "sim"}
+                if _use_timestamps:
+                    _bearing["timestamp"] = _t0 + _i - _latency
+                _store.add_bearing(_bearing)
+                _stored = _store.bearings[_store.bearing_order[-1]]
+                (_true_lat, _true_lon, _true_heading) = _car_pose(_i - _latency)
+                _position_errors.append(
+                    position_info((_true_lat, _true_lon, 0), (_stored["lat"], _stored["lon"], 0))["great_circle_distance"]
+                )
+                _heading_errors.append(abs((_stored["heading"] - _true_heading + 180.0) % 360.0 - 180.0))
+
+        print(
+            "%s: mean bearing origin error %.1f m, mean heading error %.2f degrees"
+            % (
+                "Fused with position history" if _use_timestamps else "Fused with latest position",
+                np.mean(_position_errors),
+                np.mean(_heading_errors),
+            )
+        )
+
+    # Size of the Socket.IO packets carrying a KrakenSDR bearing (361 angles), with the raw DOA data as JSON
+    # lists (as previously sent), and with the raw DOA data encoded.
+    from socketio import packet
+
+    class _RecordSocketIO(object):
+        def __init__(self):
+            self.events = []
+
+        def emit(self, event, data, namespace=None):
+            self.events.append((event, data))
+
+    def _packet_size(event, data):
+        _encoded = packet.Packet(packet.EVENT, data=[event, data], namespace="/chasemapper").encode()
+        if isinstance(_encoded, list):
+            return sum([len(_part) for _part in _encoded])
+        return len(_encoded)
+
+    _angles = list(range(0, 361))
+    _doa = (np.cos(np.radians(np.array(_angles) - 120.0)) * 0.4 + 0.5 + np.random.default_rng(1).normal(0, 0.02, 361)).tolist()
+    _sio = _RecordSocketIO()
+    _store = Bearings(socketio_instance=_sio, change_window=0)
+    _store.update_car_position(
+        {"time": None, "lat": -34.9, "lon": 138.6, "alt": 0.0, "heading": 90.0, "heading_valid": True, "speed": 10.0}
+    )
+    for _i in range(2):
+        _store.add_bearing(
+            {
+                "type": "BEARING",
+                "bearing_type": "relative",
+                "bearing": 120.0,
+                "confidence": 10.0,
+                "source": "krakensdr_doa",
+                "raw_bearing_angles": _angles,
+                "raw_doa": _doa,
+            }
+        )
+    _update = [_data for (_event, _data) in _sio.events if _event == "bearing_change"][-1]
+    _added = _update["add"][0]
+    _legacy = dict(_update, add=dict(_added, raw_bearing_angles=_angles, raw_doa=_doa))
+    for _field in ("raw_doa_grid", "raw_doa_q", "raw_doa_min", "raw_doa_max"):
+        _legacy["add"].pop(_field)
+    _dequantised = _added["raw_doa_min"] + np.frombuffer(_added["raw_doa_q"], dtype=np.uint8) * (
+        (_added["raw_doa_max"] - _added["raw_doa_min"]) / 255.0
+    )
+    print(
+        "bearing_change with raw DOA: %d bytes as JSON lists, %d bytes encoded (max quantisation error %.4f)"
+        % (
+            _packet_size("bearing_change", _legacy),
+            _packet_size("bearing_change", _update),
+            np.abs(_dequantised - np.array(_doa)[::-1]).max(),
+        )
+    )
+
+    # A KrakenSDR sending 10 loop-antenna bearings (stored as two bearings each) per second for 5 seconds,
+    # into a store holding 3 bearings, with and without a coalescing window.
+    for _window in (0, 0.2):
+        _sio = _RecordSocketIO()
+        _store = Bearings(socketio_instance=_sio, max_bearings=3, change_window=_window)
+        _store.update_car_position(
+            {"time": None, "lat": -34.9, "lon": 138.6, "alt": 0.0, "heading": 90.0, "heading_valid": True, "speed": 10.0}
+        )
+        for _i in range(50):
+            _store.add_bearing(
+                {"type": "BEARING", "bearing_type": "relative", "bearing": 120.0, "isloop": True, "source": "krakensdr_doa"}
+            )
+            time.sleep(0.1)
+        time.sleep(_window * 2)
+        _stats = _store.get_change_stats()
+        print(
+            "Change window %.1f s: %d bearing_change events (%.1f/s), %d bearings sent, %d removals sent, %d cancelled"
+            % (
+                _window,
+                _stats["bearing_change_events"],
+                _stats["bearing_change_rate"],
+                _stats["bearings_added"],
+                _stats["bearings_removed"],
+                _stats["bearings_cancelled"],
+            )
+        )
+
+    _history = CarPoseHistory(600)
+    for _i in range(10000):
+        _history.add(float(_i), -34.9, 138.6, 0.0, 0.0, True)
+    _start = time.time()
+    for _i in range(10000):
+        _history.interpolate(9500.5 + (_i % 90))
+    print("Position history lookup: %.1f us" % ((time.time() - _start) / 10000 * 1e6))
@@ -33,6 +33,26 @@ default_config = {
     "pred_burst": 28000,
     "show_abort": True,  # Show a prediction of an 'abort' paths (i.e. if the balloon bursts *now*)
     "pred_update_rate": 15,  # Update predictor every 15 seconds.
+    "pred_workers": 4,  # Number of prediction jobs to run concurrently.
+    "pred_timeout": 20.0,  # Deadline for each payload's prediction jobs, in seconds.
+    "pred_cache_size": 64,  # Number of prediction results to cache. 0 disables the cache.
+    "pred_min_update_rate": 2.0,  # Shortest interval between predictions for a descending payload, in seconds.
+    "pred_engine": "binary",  # Offline predictor engine - 'binary' (CUSF predictor binary) or 'inprocess'.
+    "pred_processes": 0,  # Number of in-process engine worker processes. 0 runs predictions within chasemapper.
+    "pred_ensemble_size": 0,  # Number of members in landing uncertainty ensembles. 0 disables ensembles.
+    "pred_ensemble_workers": 4,  # Number of worker processes used to run ensemble members.
+    "pred_ensemble_rate_error": 0.1,  # 1-sigma fractional error of the ensemble ascent/descent rates.
+    "pred_ensemble_burst_error": 1000.0,  # 1-sigma error of the ensemble burst altitudes, in metres.
+    "pred_path_tolerance": 10.0,  # Prediction path simplification tolerance, in metres. 0 disables simplification.
+    "pred_path_encoding": "none",  # Prediction path encoding sent to clients - 'none' or 'polyline'.
+    "pred_wind_fallback": True,  # Predict descents using the payload's ascent winds when no predictor is available.
+    # Built-in GFS downloader settings (used when model_download is 'builtin'). The download area is centred on the default map location.
+    "pred_download_latdelta": 10.0,
+    "pred_download_londelta": 10.0,
+    "pred_download_hours": 48,
+    "pred_download_model": "0p50",
+    "pred_download_connections": 4,
+    "pred_download_url": "https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod",
     # Range Rings
     "range_rings_enabled": False,
     "range_ring_quantity": 5,
@@ -52,6 +72,19 @@ default_config = {
     "bearing_custom_color": "#FF0000",
     "bearings_only_mode": False,
     "doa_confidence_threshold": 4.0,
+    "bearing_change_window": 0.2,  # seconds
+    "triangulation_enabled": True,
+    "triangulation_min_bearings": 3,
+    "heatmap_enabled": False,
+    "heatmap_extent": 20.0,  # km
+    "heatmap_resolution": 256,
+    "heatmap_sigma": 10.0,  # degrees
+    "heatmap_interval": 1.0,  # seconds
+    "outlier_filter_enabled": True,
+    "outlier_filter_threshold": 3.0,
+    "outlier_filter_min_deviation": 20.0,  # degrees
+    "outlier_filter_time_constant": 60.0,  # seconds
+    "outlier_filter_distance": 500.0,  # metres
     # TimeSync Hunting Settings (not in config file, but needs to be shared between clients)
     "time_seq_enabled": False,
     "time_seq_times": [0,0,0,0],
@@ -232,6 +265,126 @@ def parse_config_file(filename):
         logging.info("Missing ascent_rate_averaging setting, using default (10)")
         chase_config["ascent_rate_averaging"] = 10
 
+    try:
+        chase_config["pred_workers"] = config.getint("predictor", "predictor_workers")
+    except:
+        logging.info("Missing predictor_workers setting, using default (4)")
+        chase_config["pred_workers"] = 4
+
+    try:
+        chase_config["pred_timeout"] = config.getfloat("predictor", "predictor_timeout")
+    except:
+        logging.info("Missing predictor_timeout setting, using default (20 seconds)")
+        chase_config["pred_timeout"] = 20.0
+
+    try:
+        chase_config["pred_cache_size"] = config.getint("predictor", "predictor_cache_size")
+    except:
+        logging.info("Missing predictor_cache_size setting, using default (64)")
+        chase_config["pred_cache_size"] = 64
+
+    try:
+        chase_config["pred_min_update_rate"] = config.getfloat("predictor", "predictor_min_update_rate")
+    except:
+        logging.info("Missing predictor_min_update_rate setting, using default (2 seconds)")
+        chase_config["pred_min_update_rate"] = 2.0
+
+    try:
+        chase_config["pred_engine"] = config.get("predictor", "offline_engine").lower()
+        if chase_config["pred_engine"] not in ["binary", "inprocess"]:
+            logging.error("Unknown offline_engine setting %s, using default (binary)" % chase_config["pred_engine"])
+            chase_config["pred_engine"] = "binary"
+    except:
+        logging.info("Missing offline_engine setting, using default (binary)")
+        chase_config["pred_engine"] = "binary"
+
+    try:
+        chase_config["pred_processes"] = config.getint("predictor", "offline_processes")
+    except:
+        logging.info("Missing offline_processes setting, using default (0)")
+        chase_config["pred_processes"] = 0
+
+    try:
+        chase_config["pred_ensemble_size"] = config.getint("predictor", "ensemble_size")
+    except:
+        logging.info("Missing ensemble_size setting, using default (0 - disabled)")
+        chase_config["pred_ensemble_size"] = 0
+
+    try:
+        chase_config["pred_ensemble_workers"] = config.getint("predictor", "ensemble_workers")
+    except:
+        logging.info("Missing ensemble_workers setting, using default (4)")
+        chase_config["pred_ensemble_workers"] = 4
+
+    try:
+        chase_config["pred_ensemble_rate_error"] = config.getfloat("predictor", "ensemble_rate_error")
+    except:
+        logging.info("Missing ensemble_rate_error setting, using default (0.1)")
+        chase_config["pred_ensemble_rate_error"] = 0.1
+
+    try:
+        chase_config["pred_ensemble_burst_error"] = config.getfloat("predictor", "ensemble_burst_error")
+    except:
+        logging.info("Missing ensemble_burst_error setting, using default (1000 metres)")
+        chase_config["pred_ensemble_burst_error"] = 1000.0
+
+    try:
+        chase_config["pred_path_tolerance"] = config.getfloat("predictor", "path_tolerance")
+    except:
+        logging.info("Missing path_tolerance setting, using default (10 metres)")
+        chase_config["pred_path_tolerance"] = 10.0
+
+    try:
+        chase_config["pred_path_encoding"] = config.get("predictor", "path_encoding").lower()
+        if chase_config["pred_path_encoding"] not in ["none", "polyline"]:
+            logging.error("Unknown path_encoding setting %s, using default (none)" % chase_config["pred_path_encoding"])
+            chase_config["pred_path_encoding"] = "none"
+    except:
+        logging.info("Missing path_encoding setting, using default (none)")
+        chase_config["pred_path_encoding"] = "none"
+
+    try:
+        chase_config["pred_wind_fallback"] = config.getboolean("predictor", "ascent_wind_fallback")
+    except:
+        logging.info("Missing ascent_wind_fallback setting, using default (True)")
+        chase_config["pred_wind_fallback"] = True
+
+    # Built-in GFS downloader settings
+    try:
+        chase_config["pred_download_latdelta"] = config.getfloat("predictor", "download_latdelta")
+        chase_config["pred_download_londelta"] = config.getfloat("predictor", "download_londelta")
+    except:
+        logging.info("Missing download_latdelta/download_londelta settings, using default (10 degrees)")
+        chase_config["pred_download_latdelta"] = 10.0
+        chase_config["pred_download_londelta"] = 10.0
+
+    try:
+        chase_config["pred_download_hours"] = config.getint("predictor", "download_hours")
+    except:
+        logging.info("Missing download_hours setting, using default (48 hours)")
+        chase_config["pred_download_hours"] = 48
+
+    try:
+        chase_config["pred_download_model"] = config.get("predictor", "download_model")
+        if chase_config["pred_download_model"] not in ["0p50", "0p25_1hr"]:
+            logging.error("Unknown download_model setting %s, using default (0p50)" % chase_config["pred_download_model"])
+            chase_config["pred_download_model"] = "0p50"
+    except:
+        logging.info("Missing download_model setting, using default (0p50)")
+        chase_config["pred_download_model"] = "0p50"
+
+    try:
+        chase_config["pred_download_connections"] = config.getint("predictor", "download_connections")
+    except:
+        logging.info("Missing download_connections setting, using default (4)")
+        chase_config["pred_download_connections"] = 4
+
+    try:
+        chase_config["pred_download_url"] = config.get("predictor", "download_url")
+    except:
+        logging.info("Missing download_url setting, using default (NOMADS)")
+        chase_config["pred_download_url"] = "https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod"
+
     try:
         chase_config["bearings_only_mode"] = config.getboolean("bearings", "bearings_only_mode")
     except:
@@ -244,6 +397,48 @@ def parse_config_file(filename):
         logging.info("Missing DoA Confidence Threshold Setting, using default (4.0)")
         chase_config["doa_confidence_threshold"] = 4.0
 
+    try:
+        chase_config["bearing_change_window"] = config.getfloat("bearings", "bearing_change_window")
+    except:
+        logging.info("Missing bearing_change_window setting, using default (0.2 seconds)")
+        chase_config["bearing_change_window"] = 0.2
+
+    try:
+        chase_config["triangulation_enabled"] = config.getboolean("bearings", "triangulation_enabled")
+        chase_config["triangulation_min_bearings"] = config.getint("bearings", "triangulation_min_bearings")
+    except:
+        logging.info("Missing triangulation settings, using defaults (enabled, 3 bearings)")
+        chase_config["triangulation_enabled"] = True
+        chase_config["triangulation_min_bearings"] = 3
+
+    try:
+        chase_config["heatmap_enabled"] = config.getboolean("bearings", "heatmap_enabled")
+        chase_config["heatmap_extent"] = config.getfloat("bearings", "heatmap_extent")
+        chase_config["heatmap_resolution"] = config.getint("bearings", "heatmap_resolution")
+        chase_config["heatmap_sigma"] = config.getfloat("bearings", "heatmap_sigma")
+        chase_config["heatmap_interval"] = config.getfloat("bearings", "heatmap_interval")
+    except:
+        logging.info("Missing heatmap settings, using defaults (disabled)")
+        chase_config["heatmap_enabled"] = False
+        chase_config["heatmap_extent"] = 20.0
+        chase_config["heatmap_resolution"] = 256
+        chase_config["heatmap_sigma"] = 10.0
+        chase_config["heatmap_interval"] = 1.0
+
+    try:
+        chase_config["outlier_filter_enabled"] = config.getboolean("bearings", "outlier_filter_enabled")
+        chase_config["outlier_filter_threshold"] = config.getfloat("bearings", "outlier_filter_threshold")
+        chase_config["outlier_filter_min_deviation"] = config.getfloat("bearings", "outlier_filter_min_deviation")
+        chase_config["outlier_filter_time_constant"] = config.getfloat("bearings", "outlier_filter_time_constant")
+        chase_config["outlier_filter_distance"] = config.getfloat("bearings", "outlier_filter_distance")
+    except:
+        logging.info("Missing outlier filter settings, using defaults (enabled, 3 sigma)")
+        chase_config["outlier_filter_enabled"] = True
+        chase_config["outlier_filter_threshold"] = 3.0
+        chase_config["outlier_filter_min_deviation"] = 20.0
+        chase_config["outlier_filter_time_constant"] = 60.0
+        chase_config["outlier_filter_distance"] = 500.0
+
     # Telemetry Source Profiles
 
     _profile_count = config.getint("profile_selection", "profile_count")
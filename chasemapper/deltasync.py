@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Delta Synchronisation
+#
+#   Sequence numbers for changes to the server's data stores, so web clients which reconnect can request
+#   only what has changed since they last synchronised, rather than the whole store.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from threading import RLock
+
+
+class ChangeLog(object):
+    """ Record the sequence number of the latest change to each record in a keyed data store.
+
+    Every update or removal of a record increments the sequence number. A client holding a cursor (the sequence
+    number and instance ID of its last synchronisation) can then be sent just the records which have changed, and
+    the keys of the records which have been removed, since. The keys of a limited number of removed records are
+    kept - if a client's cursor is older than the oldest of these, or the store has been cleared since, or the
+    server has been restarted (a different instance ID), it must be sent the whole store.
+    """
+
+    def __init__(self, max_removals=1000):
+        """ Create a ChangeLog.
+
+        Args:
+            max_removals (int): Number of removed keys to keep.
+        """
+        # Identifies this run of the server, so cursors from a previous run are not used.
+        self.instance = "%x" % int(time.time() * 1000)
+        self.seq = 0
+        self.max_removals = max_removals
+
+        # Sequence number of the latest update of each record, oldest first.
+        self.updated = OrderedDict()
+        # Sequence number of the removal of each removed record, oldest first.
+        self.removed = OrderedDict()
+        # Removals at or before this sequence number have been forgotten.
+        self.removal_floor = 0
+
+        self.lock = RLock()
+
+    def update(self, key):
+        """ Record an addition or update of a record.
+
+        Returns:
+            int: The sequence number of the change.
+        """
+        with self.lock:
+            self.seq += 1
+            self.updated.pop(key, None)
+            self.updated[key] = self.seq
+            self.removed.pop(key, None)
+            return self.seq
+
+    def remove(self, key):
+        """ Record the removal of a record.
+
+        Returns:
+            int: The sequence number of the change.
+        """
+        with self.lock:
+            self.seq += 1
+            self.updated.pop(key, None)
+            self.removed.pop(key, None)
+            self.removed[key] = self.seq
+
+            while len(self.removed) > self.max_removals:
+                (_, self.removal_floor) = self.removed.popitem(last=False)
+
+            return self.seq
+
+    def reset(self):
+        """ Record the clearing of the whole store """
+        with self.lock:
+            self.seq += 1
+            self.updated = OrderedDict()
+            self.removed = OrderedDict()
+            self.removal_floor = self.seq
+
+    def etag(self, since=None, instance=None):
+        """ Return an entity tag for the current state of the store, or the changes since a cursor """
+        if since is None or self.full_sync_required(since, instance):
+            return "%s-%d" % (self.instance, self.seq)
+        else:
+            return "%s-%d-%d" % (self.instance, since, self.seq)
+
+    def full_sync_required(self, since, instance):
+        """ Check if a client with the supplied cursor must be sent the whole store """
+        return (instance != self.instance) or (since < self.removal_floor) or (since > self.seq)
+
+    def changes_since(self, since, instance):
+        """ Find the changes since a client's cursor.
+
+        Args:
+            since (int): Sequence number of the client's cursor.
+            instance (str): Instance ID of the client's cursor.
+
+        Returns:
+            dict: The new cursor ('instance', 'seq'), 'full' (True if the client must be sent the whole store),
+                and if not, 'updated' (dict of the sequence number of each changed key), and 'removed'
+                (list of removed keys).
+        """
+        with self.lock:
+            _changes = {"instance": self.instance, "seq": self.seq, "full": self.full_sync_required(since, instance)}
+            if _changes["full"]:
+                return _changes
+
+            _changes["updated"] = {}
+            for _key in reversed(self.updated):
+                if self.updated[_key] <= since:
+                    break
+                _changes["updated"][_key] = self.updated[_key]
+
+            _changes["removed"] = []
+            for _key in reversed(self.removed):
+                if self.removed[_key] <= since:
+                    break
+                _changes["removed"].append(_key)
+
+            return _changes
+
+
+class ArchiveChangeLog(ChangeLog):
+    """ ChangeLog for the payload telemetry archive. As well as changes to each payload, this records changes to
+    each of the payload's fields, and the points appended to its path, so a client can be sent only the changed
+    fields and the new path points.
+    """
+
+    def __init__(self, max_removals=1000):
+        ChangeLog.__init__(self, max_removals)
+        # Sequence number at which each payload was added.
+        self.created = {}
+        # Sequence number of the latest change of each field of each payload.
+        self.fields = {}
+        # Sequence number at which each point of each payload's path was added.
+        self.path_seqs = {}
+
+    def update(self, key, fields=()):
+        """ Record changes to a payload.
+
+        Args:
+            key (str): Payload callsign.
+            fields (list): Changed fields. 'path' indicates a point has been appended to the path.
+
+        Returns:
+            int: The sequence number of the change.
+        """
+        with self.lock:
+            _seq = ChangeLog.update(self, key)
+            if key not in self.created:
+                self.created[key] = _seq
+                self.fields[key] = {}
+                self.path_seqs[key] = []
+
+            for _field in fields:
+                self.fields[key][_field] = _seq
+            if "path" in fields:
+                self.path_seqs[key].append(_seq)
+
+            return _seq
+
+    def remove(self, key):
+        with self.lock:
+            self.created.pop(key, None)
+            self.fields.pop(key, None)
+            self.path_seqs.pop(key, None)
+            return ChangeLog.remove(self, key)
+
+    def reset(self):
+        with self.lock:
+            self.created = {}
+            self.fields = {}
+            self.path_seqs = {}
+            ChangeLog.reset(self)
+
+    def get_changes(self, payloads, since, instance):
+        """ Build the response to a client's request for the changes to the archive since its cursor.
+
+        Args:
+            payloads (dict): The payload telemetry archive.
+            since (int): Sequence number of the client's cursor.
+            instance (str): Instance ID of the client's cursor.
+
+        Returns:
+            dict: The new cursor ('instance', 'seq'), 'full', and 'payloads'. If full is True, payloads is the whole
+                archive. Otherwise it contains the whole entry of each payload added since the cursor, and for other
+                changed payloads, the changed fields, with the new path points as 'path_append', starting at
+                index 'path_start' of the path. 'removed' lists the callsigns of removed payloads.
+        """
+        with self.lock:
+            _changes = self.changes_since(since, instance)
+            _response = {"instance": _changes["instance"], "seq": _changes["seq"], "full": _changes["full"]}
+            if _changes["full"]:
+                _response["payloads"] = payloads
+                return _response
+
+            _response["payloads"] = {}
+            for _callsign in _changes["updated"]:
+                _payload = payloads.get(_callsign)
+                if _payload is None:
+                    continue
+
+                if self.created[_callsign] > since:
+                    _response["payloads"][_callsign] = _payload
+                    continue
+
+                _delta = {
+                    _field: _payload[_field]
+                    for (_field, _seq) in self.fields[_callsign].items()
+                    if (_seq > since) and (_field != "path")
+                }
+
+                # Only send the path points which have been recorded, in case a point is being added right now.
+                _path_seqs = self.path_seqs[_callsign]
+                _start = bisect_right(_path_seqs, since)
+                if _start < len(_path_seqs):
+                    _delta["path_start"] = _start
+                    _delta["path_append"] = _payload["path"][_start : len(_path_seqs)]
+
+                _response["payloads"][_callsign] = _delta
+
+            _response["removed"] = _changes["removed"]
+            return _response
+
+
+if __name__ == "__main__":
+    # Compare the size of a full telemetry archive with the changes a client needs after a short disconnection.
+    #   python -m chasemapper.deltasync [--points 5000]
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=5000, help="Number of points in the payload path.")
+    args = parser.parse_args()
+
+    _log = ArchiveChangeLog()
+    _payloads = {}
+    _cursor = None
+
+    for _i in range(args.points):
+        _callsign = "PAYLOAD"
+        if _callsign not in _payloads:
+            _payloads[_callsign] = {"telem": {}, "path": [], "pred_path": [], "max_alt": 0.0}
+        _position = [-34.9 + _i * 1e-4, 138.6 + _i * 1e-4, 100.0 + _i * 5.0]
+        _payloads[_callsign]["telem"] = {"callsign": _callsign, "position": _position}
+        _payloads[_callsign]["path"].append(_position)
+        _payloads[_callsign]["max_alt"] = _position[2]
+        _log.update(_callsign, ("telem", "path", "max_alt"))
+
+        if _i % 100 == 0:
+            _payloads[_callsign]["pred_path"] = [[_position[0] + _j * 1e-3, _position[1], 0.0] for _j in range(300)]
+            _log.update(_callsign, ("pred_path",))
+
+        # The client disconnects 30 points before the end.
+        if _i == args.points - 31:
+            _cursor = (_log.seq, _log.instance)
+
+    _full = json.dumps(_log.get_changes(_payloads, 0, None))
+    _delta = json.loads(json.dumps(_log.get_changes(_payloads, _cursor[0], _cursor[1])))
+    _delta_size = len(json.dumps(_delta))
+    _delta_fields = sorted(_delta["payloads"]["PAYLOAD"].keys())
+
+    # Apply the changes to a copy of the archive as the client held it, and check it matches.
+    _client = json.loads(json.dumps(_payloads))
+    del _client["PAYLOAD"]["path"][-30:]
+    for (_callsign, _changes) in _delta["payloads"].items():
+        _path = _client[_callsign]["path"][: _changes.pop("path_start")] + _changes.pop("path_append")
+        _client[_callsign].update(_changes)
+        _client[_callsign]["path"] = _path
+
+    print(
+        "%d point path: full archive %d bytes, changes since cursor %d bytes (%s), client archive matches: %s"
+        % (
+            args.points,
+            len(_full),
+            _delta_size,
+            ", ".join(_delta_fields),
+            _client == json.loads(json.dumps(_payloads)),
+        )
+    )
@@ -7,8 +7,13 @@
 #   Released under GNU GPL v3 or later
 #
 
+import numpy as np
 from math import radians, degrees, sin, cos, atan2, sqrt, pi
 
+# Earth:
+# EARTH_RADIUS = 6371000.0
+EARTH_RADIUS = 6364963.0  # Optimized for Australia :-)
+
 
 def position_info(listener, balloon):
     """
@@ -28,9 +33,7 @@ def position_info(listener, balloon):
     in degrees, and input altitudes and output distances are in meters.
     """
 
-    # Earth:
-    # radius = 6371000.0
-    radius = 6364963.0  # Optimized for Australia :-)
+    radius = EARTH_RADIUS
 
     (lat1, lon1, alt1) = listener
     (lat2, lon2, alt2) = balloon
@@ -95,6 +98,93 @@ def position_info(listener, balloon):
     }
 
 
+def bearing_distance(listener, balloon):
+    """
+    Lightweight version of position_info, which only calculates the bearing
+    (in degrees, 0 <= b < 360) and great circle distance (in metres) between
+    two (lat, lon, alt) tuples. Altitudes are ignored.
+
+    Returns a tuple of (bearing, great_circle_distance)
+    """
+    lat1 = radians(listener[0])
+    lat2 = radians(balloon[0])
+    d_lon = radians(balloon[1]) - radians(listener[1])
+
+    _cos_lat2 = cos(lat2)
+    _cos_d_lon = cos(d_lon)
+    sa = _cos_lat2 * sin(d_lon)
+    sb = (cos(lat1) * sin(lat2)) - (sin(lat1) * _cos_lat2 * _cos_d_lon)
+    bearing = atan2(sa, sb)
+    aa = sqrt((sa ** 2) + (sb ** 2))
+    ab = (sin(lat1) * sin(lat2)) + (cos(lat1) * _cos_lat2 * _cos_d_lon)
+
+    if bearing < 0:
+        bearing += 2 * pi
+
+    return (degrees(bearing), atan2(aa, ab) * EARTH_RADIUS)
+
+
+def position_info_array(lat1, lon1, alt1, lat2, lon2, alt2):
+    """
+    Vectorised version of position_info, for calculating information between
+    N pairs of points in one call. Inputs can be numpy arrays or anything that
+    broadcasts against them (e.g. a single listener position against an array
+    of balloon positions).
+
+    Returns a dict of numpy arrays:
+
+     - bearing (degrees, 0 <= b < 360)
+     - great_circle_distance (metres)
+     - straight_distance (metres)
+     - elevation (degrees)
+     - angle_at_centre (degrees)
+    """
+    radius = EARTH_RADIUS
+
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+    alt1 = np.asarray(alt1, dtype=np.float64)
+    alt2 = np.asarray(alt2, dtype=np.float64)
+
+    # Refer position_info for the derivation of the following.
+    d_lon = lon2 - lon1
+    _cos_lat1 = np.cos(lat1)
+    _sin_lat1 = np.sin(lat1)
+    _cos_lat2 = np.cos(lat2)
+    _sin_lat2 = np.sin(lat2)
+    _cos_d_lon = np.cos(d_lon)
+
+    sa = _cos_lat2 * np.sin(d_lon)
+    sb = (_cos_lat1 * _sin_lat2) - (_sin_lat1 * _cos_lat2 * _cos_d_lon)
+    bearing = np.arctan2(sa, sb)
+    aa = np.sqrt((sa ** 2) + (sb ** 2))
+    ab = (_sin_lat1 * _sin_lat2) + (_cos_lat1 * _cos_lat2 * _cos_d_lon)
+    angle_at_centre = np.arctan2(aa, ab)
+    great_circle_distance = angle_at_centre * radius
+
+    ta = radius + alt1
+    tb = radius + alt2
+    _cos_angle = np.cos(angle_at_centre)
+    ea = (_cos_angle * tb) - ta
+    eb = np.sin(angle_at_centre) * tb
+    elevation = np.arctan2(ea, eb)
+
+    distance = np.sqrt((ta ** 2) + (tb ** 2) - 2 * tb * ta * _cos_angle)
+
+    # Give a bearing in range 0 <= b < 2pi
+    bearing = np.mod(bearing, 2 * pi)
+
+    return {
+        "bearing": np.degrees(bearing),
+        "great_circle_distance": great_circle_distance,
+        "straight_distance": distance,
+        "elevation": np.degrees(elevation),
+        "angle_at_centre": np.degrees(angle_at_centre),
+    }
+
+
 def bearing_to_cardinal(bearing):
     """ Convert a bearing in degrees to a 16-point cardinal direction """
     bearing = bearing % 360.0
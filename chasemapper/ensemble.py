@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Landing Uncertainty Ensembles
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import logging
+import multiprocessing
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait
+from threading import Lock
+from .earthmaths import EARTH_RADIUS
+
+
+# Predictor instances within each worker process, keyed by (bin_path, gfs_path).
+# Creating a Predictor runs the binary to check its version, so only do this once per worker.
+_worker_predictors = {}
+
+
+def _run_ensemble_member(bin_path, gfs_path, params):
+    """ Run a single ensemble member prediction. This is run within a worker process.
+
+    Returns the landing position as [lat, lon, alt], or None if the prediction failed.
+    """
+    _key = (bin_path, gfs_path)
+    if _key not in _worker_predictors:
+        from cusfpredict.predict import Predictor
+
+        _worker_predictors[_key] = Predictor(bin_path=bin_path, gfs_path=gfs_path)
+
+    _path = _worker_predictors[_key].predict(**params)
+
+    if len(_path) > 1:
+        return _path[-1][1:4]
+    else:
+        return None
+
+
+def perturb_parameters(
+    count,
+    ascent_rate,
+    descent_rate,
+    burst_alt,
+    launch_alt=0.0,
+    rate_error=0.1,
+    burst_error=1000.0,
+    rng=None,
+):
+    """ Generate a set of perturbed flight parameters for an ensemble.
+
+    Ascent and descent rates are perturbed by a normally distributed fractional error, and the burst altitude
+    by a normally distributed error in metres.
+
+    Args:
+        count (int): Number of ensemble members.
+        ascent_rate (float): Nominal ascent rate, in m/s.
+        descent_rate (float): Nominal (sea level) descent rate, in m/s.
+        burst_alt (float): Nominal burst altitude, in metres.
+        launch_alt (float): Current altitude, in metres. Burst altitudes are kept above this.
+        rate_error (float): 1-sigma fractional error of the ascent and descent rates.
+        burst_error (float): 1-sigma error of the burst altitude, in metres.
+        rng (numpy.random.Generator): Random number generator to use.
+
+    Returns:
+        tuple: (ascent_rates, descent_rates, burst_alts) arrays.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    _ascent_rates = ascent_rate * (1.0 + rate_error * rng.standard_normal(count))
+    _descent_rates = descent_rate * (1.0 + rate_error * rng.standard_normal(count))
+    _burst_alts = burst_alt + burst_error * rng.standard_normal(count)
+
+    # Keep the perturbed parameters physically sensible.
+    _ascent_rates = np.maximum(_ascent_rates, 0.1)
+    _descent_rates = np.maximum(_descent_rates, 0.5)
+    _burst_alts = np.maximum(_burst_alts, launch_alt + 100.0)
+
+    return (_ascent_rates, _descent_rates, _burst_alts)
+
+
+def convex_hull(points):
+    """ Compute the convex hull of a set of 2D points (Andrew's monotone chain).
+
+    Args:
+        points (numpy.ndarray): N x 2 array of points.
+
+    Returns:
+        numpy.ndarray: The hull vertices, in counter-clockwise order.
+    """
+    _points = np.unique(points, axis=0)
+    if len(_points) < 3:
+        return _points
+
+    def _cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    _lower = []
+    for _p in _points:
+        while len(_lower) >= 2 and _cross(_lower[-2], _lower[-1], _p) <= 0:
+            _lower.pop()
+        _lower.append(_p)
+
+    _upper = []
+    for _p in _points[::-1]:
+        while len(_upper) >= 2 and _cross(_upper[-2], _upper[-1], _p) <= 0:
+            _upper.pop()
+        _upper.append(_p)
+
+    return np.array(_lower[:-1] + _upper[:-1])
+
+
+def landing_scatter_summary(
+    lats, lons, percentiles=(50, 90), confidence=0.95, ellipse_points=64
+):
+    """ Summarise a scatter of ensemble landing positions.
+
+    The landing positions are projected onto a local tangent plane (in metres) about their mean, and
+    summarised by a covariance ellipse, and by percentile contours. Each percentile contour is the
+    convex hull of that percentage of the landings closest to the mean (by Mahalanobis distance).
+
+    Args:
+        lats (array): Landing latitudes, in degrees.
+        lons (array): Landing longitudes, in degrees.
+        percentiles (tuple): Percentile contours to produce.
+        confidence (float): Confidence level of the covariance ellipse.
+        ellipse_points (int): Number of points in the ellipse polygon.
+
+    Returns:
+        dict: Summary, with polygons as lists of [lat, lon] points.
+    """
+    _lats = np.asarray(lats, dtype=np.float64)
+    _lons = np.asarray(lons, dtype=np.float64)
+
+    _lat0 = np.mean(_lats)
+    _lon0 = np.mean(_lons)
+
+    # Project onto a local tangent plane about the mean landing position.
+    _scale_y = np.radians(1.0) * EARTH_RADIUS
+    _scale_x = _scale_y * np.cos(np.radians(_lat0))
+    _xy = np.vstack(((_lons - _lon0) * _scale_x, (_lats - _lat0) * _scale_y))
+
+    def _to_latlon(xy):
+        return np.column_stack(
+            (_lat0 + xy[1] / _scale_y, _lon0 + xy[0] / _scale_x)
+        ).tolist()
+
+    _cov = np.cov(_xy)
+    _eigvals, _eigvecs = np.linalg.eigh(_cov)
+    _eigvals = np.maximum(_eigvals, 0.0)
+
+    # Scale the 1-sigma ellipse out to the requested confidence level (chi-squared, 2 degrees of freedom).
+    _k = np.sqrt(-2.0 * np.log(1.0 - confidence))
+    _semi_minor, _semi_major = _k * np.sqrt(_eigvals)
+    _major_axis = _eigvecs[:, 1]
+    # Orientation of the major axis, in degrees clockwise from north.
+    _orientation = np.degrees(np.arctan2(_major_axis[0], _major_axis[1])) % 180.0
+
+    _theta = np.linspace(0, 2 * np.pi, ellipse_points, endpoint=False)
+    _circle = np.vstack((np.cos(_theta), np.sin(_theta)))
+    _ellipse = _eigvecs @ (_k * np.sqrt(_eigvals)[:, np.newaxis] * _circle)
+
+    # Mahalanobis distance of each landing from the mean.
+    _dist = np.sqrt(np.sum(_xy * (np.linalg.pinv(_cov) @ _xy), axis=0))
+    _order = np.argsort(_dist)
+
+    _contours = []
+    for _percentile in percentiles:
+        _count = max(1, int(np.ceil(len(_order) * _percentile / 100.0)))
+        _hull = convex_hull(_xy[:, _order[:_count]].T)
+        _contours.append({"percentile": _percentile, "polygon": _to_latlon(_hull.T)})
+
+    return {
+        "count": len(_lats),
+        "mean": [float(_lat0), float(_lon0)],
+        "ellipse": {
+            "confidence": confidence,
+            "semi_major": float(_semi_major),
+            "semi_minor": float(_semi_minor),
+            "orientation": float(_orientation),
+            "polygon": _to_latlon(_ellipse),
+        },
+        "contours": _contours,
+        "landings": np.column_stack((_lats, _lons)).tolist(),
+    }
+
+
+class EnsemblePredictor(object):
+    """ Run Monte Carlo ensembles of offline predictions, to estimate the uncertainty of a landing prediction.
+
+    Each ensemble member is run with perturbed ascent rate, descent rate and burst altitude, and the
+    members are run in parallel on a pool of worker processes.
+    """
+
+    def __init__(
+        self,
+        bin_path="./pred",
+        gfs_path="./gfs/",
+        size=50,
+        workers=4,
+        rate_error=0.1,
+        burst_error=1000.0,
+    ):
+        """ Create an EnsemblePredictor. The worker processes are started when the first ensemble is run.
+
+        Args:
+            bin_path (str): Path to the CUSF predictor binary.
+            gfs_path (str): Path to the GFS data directory.
+            size (int): Number of ensemble members.
+            workers (int): Number of worker processes.
+            rate_error (float): 1-sigma fractional error of the ascent and descent rates.
+            burst_error (float): 1-sigma error of the burst altitude, in metres.
+        """
+        self.bin_path = bin_path
+        self.gfs_path = gfs_path
+        self.size = size
+        self.workers = workers
+        self.rate_error = rate_error
+        self.burst_error = burst_error
+
+        # Use spawned (rather than forked) workers, as we are running within a multi-threaded server.
+        # (ProcessPoolExecutor only accepts a multiprocessing context from Python 3.7.)
+        _executor_args = {}
+        if sys.version_info >= (3, 7):
+            _executor_args["mp_context"] = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(max_workers=workers, **_executor_args)
+
+        # Ensemble members of any ensembles being run, so they can be cancelled on shutdown.
+        self.pending = set()
+        self.lock = Lock()
+
+    def run(
+        self,
+        launch_time,
+        launch_lat,
+        launch_lon,
+        launch_alt,
+        ascent_rate,
+        descent_rate,
+        burst_alt,
+        descent_mode,
+        timeout=None,
+    ):
+        """ Run an ensemble of predictions about the supplied flight parameters.
+
+        Returns:
+            dict: The landing scatter summary (see landing_scatter_summary), or None if fewer than
+                three ensemble members produced a landing position.
+        """
+        (_ascent_rates, _descent_rates, _burst_alts) = perturb_parameters(
+            self.size,
+            ascent_rate,
+            descent_rate,
+            burst_alt,
+            launch_alt=launch_alt,
+            rate_error=self.rate_error,
+            burst_error=self.burst_error,
+        )
+
+        _start = time.time()
+        _futures = []
+        for i in range(self.size):
+            _params = {
+                "launch_lat": launch_lat,
+                "launch_lon": launch_lon,
+                "launch_alt": launch_alt,
+                "ascent_rate": float(_ascent_rates[i]),
+                "descent_rate": float(_descent_rates[i]),
+                "burst_alt": float(_burst_alts[i]),
+                "launch_time": launch_time,
+                "descent_mode": descent_mode,
+            }
+            _futures.append(
+                self.executor.submit(
+                    _run_ensemble_member, self.bin_path, self.gfs_path, _params
+                )
+            )
+
+        with self.lock:
+            self.pending.update(_futures)
+
+        (_done, _not_done) = wait(_futures, timeout=timeout)
+        for _future in _not_done:
+            _future.cancel()
+
+        with self.lock:
+            self.pending.difference_update(_futures)
+
+        _landings = []
+        for _future in _done:
+            try:
+                _landing = _future.result()
+            except Exception as e:
+                logging.debug("Ensemble - Member prediction failed - %s" % str(e))
+                continue
+
+            if _landing is not None:
+                _landings.append(_landing)
+
+        logging.info(
+            "Ensemble - %d/%d members completed in %.1f seconds."
+            % (len(_landings), self.size, time.time() - _start)
+        )
+
+        if len(_landings) < 3:
+            return None
+
+        _landings = np.array(_landings)
+        _summary = landing_scatter_summary(_landings[:, 0], _landings[:, 1])
+        _summary["size"] = self.size
+        return _summary
+
+    def close(self):
+        """ Shut down the worker processes, once any running ensemble members have finished """
+        # Cancel the ensemble members which haven't started yet. (Executor.shutdown only does this itself from
+        # Python 3.9.)
+        with self.lock:
+            for _future in self.pending:
+                _future.cancel()
+
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    # Landing scatter summary of a synthetic ensemble, and (if a predictor binary and GFS data are
+    # available) ensemble run times against the number of worker processes.
+    #   python -m chasemapper.ensemble [pred_binary gfs_directory]
+    import sys
+    from datetime import datetime, timezone
+
+    _rng = np.random.default_rng(1)
+    _lats = -34.9 + 0.05 * _rng.standard_normal(200)
+    _lons = 138.6 + 0.1 * _rng.standard_normal(200) + 0.5 * (_lats + 34.9)
+    _summary = landing_scatter_summary(_lats, _lons)
+    print(
+        "Synthetic ensemble: mean %.4f, %.4f, %d%% ellipse %.0f x %.0f m, orientation %.0f deg"
+        % (
+            _summary["mean"][0],
+            _summary["mean"][1],
+            _summary["ellipse"]["confidence"] * 100,
+            _summary["ellipse"]["semi_major"],
+            _summary["ellipse"]["semi_minor"],
+            _summary["ellipse"]["orientation"],
+        )
+    )
+    for _contour in _summary["contours"]:
+        print(
+            "  %d%% contour: %d vertices"
+            % (_contour["percentile"], len(_contour["polygon"]))
+        )
+
+    _start = time.perf_counter()
+    for i in range(100):
+        landing_scatter_summary(_lats, _lons)
+    print(
+        "landing_scatter_summary (200 members): %.2f ms"
+        % ((time.perf_counter() - _start) * 10)
+    )
+
+    if len(sys.argv) == 3:
+        for _workers in (1, 2, 4, 8):
+            _ensemble = EnsemblePredictor(
+                bin_path=sys.argv[1], gfs_path=sys.argv[2], size=48, workers=_workers
+            )
+            # Warm up the worker processes.
+            _ensemble.run(datetime.now(timezone.utc), -34.9, 138.6, 100, 5.0, 6.0, 30000, False)
+            _start = time.time()
+            _ensemble.run(datetime.now(timezone.utc), -34.9, 138.6, 100, 5.0, 6.0, 30000, False)
+            print("48 member ensemble, %d workers: %.2f s" % (_workers, time.time() - _start))
+            _ensemble.close()
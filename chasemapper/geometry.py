@@ -8,8 +8,22 @@
 import traceback
 import logging
 import numpy as np
+from collections import deque
+from datetime import datetime, timezone
 from .atmosphere import *
-from .earthmaths import position_info
+from .earthmaths import bearing_distance
+
+
+def datetime_to_epoch(dt):
+    """ Convert a datetime object to a UTC epoch timestamp. Naive datetimes are assumed to be in UTC. """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def epoch_to_datetime(epoch):
+    """ Convert a UTC epoch timestamp back to a timezone-aware datetime object """
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
 
 
 class GenericTrack(object):
@@ -18,9 +32,48 @@ class GenericTrack(object):
     Telemetry is added using the add_telemetry method, which takes a dictionary with time/lat/lon/alt keys (at minimum).
     This object performs a running average of the ascent/descent rate, and calculates the predicted landing rate if the payload
     is in descent.
-    The track history can be exported to a LineString using the to_line_string method.
+    The track history can be exported to a Leaflet-compatible polyline using the to_polyline method.
+
+    Track history is stored column-wise in growable numpy arrays (epoch time, lat, lon, alt), with
+    comments interned into a small lookup table, so that long chases do not build up huge numbers
+    of boxed Python objects.
     """
 
+    __slots__ = (
+        "ASCENT_AVERAGING",
+        "landing_rate",
+        "heading_gate_threshold",
+        "turn_rate_threshold",
+        "ascent_rate",
+        "heading",
+        "turn_rate",
+        "heading_valid",
+        "speed",
+        "is_descending",
+        "supplied_heading",
+        "heading_status",
+        "prev_heading",
+        "prev_time",
+        "_times",
+        "_lats",
+        "_lons",
+        "_alts",
+        "_comment_ids",
+        "_comment_table",
+        "_comment_lookup",
+        "_length",
+        "_latest_time",
+        "_rate_window",
+        "_rate_sum",
+        "_rate_count",
+        "_step_time_delta",
+        "_step_bearing",
+        "_step_distance",
+    )
+
+    # Initial number of points allocated for the track arrays. Capacity is doubled as required.
+    INITIAL_CAPACITY = 256
+
     def __init__(
         self, ascent_averaging=6, landing_rate=5.0, heading_gate_threshold=0.0, turn_rate_threshold=4.0
     ):
@@ -47,11 +100,67 @@ class GenericTrack(object):
 
 
         self.prev_heading = 0.0
+        # Epoch time of the previous heading.
         self.prev_time = 0.0
 
         # Internal store of track history data.
-        # Data is stored as a list-of-lists, with elements of [datetime, lat, lon, alt, comment]
-        self.track_history = []
+        # Data is stored column-wise, with one array each for epoch time, lat, lon and alt.
+        # Only the first self._length entries of each array are valid.
+        self._times = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._lats = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._lons = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._alts = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        # Comments are nearly always identical for a track (e.g. the callsign), so store an
+        # index into a table of unique comment strings.
+        self._comment_ids = np.empty(self.INITIAL_CAPACITY, dtype=np.int32)
+        self._comment_table = []
+        self._comment_lookup = {}
+        self._length = 0
+        # Keep the most recent datetime object as supplied, so it can be passed back out unmodified.
+        self._latest_time = None
+
+        # Running ascent rate window. Holds the per-step ascent rates between the most recent
+        # ASCENT_AVERAGING points (None for zero time-steps), along with a running sum and count
+        # of the valid entries, so the average can be updated in constant time.
+        self._rate_window = deque()
+        self._rate_sum = 0.0
+        self._rate_count = 0
+
+        # Time, bearing and distance between the two most recent points.
+        # These are calculated once per point and shared by the speed and heading calculations.
+        self._step_time_delta = 0.0
+        self._step_bearing = None
+        self._step_distance = None
+
+    def _grow(self):
+        """ Double the capacity of the track arrays """
+        _new_capacity = max(self.INITIAL_CAPACITY, 2 * len(self._times))
+
+        for _name in ("_times", "_lats", "_lons", "_alts", "_comment_ids"):
+            _old = getattr(self, _name)
+            _new = np.empty(_new_capacity, dtype=_old.dtype)
+            _new[: self._length] = _old[: self._length]
+            setattr(self, _name, _new)
+
+    def _append_point(self, time_dt, lat, lon, alt, comment):
+        """ Append a single point onto the end of the track arrays """
+        if self._length == len(self._times):
+            self._grow()
+
+        _comment_id = self._comment_lookup.get(comment)
+        if _comment_id is None:
+            _comment_id = len(self._comment_table)
+            self._comment_table.append(comment)
+            self._comment_lookup[comment] = _comment_id
+
+        _i = self._length
+        self._times[_i] = datetime_to_epoch(time_dt)
+        self._lats[_i] = lat
+        self._lons[_i] = lon
+        self._alts[_i] = alt
+        self._comment_ids[_i] = _comment_id
+        self._length += 1
+        self._latest_time = time_dt
 
     def add_telemetry(self, data_dict):
         """ 
@@ -69,15 +178,15 @@ class GenericTrack(object):
             else:
                 _comment = ""
 
-            self.track_history.append([_datetime, _lat, _lon, _alt, _comment])
+            self._append_point(_datetime, _lat, _lon, _alt, _comment)
 
             # If we have been supplied a 'true' heading with the position, override the state to use that.
             # In this case we are assuming that the heading is being provided by some form of magnetic compass,
             # and is valid even when the car is stationary.
             if "heading" in data_dict:
                 # Rotate heading data if we have enough data
-                if len(self.track_history) >=2:
-                    self.prev_time = self.track_history[-2][0]
+                if self._length >=2:
+                    self.prev_time = self._times[self._length - 2]
                     self.prev_heading = self.heading
 
                 self.heading = data_dict["heading"]
@@ -95,15 +204,15 @@ class GenericTrack(object):
     def get_latest_state(self):
         """ Get the latest position of the payload """
 
-        if len(self.track_history) == 0:
+        if self._length == 0:
             return None
         else:
-            _latest_position = self.track_history[-1]
+            _i = self._length - 1
             _state = {
-                "time": _latest_position[0],
-                "lat": _latest_position[1],
-                "lon": _latest_position[2],
-                "alt": _latest_position[3],
+                "time": self._latest_time,
+                "lat": float(self._lats[_i]),
+                "lon": float(self._lons[_i]),
+                "alt": float(self._alts[_i]),
                 "ascent_rate": self.ascent_rate,
                 "is_descending": self.is_descending,
                 "landing_rate": self.landing_rate,
@@ -115,138 +224,147 @@ class GenericTrack(object):
             }
             return _state
 
+    def get_track_point(self, index):
+        """ Get a single track point as a [datetime, lat, lon, alt, comment] list. Negative indexes are supported.
+        The datetime is always timezone-aware (UTC). """
+        if index < 0:
+            index += self._length
+
+        if (index < 0) or (index >= self._length):
+            raise IndexError("Track point index out of range")
+
+        return [
+            epoch_to_datetime(self._times[index]),
+            float(self._lats[index]),
+            float(self._lons[index]),
+            float(self._alts[index]),
+            self._comment_table[self._comment_ids[index]],
+        ]
+
+    def get_track_arrays(self):
+        """ Get read-only views of the track history, as a tuple of (epoch times, lats, lons, alts) numpy arrays """
+        _views = []
+        for _array in (self._times, self._lats, self._lons, self._alts):
+            _view = _array[: self._length]
+            _view.flags.writeable = False
+            _views.append(_view)
+
+        return tuple(_views)
+
+    def _update_step(self):
+        """ Update the step (latest point vs previous point) quantities, and the running ascent rate window.
+        This performs at most one geodesic calculation per point.
+        """
+        if self._length <= 1:
+            return
+
+        _i = self._length - 1
+        _lat_1 = float(self._lats[_i - 1])
+        _lon_1 = float(self._lons[_i - 1])
+        _alt_1 = float(self._alts[_i - 1])
+        _lat_2 = float(self._lats[_i])
+        _lon_2 = float(self._lons[_i])
+        _alt_2 = float(self._alts[_i])
+
+        self._step_time_delta = float(self._times[_i] - self._times[_i - 1])
+
+        try:
+            (self._step_bearing, self._step_distance) = bearing_distance(
+                (_lat_1, _lon_1, _alt_1), (_lat_2, _lon_2, _alt_2)
+            )
+        except ValueError:
+            logging.debug("Math Domain Error in step calculation - Identical Sequential Positions")
+            self._step_bearing = None
+            self._step_distance = None
+
+        # Update the ascent rate window.
+        if self._step_time_delta == 0:
+            logging.warning(
+                "Zero time-step encountered in ascent rate calculation - are multiple receivers reporting telemetry simultaneously?"
+            )
+            _rate = None
+        else:
+            _rate = (_alt_2 - _alt_1) / self._step_time_delta
+            self._rate_sum += _rate
+            self._rate_count += 1
+
+        self._rate_window.append(_rate)
+
+        # The window covers the steps between the last ASCENT_AVERAGING points.
+        while len(self._rate_window) > max(1, self.ASCENT_AVERAGING - 1):
+            _old_rate = self._rate_window.popleft()
+            if _old_rate is not None:
+                self._rate_sum -= _old_rate
+                self._rate_count -= 1
+
+        if self._rate_count == 0:
+            # Reset the running sum to avoid accumulating rounding error.
+            self._rate_sum = 0.0
+
     def calculate_ascent_rate(self):
         """ Calculate the ascent/descent rate of the payload based on the available data """
-        if len(self.track_history) <= 1:
+        if (self._length <= 1) or (self._rate_count == 0):
             return 0.0
-        elif len(self.track_history) == 2:
-            # Basic ascent rate case - only 2 samples.
-            _time_delta = (
-                self.track_history[-1][0] - self.track_history[-2][0]
-            ).total_seconds()
-            _altitude_delta = self.track_history[-1][3] - self.track_history[-2][3]
 
-            if _time_delta == 0:
-                logging.warning(
-                    "Zero time-step encountered in ascent rate calculation - are multiple receivers reporting telemetry simultaneously?"
-                )
-                return 0.0
-            else:
-                return _altitude_delta / _time_delta
-
-        else:
-            _num_samples = min(len(self.track_history), self.ASCENT_AVERAGING)
-            _asc_rates = []
-
-            for _i in range(-1 * (_num_samples - 1), 0):
-                _time_delta = (
-                    self.track_history[_i][0] - self.track_history[_i - 1][0]
-                ).total_seconds()
-                _altitude_delta = (
-                    self.track_history[_i][3] - self.track_history[_i - 1][3]
-                )
-                try:
-                    _asc_rates.append(_altitude_delta / _time_delta)
-                except ZeroDivisionError:
-                    logging.warning(
-                        "Zero time-step encountered in ascent rate calculation - are multiple receivers reporting telemetry simultaneously?"
-                    )
-                    continue
-            
-            # _mean2_time_delta = (
-            #         self.track_history[-1][0] - self.track_history[-1*_num_samples][0]
-            #     ).total_seconds()
-            
-            # _mean2_altitude_delta = (
-            #         self.track_history[-1][3] - self.track_history[-1*_num_samples][3]
-            #     )
-            
-            # _asc_rate2 = _mean2_altitude_delta / _mean2_time_delta
-
-            #print(f"asc_rates: {_asc_rates}, Mean: {np.mean(_asc_rates)}")
-            return np.mean(_asc_rates)
+        return self._rate_sum / self._rate_count
 
     def calculate_heading(self):
         """ Calculate the heading of the payload """
-        if len(self.track_history) <= 1:
+        if self._length <= 1:
             return 0.0
         else:
-            _pos_1 = self.track_history[-2]
-            _pos_2 = self.track_history[-1]
-            
             # Save previous heading.
             self.prev_heading = self.heading
-            self.prev_time = _pos_1[0]
+            self.prev_time = self._times[self._length - 2]
 
-            # Calculate new heading
-            try:
-                _pos_info = position_info(
-                    (_pos_1[1], _pos_1[2], _pos_1[3]), (_pos_2[1], _pos_2[2], _pos_2[3])
-                )
-            except ValueError:
-                logging.debug("Math Domain Error in heading calculation - Identical Sequential Positions")
+            if self._step_bearing is None:
                 return self.heading
 
-            self.heading = _pos_info["bearing"]
+            self.heading = self._step_bearing
 
             return self.heading
 
 
     def calculate_speed(self):
         """ Calculate Payload Speed in metres per second """
-        if len(self.track_history) <= 1:
+        if (self._length <= 1) or (self._step_distance is None):
             return 0.0
-        else:
-            _time_delta = (
-                self.track_history[-1][0] - self.track_history[-2][0]
-            ).total_seconds()
-            _pos_1 = self.track_history[-2]
-            _pos_2 = self.track_history[-1]
 
+        if self._step_time_delta == 0:
+            logging.warning(
+                "Zero time-step encountered in speed calculation - are multiple receivers reporting telemetry simultaneously?"
+            )
+            return 0.0
 
-            try:
-                _pos_info = position_info(
-                    (_pos_1[1], _pos_1[2], _pos_1[3]), (_pos_2[1], _pos_2[2], _pos_2[3])
-                )
-            except ValueError:
-                logging.debug("Math Domain Error in speed calculation - Identical Sequential Positions")
-                return 0.0
-
-            try:
-                _speed = _pos_info["great_circle_distance"] / _time_delta
-            except ZeroDivisionError:
-                logging.warning(
-                    "Zero time-step encountered in speed calculation - are multiple receivers reporting telemetry simultaneously?"
-                )
-                return 0.0
-
-            return _speed
+        return self._step_distance / self._step_time_delta
 
 
     def calculate_turn_rate(self):
         """ Calculate heading rate based on previous heading and current heading """
-        if len(self.track_history) > 2:
+        if self._length > 2:
             # Grab current time
-            _current_time = self.track_history[-1][0]
+            _current_time = self._times[self._length - 1]
 
-            _time_delta = (_current_time - self.prev_time).total_seconds()
+            _time_delta = _current_time - self.prev_time
 
             _heading_delta = (self.heading - self.prev_heading) % 360.0
             if _heading_delta >= 180.0:
                 _heading_delta -= 360.0
 
-            try:
-                self.turn_rate = abs(_heading_delta)/_time_delta
-            except ZeroDivisionError:
+            if _time_delta == 0:
                 logging.warning(
                     "Zero time-step encountered in turn rate calculation - are multiple receivers reporting telemetry simultaneously?"
                 )
+            else:
+                self.turn_rate = float(abs(_heading_delta) / _time_delta)
 
             return self.turn_rate
 
 
     def update_states(self):
         """ Update internal states based on the current data """
+        self._update_step()
+
         self.ascent_rate = self.calculate_ascent_rate()
         self.speed = self.calculate_speed()
 
@@ -274,26 +392,85 @@ class GenericTrack(object):
         self.is_descending = self.ascent_rate < 0.0
 
         if self.is_descending:
-            _current_alt = self.track_history[-1][3]
+            _current_alt = float(self._alts[self._length - 1])
             self.landing_rate = seaLevelDescentRate(self.ascent_rate, _current_alt)
 
     def to_polyline(self):
         """ Generate and return a Leaflet PolyLine compatible array """
-        # Copy array into a numpy representation for easier slicing.
-        if len(self.track_history) == 0:
+        if self._length == 0:
             return []
-        elif len(self.track_history) == 1:
+        elif self._length == 1:
             # LineStrings need at least 2 points. If we only have a single point,
             # fudge it by duplicating the single point.
-            _track_data_np = np.array([self.track_history[0], self.track_history[0]])
-        else:
-            _track_data_np = np.array(self.track_history)
+            _point = [float(self._lats[0]), float(self._lons[0]), float(self._alts[0])]
+            return [_point, list(_point)]
+
         # Produce new array
         _track_points = np.column_stack(
-            (_track_data_np[:, 1], _track_data_np[:, 2], _track_data_np[:, 3])
+            (
+                self._lats[: self._length],
+                self._lons[: self._length],
+                self._alts[: self._length],
+            )
         )
 
         return _track_points.tolist()
 
     def length(self):
-        return len(self.track_history)
+        return self._length
+
+
+if __name__ == "__main__":
+    # Memory usage comparison between the original list-of-lists track history layout
+    # and the columnar array layout for a long chase, and per-packet processing cost.
+    # Run with: python -m chasemapper.geometry
+    import time
+    import tracemalloc
+    from datetime import timedelta
+
+    _num_points = 100000
+    _start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    _points = [
+        (
+            _start + timedelta(seconds=0.1 * i),
+            -34.9 + i * 1e-6,
+            138.6 + i * 1e-6,
+            100.0 + (i % 1000) * 0.1,
+        )
+        for i in range(_num_points)
+    ]
+
+    # Old layout - a list of [datetime, lat, lon, alt, comment] lists.
+    # Copy the values so they are counted as allocations within the traced region.
+    tracemalloc.start()
+    _history = []
+    for (_dt, _lat, _lon, _alt) in _points:
+        _history.append([_dt + timedelta(0), _lat + 0.0, _lon + 0.0, _alt + 0.0, "CAR"])
+    _old_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del _history
+
+    # New layout
+    tracemalloc.start()
+    _track = GenericTrack()
+    for (_dt, _lat, _lon, _alt) in _points:
+        _track._append_point(_dt, _lat, _lon, _alt, "CAR")
+    _new_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print("Track history memory usage for %d points:" % _num_points)
+    print("  List-of-lists: %.2f MB (%.1f bytes/point)" % (_old_bytes / 1e6, _old_bytes / _num_points))
+    print("  Columnar:      %.2f MB (%.1f bytes/point)" % (_new_bytes / 1e6, _new_bytes / _num_points))
+
+    # Per-packet cost of add_telemetry for an hour of 10 Hz car GPS data.
+    _num_packets = 36000
+    _car_track = GenericTrack(ascent_averaging=10)
+    _start_time = time.perf_counter()
+    for (_dt, _lat, _lon, _alt) in _points[:_num_packets]:
+        _car_track.add_telemetry(
+            {"time": _dt, "lat": _lat, "lon": _lon, "alt": _alt, "comment": "CAR"}
+        )
+    _elapsed = time.perf_counter() - _start_time
+
+    print("add_telemetry cost for %d packets at 10 Hz:" % _num_packets)
+    print("  Total: %.3f s, Per-packet: %.1f us" % (_elapsed, 1e6 * _elapsed / _num_packets))
@@ -0,0 +1,592 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - GFS Downloader
+#
+#   Download GFS wind data for the offline predictor, without relying on an external download command.
+#   Only the GRIB messages we need (geopotential height and winds on the pressure levels used by the
+#   predictor) are fetched from each forecast file, using HTTP range requests based on the file's .idx index.
+#   Ranges are downloaded concurrently into chunk files, which are resumed if a download is interrupted.
+#   Once every GRIB message has been verified, the data is converted to the CUSF predictor format, and the
+#   new dataset is moved into the GFS directory in place of the previous one.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import datetime
+import logging
+import numpy as np
+import os
+import random
+import requests
+import requests.adapters
+import shutil
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+NOMADS_URL = "https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod"
+
+# Available forecast hours and file names for each supported model.
+# These match the models supported by cusfpredict.gfs.
+GFS_MODELS = {
+    "0p25_1hr": {
+        "times": np.concatenate((np.arange(0, 120, 1), np.arange(120, 240, 3), np.arange(240, 396, 12))),
+        "file": "gfs.t%02dz.pgrb2.0p25.f%03d",
+    },
+    "0p50": {
+        "times": np.concatenate((np.arange(0, 240, 3), np.arange(240, 396, 12))),
+        "file": "gfs.t%02dz.pgrb2full.0p50.f%03d",
+    },
+}
+
+# GRIB parameters and pressure levels (in mb) used by the predictor.
+GFS_PARAMS = ["HGT", "UGRD", "VGRD"]
+GFS_LEVELS = [
+    1000.0, 975.0, 950.0, 925.0, 900.0, 850.0, 800.0, 750.0, 700.0, 650.0, 600.0, 550.0, 500.0, 450.0,
+    400.0, 350.0, 300.0, 250.0, 200.0, 150.0, 100.0, 70.0, 50.0, 30.0, 20.0, 10.0, 7.0, 5.0, 3.0, 2.0, 1.0,
+]
+
+
+class GFSDownloadError(Exception):
+    """ The GFS download could not be completed """
+
+    pass
+
+
+def parse_grib_index(text, params=GFS_PARAMS, levels=GFS_LEVELS, file_size=None):
+    """ Parse a GRIB .idx file, and find the byte ranges of the messages holding the required parameters and levels.
+
+    Index lines are of the form: 12:1234567:d=2020010100:UGRD:500 mb:3 hour fcst:
+
+    Args:
+        text (str): Contents of the .idx file.
+        params (list): GRIB parameter names to select.
+        levels (list): Pressure levels (mb) to select.
+        file_size (int): Size of the GRIB file, required if the last message in the file is selected.
+
+    Returns:
+        list: Contiguous (start, end) byte ranges (end inclusive), merged where adjacent.
+    """
+    _entries = []
+    for _line in text.splitlines():
+        _fields = _line.split(":")
+        if len(_fields) < 5:
+            continue
+        _entries.append((int(_fields[1]), _fields[3], _fields[4]))
+
+    # Some messages hold several fields (e.g. UGRD and VGRD), which share the same offset.
+    _offsets = sorted(set([_e[0] for _e in _entries]))
+    _next_offset = dict(zip(_offsets[:-1], _offsets[1:]))
+
+    _levels = set(levels)
+    _selected = set()
+    for (_offset, _param, _level) in _entries:
+        if (_param not in params) or (not _level.endswith(" mb")):
+            continue
+        try:
+            if float(_level[:-3]) not in _levels:
+                continue
+        except ValueError:
+            continue
+        _selected.add(_offset)
+
+    _ranges = []
+    for _offset in sorted(_selected):
+        if _offset in _next_offset:
+            _end = _next_offset[_offset] - 1
+        elif file_size is not None:
+            _end = file_size - 1
+        else:
+            raise GFSDownloadError("File size required to download the last message in the file.")
+
+        if (len(_ranges) > 0) and (_ranges[-1][1] + 1 == _offset):
+            _ranges[-1] = (_ranges[-1][0], _end)
+        else:
+            _ranges.append((_offset, _end))
+
+    return _ranges
+
+
+def verify_grib_file(filename):
+    """ Check a GRIB file consists of complete GRIB messages (each starting with 'GRIB', of the length given
+    in its header, and ending with '7777').
+
+    Returns:
+        int: Number of messages in the file.
+
+    Raises:
+        GFSDownloadError: If the file is incomplete or corrupt.
+    """
+    _size = os.path.getsize(filename)
+    _count = 0
+    _offset = 0
+
+    with open(filename, "rb") as _f:
+        while _offset < _size:
+            _f.seek(_offset)
+            _header = _f.read(16)
+            if (len(_header) < 8) or (_header[:4] != b"GRIB"):
+                raise GFSDownloadError("%s: No GRIB message at offset %d." % (filename, _offset))
+
+            if _header[7] == 2:
+                _length = struct.unpack(">Q", _header[8:16])[0]
+            elif _header[7] == 1:
+                _length = struct.unpack(">I", b"\x00" + _header[4:7])[0]
+            else:
+                raise GFSDownloadError("%s: Unknown GRIB edition %d." % (filename, _header[7]))
+
+            if _offset + _length > _size:
+                raise GFSDownloadError("%s: Truncated GRIB message at offset %d." % (filename, _offset))
+
+            _f.seek(_offset + _length - 4)
+            if _f.read(4) != b"7777":
+                raise GFSDownloadError("%s: Corrupt GRIB message at offset %d." % (filename, _offset))
+
+            _offset += _length
+            _count += 1
+
+    if _count == 0:
+        raise GFSDownloadError("%s: No GRIB messages." % filename)
+
+    return _count
+
+
+def grib_to_cusf(grib_file, output_dir, lat, lon, latdelta, londelta):
+    """ Convert a GRIB file to the CUSF predictor format, cropped to the requested area.
+    This requires the xarray and cfgrib packages (as used by cusfpredict.gfs).
+    """
+    try:
+        from cusfpredict.gfs import parse_grib_to_dict, wind_dict_to_cusf
+    except (ImportError, SystemExit):
+        raise GFSDownloadError("xarray and cfgrib are required to convert GFS data.")
+
+    _data = parse_grib_to_dict(grib_file)
+    if _data is None:
+        raise GFSDownloadError("Could not parse %s" % grib_file)
+
+    # Crop to the requested area. Longitudes are kept continuous across the 0/360 degree boundary.
+    _lat_idx = np.flatnonzero(np.abs(_data["lat_scale"] - lat) <= latdelta)
+    _dlon = (_data["lon_scale"] - lon + 180.0) % 360.0 - 180.0
+    _lon_idx = np.flatnonzero(np.abs(_dlon) <= londelta)
+    _lon_idx = _lon_idx[np.argsort(_dlon[_lon_idx])]
+    if (len(_lat_idx) == 0) or (len(_lon_idx) == 0):
+        raise GFSDownloadError("%s does not cover the requested area." % grib_file)
+
+    for _key in _data:
+        if type(_key) == int:
+            for _param in _data[_key]:
+                _data[_key][_param] = _data[_key][_param][np.ix_(_lat_idx, _lon_idx)]
+
+    _data["lat_scale"] = _data["lat_scale"][_lat_idx]
+    _data["lon_scale"] = (lon % 360.0) + _dlon[_lon_idx]
+    for _axis in ("lat", "lon"):
+        _scale = _data["%s_scale" % _axis]
+        _data["%s_centre" % _axis] = _scale[len(_scale) // 2]
+        _data["%s_radius" % _axis] = (max(_scale) - min(_scale)) / 2.0
+
+    return wind_dict_to_cusf(_data, output_dir=output_dir)[0]
+
+
+class GFSDownloader(object):
+    """ Download a GFS dataset into the predictor's GFS directory.
+
+    Downloads are staged in a '.download' directory next to the GFS directory. Each byte range is downloaded
+    into its own chunk file, so if a download is interrupted, the next download of the same dataset only
+    fetches the missing data.
+
+    Progress is reported by calling progress_callback with a dictionary containing:
+        stage (str): 'index', 'download', 'verify', 'convert', 'install', 'done' or 'error'
+        dataset (str): Dataset name (e.g. '2020010100z')
+        bytes_done, bytes_total (int): Downloaded and total bytes (including data downloaded previously).
+        chunks_done, chunks_total (int): Completed and total chunks.
+        rate (float): Download rate, in bytes/second.
+        message (str): Human-readable status.
+    """
+
+    def __init__(
+        self,
+        gfs_directory,
+        lat,
+        lon,
+        latdelta=10.0,
+        londelta=10.0,
+        forecast_hours=48,
+        model="0p50",
+        connections=4,
+        base_url=NOMADS_URL,
+        chunk_size=4 * 1024 * 1024,
+        timeout=30.0,
+        retries=5,
+        progress_callback=None,
+        progress_interval=0.5,
+        converter=grib_to_cusf,
+    ):
+        """ Create a GFSDownloader.
+
+        Args:
+            gfs_directory (str): Predictor GFS directory.
+            lat, lon (float): Centre of the area to download.
+            latdelta, londelta (float): Radius of the area to download, in degrees.
+            forecast_hours (int): Number of hours of forecast data to download.
+            model (str): GFS model - '0p50' or '0p25_1hr'.
+            connections (int): Number of concurrent range requests.
+            base_url (str): GFS data server URL.
+            chunk_size (int): Maximum size of each range request, in bytes.
+            timeout (float): HTTP request timeout, in seconds.
+            retries (int): Number of times to retry each failed request.
+            progress_callback (function): Called with progress information (see above).
+            progress_interval (float): Minimum time between download progress updates, in seconds.
+            converter (function): Function to convert each GRIB file to the CUSF format (see grib_to_cusf).
+        """
+        if model not in GFS_MODELS:
+            raise ValueError("Unknown GFS model %s" % model)
+
+        self.gfs_directory = os.path.normpath(gfs_directory)
+        self.staging_directory = self.gfs_directory + ".download"
+        self.lat = lat
+        self.lon = lon
+        self.latdelta = latdelta
+        self.londelta = londelta
+        self.model = model
+        self.connections = connections
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.converter = converter
+
+        _times = GFS_MODELS[model]["times"]
+        self.forecast_times = [int(_t) for _t in _times[_times <= forecast_hours]]
+
+        self.session = requests.Session()
+        _adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(connections, 4))
+        self.session.mount("http://", _adapter)
+        self.session.mount("https://", _adapter)
+
+        self.lock = Lock()
+        self.progress = {}
+        self.last_progress = 0.0
+
+    def report(self, stage, message="", force=True, **kwargs):
+        """ Update the progress information, and pass it to the progress callback """
+        with self.lock:
+            self.progress.update(kwargs)
+            self.progress["stage"] = stage
+            self.progress["message"] = message
+
+            if (not force) and (time.time() - self.last_progress < self.progress_interval):
+                return
+            self.last_progress = time.time()
+            _progress = dict(self.progress)
+
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(_progress)
+            except Exception as e:
+                logging.error("GFS Downloader - Error in progress callback: %s" % str(e))
+
+    def file_url(self, model_dt, forecast_time):
+        """ URL of a GFS forecast file """
+        return "%s/gfs.%s/%02d/atmos/%s" % (
+            self.base_url,
+            model_dt.strftime("%Y%m%d"),
+            model_dt.hour,
+            GFS_MODELS[self.model]["file"] % (model_dt.hour, forecast_time),
+        )
+
+    def request(self, method, url, **kwargs):
+        """ Make a HTTP request, retrying with an exponential backoff on failure """
+        for _attempt in range(self.retries + 1):
+            if _attempt > 0:
+                time.sleep(min(30.0, 2 ** (_attempt - 1)) * random.uniform(0.5, 1.0))
+            try:
+                _r = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if _r.status_code < 500:
+                    return _r
+                logging.warning("GFS Downloader - %s returned HTTP %d" % (url, _r.status_code))
+            except requests.RequestException as e:
+                logging.warning("GFS Downloader - Request for %s failed: %s" % (url, str(e)))
+
+        raise GFSDownloadError("Request for %s failed after %d attempts." % (url, self.retries + 1))
+
+    def latest_dataset(self, max_age=4):
+        """ Find the newest GFS model run which has all the required forecast times available """
+        _now = datetime.datetime.utcnow()
+        _latest = datetime.datetime(_now.year, _now.month, _now.day, _now.hour - _now.hour % 6)
+
+        for _age in range(max_age):
+            _model_dt = _latest - datetime.timedelta(hours=6 * _age)
+            _r = self.request("HEAD", self.file_url(_model_dt, self.forecast_times[-1]) + ".idx")
+            if _r.status_code == 200:
+                return _model_dt
+
+        raise GFSDownloadError("No complete GFS dataset available.")
+
+    def current_dataset(self):
+        """ Return the model time of the dataset in the GFS directory, or None if there is no dataset """
+        try:
+            with open(os.path.join(self.gfs_directory, "dataset.txt"), "r") as _f:
+                return datetime.datetime.strptime(_f.read().strip(), "%Y%m%d%Hz")
+        except Exception:
+            return None
+
+    def plan(self, model_dt, dataset_dir):
+        """ Read the index of each forecast file, and split the required messages into chunks """
+        _chunks = []
+        for (_i, _forecast_time) in enumerate(self.forecast_times):
+            _url = self.file_url(model_dt, _forecast_time)
+            _r = self.request("GET", _url + ".idx")
+            if _r.status_code != 200:
+                raise GFSDownloadError("Could not read index %s.idx (HTTP %d)" % (_url, _r.status_code))
+
+            try:
+                _ranges = parse_grib_index(_r.text)
+            except GFSDownloadError:
+                # The last message in the file is needed, so find the file size.
+                _head = self.request("HEAD", _url)
+                _ranges = parse_grib_index(_r.text, file_size=int(_head.headers["Content-Length"]))
+
+            if len(_ranges) == 0:
+                raise GFSDownloadError("No wind data found in %s" % _url)
+
+            _part = 0
+            for (_start, _end) in _ranges:
+                for _chunk_start in range(_start, _end + 1, self.chunk_size):
+                    _chunk_end = min(_end, _chunk_start + self.chunk_size - 1)
+                    _chunks.append(
+                        {
+                            "forecast_time": _forecast_time,
+                            "url": _url,
+                            "start": _chunk_start,
+                            "end": _chunk_end,
+                            "size": _chunk_end - _chunk_start + 1,
+                            "path": os.path.join(
+                                dataset_dir, "f%03d_%04d_%d-%d.part" % (_forecast_time, _part, _chunk_start, _chunk_end)
+                            ),
+                        }
+                    )
+                    _part += 1
+
+            self.report(
+                "index",
+                "Reading index %d/%d" % (_i + 1, len(self.forecast_times)),
+                force=False,
+            )
+
+        return _chunks
+
+    def fetch_chunk(self, chunk):
+        """ Download a chunk, resuming from any data already downloaded """
+        for _attempt in range(self.retries + 1):
+            _have = os.path.getsize(chunk["path"]) if os.path.exists(chunk["path"]) else 0
+            if _have == chunk["size"]:
+                return
+            elif _have > chunk["size"]:
+                os.remove(chunk["path"])
+                _have = 0
+
+            if _attempt > 0:
+                time.sleep(min(30.0, 2 ** (_attempt - 1)) * random.uniform(0.5, 1.0))
+
+            try:
+                _headers = {"Range": "bytes=%d-%d" % (chunk["start"] + _have, chunk["end"])}
+                with self.session.get(chunk["url"], headers=_headers, stream=True, timeout=self.timeout) as _r:
+                    if _r.status_code != 206:
+                        raise GFSDownloadError("Range request returned HTTP %d" % _r.status_code)
+
+                    with open(chunk["path"], "ab") as _f:
+                        for _data in _r.iter_content(chunk_size=16384):
+                            _f.write(_data)
+                            with self.lock:
+                                self.progress["bytes_done"] += len(_data)
+                                self.session_bytes += len(_data)
+                            self.report_download()
+
+            except (requests.RequestException, GFSDownloadError) as e:
+                logging.warning(
+                    "GFS Downloader - Download of %s (%d-%d) failed: %s"
+                    % (chunk["url"], chunk["start"], chunk["end"], str(e))
+                )
+                continue
+
+        # The chunk file is only created once a request succeeds, so may not exist if every attempt failed.
+        _have = os.path.getsize(chunk["path"]) if os.path.exists(chunk["path"]) else 0
+        if _have != chunk["size"]:
+            raise GFSDownloadError(
+                "Download of %s (%d-%d) failed after %d attempts."
+                % (chunk["url"], chunk["start"], chunk["end"], self.retries + 1)
+            )
+
+    def report_download(self, force=False):
+        """ Report download progress """
+        _elapsed = max(time.time() - self.session_start, 1e-3)
+        _done = self.progress["bytes_done"]
+        _total = self.progress["bytes_total"]
+        self.report(
+            "download",
+            "Downloading %.1f/%.1f MB (%d%%)" % (_done / 1e6, _total / 1e6, 100 * _done // max(_total, 1)),
+            force=force,
+            rate=self.session_bytes / _elapsed,
+        )
+
+    def install(self, new_directory):
+        """ Replace the GFS directory with a new dataset directory (on the same filesystem).
+        The previous dataset is renamed out of the way first, and only removed once the new one is in place.
+        """
+        _old_directory = self.gfs_directory + ".old"
+        if os.path.exists(_old_directory):
+            shutil.rmtree(_old_directory)
+
+        if os.path.exists(self.gfs_directory):
+            os.rename(self.gfs_directory, _old_directory)
+        os.rename(new_directory, self.gfs_directory)
+
+        shutil.rmtree(_old_directory, ignore_errors=True)
+
+    def run(self, force=False):
+        """ Download the latest GFS dataset, and install it into the GFS directory.
+
+        Args:
+            force (bool): Download the dataset even if it is already installed.
+
+        Returns:
+            str: 'OK' if the latest dataset is installed.
+
+        Raises:
+            GFSDownloadError: If the download failed.
+        """
+        try:
+            return self._run(force)
+        except Exception as e:
+            self.report("error", "Download failed - %s" % str(e))
+            raise
+
+    def _run(self, force):
+        # If a previous install was interrupted part-way, restore the previous dataset.
+        if (not os.path.exists(self.gfs_directory)) and os.path.exists(self.gfs_directory + ".old"):
+            os.rename(self.gfs_directory + ".old", self.gfs_directory)
+
+        self.report("index", "Finding latest dataset", bytes_done=0, bytes_total=0, chunks_done=0, chunks_total=0, rate=0.0)
+        _model_dt = self.latest_dataset()
+        _dataset = _model_dt.strftime("%Y%m%d%Hz")
+        self.progress["dataset"] = _dataset
+
+        _current = self.current_dataset()
+        if (not force) and (_current is not None) and (_current >= _model_dt):
+            logging.info("GFS Downloader - Dataset %s is already the latest." % _current.strftime("%Y%m%d%Hz"))
+            self.report("done", "Dataset %s is already the latest." % _current.strftime("%Y%m%d%Hz"))
+            return "OK"
+
+        logging.info("GFS Downloader - Downloading dataset %s" % _dataset)
+
+        # Remove any partial downloads of other datasets.
+        _dataset_dir = os.path.join(self.staging_directory, _dataset)
+        if os.path.exists(self.staging_directory):
+            for _entry in os.listdir(self.staging_directory):
+                if _entry != _dataset:
+                    shutil.rmtree(os.path.join(self.staging_directory, _entry), ignore_errors=True)
+        os.makedirs(_dataset_dir, exist_ok=True)
+
+        _chunks = self.plan(_model_dt, _dataset_dir)
+        _resumed = sum([min(os.path.getsize(_c["path"]), _c["size"]) for _c in _chunks if os.path.exists(_c["path"])])
+        if _resumed > 0:
+            logging.info("GFS Downloader - Resuming download, %.1f MB already downloaded." % (_resumed / 1e6))
+
+        self.session_start = time.time()
+        self.session_bytes = 0
+        self.progress.update(
+            {
+                "bytes_done": _resumed,
+                "bytes_total": sum([_c["size"] for _c in _chunks]),
+                "chunks_done": 0,
+                "chunks_total": len(_chunks),
+            }
+        )
+        self.report_download(force=True)
+
+        with ThreadPoolExecutor(max_workers=self.connections) as _executor:
+            _futures = [_executor.submit(self.fetch_chunk, _chunk) for _chunk in _chunks]
+            try:
+                for _future in as_completed(_futures):
+                    _future.result()
+                    with self.lock:
+                        self.progress["chunks_done"] += 1
+                    self.report_download()
+            except Exception:
+                for _future in _futures:
+                    _future.cancel()
+                raise
+
+        self.report_download(force=True)
+        logging.info(
+            "GFS Downloader - Downloaded %.1f MB in %.1f seconds."
+            % (self.session_bytes / 1e6, time.time() - self.session_start)
+        )
+
+        # Assemble the chunks into a GRIB file per forecast time, and check every message is complete.
+        self.report("verify", "Verifying GRIB data")
+        _grib_files = []
+        for _forecast_time in self.forecast_times:
+            _grib_file = os.path.join(_dataset_dir, "f%03d.grib2" % _forecast_time)
+            with open(_grib_file + ".tmp", "wb") as _out:
+                for _chunk in _chunks:
+                    if _chunk["forecast_time"] == _forecast_time:
+                        with open(_chunk["path"], "rb") as _in:
+                            shutil.copyfileobj(_in, _out)
+            os.replace(_grib_file + ".tmp", _grib_file)
+
+            try:
+                verify_grib_file(_grib_file)
+            except GFSDownloadError:
+                # Discard this forecast time's data, so it is downloaded again next time.
+                for _chunk in _chunks:
+                    if _chunk["forecast_time"] == _forecast_time:
+                        os.remove(_chunk["path"])
+                raise
+
+            _grib_files.append(_grib_file)
+
+        # Convert to the predictor format, in a directory next to the GFS directory.
+        _new_directory = self.gfs_directory + ".new"
+        if os.path.exists(_new_directory):
+            shutil.rmtree(_new_directory)
+        os.makedirs(_new_directory)
+
+        for (_i, _grib_file) in enumerate(_grib_files):
+            self.report("convert", "Converting %d/%d" % (_i + 1, len(_grib_files)))
+            self.converter(_grib_file, _new_directory, self.lat, self.lon, self.latdelta, self.londelta)
+
+        with open(os.path.join(_new_directory, "dataset.txt"), "w") as _f:
+            _f.write(_dataset)
+
+        self.report("install", "Installing dataset %s" % _dataset)
+        self.install(_new_directory)
+        shutil.rmtree(self.staging_directory, ignore_errors=True)
+
+        logging.info("GFS Downloader - Dataset %s installed into %s" % (_dataset, self.gfs_directory))
+        self.report("done", "Dataset %s installed." % _dataset)
+
+        return "OK"
+
+
+if __name__ == "__main__":
+    # Download the latest GFS dataset
+    #   python -m chasemapper.gfsdownload gfs_directory lat lon [latdelta londelta forecast_hours]
+    import sys
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+
+    _args = sys.argv[1:]
+    _downloader = GFSDownloader(
+        _args[0],
+        float(_args[1]),
+        float(_args[2]),
+        latdelta=float(_args[3]) if len(_args) > 3 else 10.0,
+        londelta=float(_args[4]) if len(_args) > 4 else 10.0,
+        forecast_hours=int(_args[5]) if len(_args) > 5 else 48,
+        progress_callback=lambda p: print(p["message"]),
+    )
+    print(_downloader.run())
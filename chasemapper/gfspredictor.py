@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - In-Process GFS Predictor
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   A flight path predictor which runs within the chasemapper process, as an alternative to
+#   running the CUSF predictor binary for each prediction.
+#   The GFS wind data in the predictor's GFS directory is parsed once, cached as a NumPy array,
+#   and memory-mapped for all subsequent predictions.
+#
+import glob
+import hashlib
+import logging
+import os
+import time
+import numpy as np
+from datetime import datetime, timezone
+from .atmosphere import FALL_TABLE_ALTITUDES, FALL_TABLE_INTEGRAL
+from .earthmaths import EARTH_RADIUS
+from .geometry import datetime_to_epoch
+
+
+# Metres per degree of latitude.
+METRES_PER_DEGREE = np.radians(1.0) * EARTH_RADIUS
+
+# Square root of sea-level air density, used to convert a sea-level descent rate into a drag coefficient.
+SQRT_DENSITY_SL = 1.106797
+
+
+class GFSWindField(object):
+    """ GFS wind data, as a memory-mapped array with dimensions [time, latitude, longitude, pressure level, component],
+    with components of geopotential height (m), u-wind (m/s) and v-wind (m/s).
+
+    The CUSF-format GFS files are parsed with cusfpredict.reader.read_cusf_gfs on first use, and the resulting
+    arrays cached in the GFS directory. The cache is rebuilt whenever the set of GFS files changes.
+    """
+
+    def __init__(self, gfs_path="./gfs/"):
+        self.gfs_path = gfs_path
+
+        _gfs_files = sorted(glob.glob(os.path.join(gfs_path, "gfs_*.dat")))
+        if len(_gfs_files) == 0:
+            raise Exception("No GFS data files in directory.")
+
+        # Identify this dataset by its file names, sizes and modification times.
+        _fingerprint = hashlib.sha1()
+        for _file in _gfs_files:
+            _stat = os.stat(_file)
+            _fingerprint.update(
+                ("%s,%d,%d;" % (os.path.basename(_file), _stat.st_size, _stat.st_mtime)).encode()
+            )
+        _cache_name = "wind_cache_%s" % _fingerprint.hexdigest()[:16]
+        _data_file = os.path.join(gfs_path, _cache_name + ".npy")
+        _axes_file = os.path.join(gfs_path, _cache_name + "_axes.npz")
+
+        if not (os.path.isfile(_data_file) and os.path.isfile(_axes_file)):
+            self.build_cache(_gfs_files, _data_file, _axes_file)
+
+        _axes = np.load(_axes_file)
+        self.times = _axes["times"]
+        self.latitudes = _axes["latitudes"]
+        self.longitudes = _axes["longitudes"]
+        self.pressures = _axes["pressures"]
+        self.data = np.load(_data_file, mmap_mode="r")
+
+        # GFS longitudes may be in the range 0-360.
+        self.wrap_longitudes = np.max(self.longitudes) > 180.0
+
+        self.start_time = datetime.fromtimestamp(self.times[0], timezone.utc)
+        self.end_time = datetime.fromtimestamp(self.times[-1], timezone.utc)
+
+        logging.info(
+            "GFS Predictor - Loaded %d GFS time steps (%s to %s), %d pressure levels, %d x %d grid."
+            % (
+                len(self.times),
+                self.start_time.isoformat(),
+                self.end_time.isoformat(),
+                len(self.pressures),
+                len(self.latitudes),
+                len(self.longitudes),
+            )
+        )
+
+    def build_cache(self, gfs_files, data_file, axes_file):
+        """ Parse a set of CUSF-format GFS files, and write them out as a NumPy array cache """
+        from cusfpredict.reader import read_cusf_gfs
+
+        logging.info(
+            "GFS Predictor - Building wind data cache from %d GFS files..." % len(gfs_files)
+        )
+        _start = time.time()
+
+        _slices = []
+        for _file in gfs_files:
+            _gfs = read_cusf_gfs(_file)
+            # Order the pressure levels from the ground up, and the latitudes/longitudes in increasing order.
+            _p_order = np.argsort(_gfs["pressures"])[::-1]
+            _lat_order = np.argsort(_gfs["latitudes"])
+            _lon_order = np.argsort(_gfs["longitudes"])
+            # [pressure, lat, lon, (hgt, ugrd, vgrd, speed, dir)] -> [lat, lon, pressure, (hgt, ugrd, vgrd)]
+            _data = _gfs["data"][_p_order][:, _lat_order][:, :, _lon_order][..., 0:3]
+            _slices.append(
+                (
+                    _gfs["posix_timestamp"],
+                    _gfs["pressures"][_p_order],
+                    _gfs["latitudes"][_lat_order],
+                    _gfs["longitudes"][_lon_order],
+                    np.transpose(_data, (1, 2, 0, 3)).astype(np.float32),
+                )
+            )
+
+        _slices.sort(key=lambda _s: _s[0])
+
+        # Remove any caches for previous datasets.
+        for _old in glob.glob(os.path.join(os.path.dirname(data_file), "wind_cache_*")):
+            os.remove(_old)
+
+        np.savez(
+            axes_file,
+            times=np.array([_s[0] for _s in _slices], dtype=np.float64),
+            pressures=_slices[0][1],
+            latitudes=_slices[0][2],
+            longitudes=_slices[0][3],
+        )
+        # Write to a temporary file first, so an interrupted build does not leave a truncated cache.
+        _temp_file = data_file + ".tmp.npy"
+        np.save(_temp_file, np.stack([_s[4] for _s in _slices]))
+        os.replace(_temp_file, data_file)
+
+        logging.info(
+            "GFS Predictor - Wind data cache built in %.1f seconds." % (time.time() - _start)
+        )
+
+    def wind(self, t, lat, lon, alt):
+        """ Interpolate the wind velocity at a set of points.
+
+        Args:
+            t (numpy.ndarray): POSIX timestamps.
+            lat (numpy.ndarray): Latitudes, in degrees.
+            lon (numpy.ndarray): Longitudes, in degrees.
+            alt (numpy.ndarray): Altitudes, in metres.
+
+        Returns:
+            tuple: (u, v) arrays - the east and north wind components, in m/s.
+        """
+        if self.wrap_longitudes:
+            lon = np.mod(lon, 360.0)
+
+        # Bracketing indices and interpolation weights along each of the time, latitude and longitude axes.
+        # Points outside of the dataset use the nearest edge.
+        _index = []
+        _weights = []
+        for _axis, _value in (
+            (self.times, t),
+            (self.latitudes, lat),
+            (self.longitudes, lon),
+        ):
+            _pos = np.interp(_value, _axis, np.arange(len(_axis), dtype=np.float64))
+            _lower = np.minimum(_pos.astype(np.int64), max(len(_axis) - 2, 0))
+            _frac = _pos - _lower
+            _index.append(np.stack((_lower, np.minimum(_lower + 1, len(_axis) - 1)), axis=-1))
+            _weights.append(np.stack((1.0 - _frac, _frac), axis=-1))
+
+        # Gather the 8 surrounding columns for each point, with dimensions [point, time, lat, lon, pressure, component]
+        _columns = self.data[
+            _index[0][:, :, None, None],
+            _index[1][:, None, :, None],
+            _index[2][:, None, None, :],
+        ]
+
+        # Interpolate each column to the requested altitude, using the geopotential heights of its pressure levels.
+        _hgt = _columns[..., 0]
+        _alt = np.asarray(alt, dtype=np.float64)[:, None, None, None, None]
+        _level = np.clip(np.sum(_hgt < _alt, axis=-1) - 1, 0, _hgt.shape[-1] - 2)[..., None, None]
+        _below = np.take_along_axis(_columns, _level, axis=-2)[..., 0, :]
+        _above = np.take_along_axis(_columns, _level + 1, axis=-2)[..., 0, :]
+        _frac = np.clip(
+            (_alt[..., 0] - _below[..., 0]) / np.maximum(_above[..., 0] - _below[..., 0], 1e-3),
+            0.0,
+            1.0,
+        )[..., None]
+        _uv = _below[..., 1:3] + _frac * (_above[..., 1:3] - _below[..., 1:3])
+
+        # Trilinear combination over time, latitude and longitude.
+        _w = (
+            _weights[0][:, :, None, None]
+            * _weights[1][:, None, :, None]
+            * _weights[2][:, None, None, :]
+        )
+        _uv = np.einsum("ntij,ntijc->nc", _w, _uv)
+
+        return (_uv[:, 0], _uv[:, 1])
+
+
+def fall_integral_array(altitudes):
+    """ Integral of sqrt(density) up to each altitude (see atmosphere.py), for an array of altitudes """
+    return np.interp(altitudes, FALL_TABLE_ALTITUDES, FALL_TABLE_INTEGRAL)
+
+
+def altitude_profile(
+    launch_alt,
+    ascent_rate,
+    descent_rate,
+    burst_alt,
+    descent_mode=False,
+    ground_alt=0.0,
+    timestep=10.0,
+):
+    """ Calculate the altitude profile of a flight, with a constant ascent rate, and a terminal-velocity descent.
+
+    Returns:
+        tuple: (altitude_function, times, burst_time), where altitude_function(times) gives the altitude at an
+            array of times (in seconds from launch), and times is the integration time grid, which includes the
+            burst and landing times.
+    """
+    ascent_rate = max(ascent_rate, 0.1)
+    _drag_coeff = max(abs(descent_rate), 0.1) * SQRT_DENSITY_SL
+
+    if descent_mode or (launch_alt >= burst_alt):
+        _burst_alt = launch_alt
+        _burst_time = 0.0
+    else:
+        _burst_alt = burst_alt
+        _burst_time = (burst_alt - launch_alt) / ascent_rate
+
+    # Descent - the integral of sqrt(density) decreases linearly with time.
+    _burst_integral = fall_integral_array(_burst_alt)
+    _fall_time = max(0.0, (_burst_integral - fall_integral_array(ground_alt)) / _drag_coeff)
+
+    def _altitude(times):
+        _times = np.asarray(times, dtype=np.float64)
+        _descent = np.interp(
+            _burst_integral - _drag_coeff * (_times - _burst_time),
+            FALL_TABLE_INTEGRAL,
+            FALL_TABLE_ALTITUDES,
+        )
+        return np.where(
+            _times <= _burst_time,
+            launch_alt + ascent_rate * _times,
+            np.maximum(_descent, ground_alt),
+        )
+
+    _times = np.unique(
+        np.concatenate(
+            (
+                np.arange(0.0, _burst_time, timestep),
+                [_burst_time],
+                _burst_time + np.arange(0.0, _fall_time, timestep),
+                [_burst_time + _fall_time],
+            )
+        )
+    )
+
+    return (_altitude, _times, _burst_time)
+
+
+class GFSPredictor(object):
+    """ In-process flight path predictor, using memory-mapped GFS wind data.
+
+    This can be used in place of a cusfpredict.predict.Predictor object.
+
+    The altitude profile of the flight is calculated directly, so the time and altitude of every point along
+    the path are known up-front. The horizontal path is then found by fixed-point (Picard) iteration - the wind
+    is interpolated at every point along the current estimate of the path in a single vectorised lookup, and
+    integrated (trapezoidal rule) to give the next estimate, until the path stops moving. This converges to the
+    implicit trapezoidal integration of the path, in a handful of iterations for realistic wind fields.
+    """
+
+    def __init__(self, gfs_path="./gfs/", timestep=10.0, tolerance=1.0, max_iterations=20):
+        """ Create a GFSPredictor, loading (and if required, caching) the GFS data in the supplied directory.
+
+        Args:
+            gfs_path (str): Path to the GFS data directory.
+            timestep (float): Integration time step, in seconds.
+            tolerance (float): Stop iterating once no point on the path moves by more than this, in metres.
+            max_iterations (int): Maximum number of iterations.
+        """
+        self.gfs_path = gfs_path
+        self.timestep = timestep
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.wind_field = GFSWindField(gfs_path)
+
+    def predict(
+        self,
+        launch_lat=-34.9499,
+        launch_lon=138.5194,
+        launch_alt=0,
+        ascent_rate=5.0,
+        descent_rate=8.0,
+        burst_alt=26000,
+        launch_time=None,
+        descent_mode=False,
+    ):
+        """ Run a flight path prediction. The arguments and output match cusfpredict.predict.Predictor.predict.
+
+        Returns:
+            list: Predicted flight path, as a list of [timestamp, lat, lon, alt] entries.
+        """
+        if launch_time is None:
+            launch_time = datetime.now(timezone.utc)
+
+        (_altitude, _times, _burst_time) = altitude_profile(
+            launch_alt,
+            ascent_rate,
+            descent_rate,
+            burst_alt,
+            descent_mode=descent_mode,
+            timestep=self.timestep,
+        )
+        _alts = _altitude(_times)
+        _timestamps = datetime_to_epoch(launch_time) + _times
+        _dt = np.diff(_times)
+
+        # Initial estimate - the payload does not move horizontally.
+        _lats = np.full(len(_times), float(launch_lat))
+        _lons = np.full(len(_times), float(launch_lon))
+
+        for _iteration in range(self.max_iterations):
+            (_u, _v) = self.wind_field.wind(_timestamps, _lats, _lons, _alts)
+
+            # Rates of change of latitude and longitude, in degrees/second.
+            _lat_rate = _v / METRES_PER_DEGREE
+            _lon_rate = _u / (METRES_PER_DEGREE * np.cos(np.radians(_lats)))
+
+            _new_lats = launch_lat + np.concatenate(
+                ([0.0], np.cumsum(0.5 * (_lat_rate[1:] + _lat_rate[:-1]) * _dt))
+            )
+            _new_lons = launch_lon + np.concatenate(
+                ([0.0], np.cumsum(0.5 * (_lon_rate[1:] + _lon_rate[:-1]) * _dt))
+            )
+
+            _change = METRES_PER_DEGREE * max(
+                np.max(np.abs(_new_lats - _lats)),
+                np.max(np.abs(_new_lons - _lons) * np.cos(np.radians(_lats))),
+            )
+            _lats = _new_lats
+            _lons = _new_lons
+
+            if _change < self.tolerance:
+                break
+        else:
+            logging.warning(
+                "GFS Predictor - Path did not converge after %d iterations (last change %.1f m)."
+                % (self.max_iterations, _change)
+            )
+
+        # Keep longitudes within -180 to 180.
+        _lons = (_lons + 180.0) % 360.0 - 180.0
+
+        return np.column_stack(
+            (np.floor(_timestamps), _lats, _lons, _alts)
+        ).tolist()
+
+
+if __name__ == "__main__":
+    # Compare prediction latency (and landing positions) against the CUSF predictor binary, on the same dataset.
+    #   python -m chasemapper.gfspredictor gfs_directory [pred_binary]
+    import sys
+    from .earthmaths import position_info
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+
+    _gfs_path = sys.argv[1]
+
+    _start = time.time()
+    _predictor = GFSPredictor(gfs_path=_gfs_path)
+    print("Dataset load: %.3f s" % (time.time() - _start))
+
+    _start = time.time()
+    GFSPredictor(gfs_path=_gfs_path)
+    print("Dataset load (cached): %.3f s" % (time.time() - _start))
+
+    _launch_time = _predictor.wind_field.start_time
+    _lat = float(np.mean(_predictor.wind_field.latitudes))
+    _lon = float(np.mean(_predictor.wind_field.longitudes))
+    if _lon > 180.0:
+        _lon -= 360.0
+
+    _scenarios = {
+        "Ascent": {"launch_alt": 100, "ascent_rate": 5.0, "descent_rate": 5.0, "burst_alt": 30000, "descent_mode": False},
+        "Descent": {"launch_alt": 20000, "ascent_rate": 5.0, "descent_rate": 5.0, "burst_alt": 20000, "descent_mode": True},
+    }
+
+    _binary = None
+    if len(sys.argv) > 2:
+        from cusfpredict.predict import Predictor
+
+        _binary = Predictor(bin_path=sys.argv[2], gfs_path=_gfs_path)
+
+    _runs = 10
+    for _name, _params in _scenarios.items():
+        _params = dict(_params, launch_lat=_lat, launch_lon=_lon, launch_time=_launch_time)
+
+        _start = time.time()
+        for i in range(_runs):
+            _path = _predictor.predict(**_params)
+        _numpy_time = (time.time() - _start) / _runs
+        print(
+            "%s - In-process: %.1f ms/prediction, %d points, landing %.5f, %.5f"
+            % (_name, _numpy_time * 1000, len(_path), _path[-1][1], _path[-1][2])
+        )
+
+        if _binary is not None:
+            _start = time.time()
+            for i in range(_runs):
+                _bin_path = _binary.predict(**_params)
+            _bin_time = (time.time() - _start) / _runs
+            _error = position_info(
+                (_path[-1][1], _path[-1][2], 0), (_bin_path[-1][1], _bin_path[-1][2], 0)
+            )["great_circle_distance"]
+            print(
+                "%s - Binary: %.1f ms/prediction, %d points, landing %.5f, %.5f (difference %.0f m), speedup %.1fx"
+                % (
+                    _name,
+                    _bin_time * 1000,
+                    len(_bin_path),
+                    _bin_path[-1][1],
+                    _bin_path[-1][2],
+                    _error,
+                    _bin_time / _numpy_time,
+                )
+            )
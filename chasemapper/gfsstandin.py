@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - GFS Server Stand-In
+#
+#   A small local HTTP server which stands in for the NOMADS GFS data server, so that the GFS downloader
+#   can be exercised offline. It serves fake GFS forecast files (made up of correctly-framed GRIB2 messages
+#   with random contents) and their .idx index files, supporting HEAD and range requests, with
+#   configurable latency, per-connection bandwidth limits, and dropped connections.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import datetime
+import logging
+import numpy as np
+import random
+import re
+import struct
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from .gfsdownload import GFS_LEVELS, GFS_MODELS, GFS_PARAMS
+
+# Parameters which are in the real files but not used by the predictor, so the stand-in files
+# have messages which the downloader must skip over.
+OTHER_PARAMS = ["TMP", "RH"]
+
+
+def fake_grib_message(length, seed):
+    """ Generate a GRIB2 message of the given length, with random contents """
+    _body = np.random.default_rng(seed).integers(0, 256, length - 20, dtype=np.uint8).tobytes()
+    return b"GRIB" + b"\x00\x00" + b"\x00\x02" + struct.pack(">Q", length) + _body + b"7777"
+
+
+def fake_gfs_file(model_dt, forecast_time, message_size=20000):
+    """ Generate the contents of a fake GFS forecast file and its index.
+
+    Returns:
+        tuple: (file data (bytes), index text (str))
+    """
+    _data = []
+    _index = []
+    _offset = 0
+    _number = 1
+    for _level in GFS_LEVELS:
+        for _param in GFS_PARAMS + OTHER_PARAMS:
+            _length = message_size + (_number * 37) % 1000
+            _data.append(fake_grib_message(_length, (forecast_time, _number)))
+            _index.append(
+                "%d:%d:d=%s:%s:%s mb:%s:"
+                % (
+                    _number,
+                    _offset,
+                    model_dt.strftime("%Y%m%d%H"),
+                    _param,
+                    ("%g" % _level),
+                    "anl" if forecast_time == 0 else "%d hour fcst" % forecast_time,
+                )
+            )
+            _offset += _length
+            _number += 1
+
+    return (b"".join(_data), "\n".join(_index) + "\n")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server handling each request in a new thread (http.server.ThreadingHTTPServer is Python 3.7+) """
+
+    daemon_threads = True
+
+
+class GFSStandIn(object):
+    """ Local stand-in for the NOMADS GFS data server.
+
+    Serves a single GFS model run (by default the most recent 6-hourly run), at:
+        <url>/gfs.YYYYMMDD/HH/atmos/<file> and <file>.idx
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        model="0p50",
+        model_dt=None,
+        message_size=20000,
+        latency=0.0,
+        bandwidth=0,
+        failure_rate=0.0,
+    ):
+        """ Create a GFSStandIn. Call start() to start serving requests.
+
+        Args:
+            host (str): Host to listen on.
+            port (int): Port to listen on. 0 picks a free port.
+            model (str): GFS model to serve.
+            model_dt (datetime): Model run time to serve. Defaults to the most recent 6-hourly run.
+            message_size (int): Approximate size of each GRIB message, in bytes.
+            latency (float): Time to wait before responding to each request, in seconds.
+            bandwidth (int): Maximum transfer rate of each connection, in bytes/second. 0 is unlimited.
+            failure_rate (float): Fraction of GRIB file downloads which are dropped part-way through.
+        """
+        if model_dt is None:
+            _now = datetime.datetime.utcnow()
+            model_dt = datetime.datetime(_now.year, _now.month, _now.day, _now.hour - _now.hour % 6)
+
+        self.model = model
+        self.model_dt = model_dt
+        self.message_size = message_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+
+        self.lock = Lock()
+        self.files = {}
+        self.stats = {"requests": 0, "bytes": 0, "dropped": 0}
+
+        _standin = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                _standin.handle_request(self, head=True)
+
+            def do_GET(self):
+                _standin.handle_request(self, head=False)
+
+            def log_message(self, format, *args):
+                logging.debug("GFS Stand-In - " + format % args)
+
+        self.server = _ThreadingHTTPServer((host, port), _Handler)
+        self.server_thread = None
+
+    @property
+    def url(self):
+        """ Base URL of the stand-in server """
+        return "http://%s:%d" % self.server.server_address[:2]
+
+    def get_file(self, name):
+        """ Get the (data, index) of a forecast file, or None if it does not exist """
+        _match = re.match(r"^gfs\.t(\d\d)z\.(.*)\.f(\d\d\d)$", name)
+        if (_match is None) or (int(_match.group(1)) != self.model_dt.hour):
+            return None
+
+        _forecast_time = int(_match.group(3))
+        if name != GFS_MODELS[self.model]["file"] % (self.model_dt.hour, _forecast_time):
+            return None
+        if _forecast_time not in GFS_MODELS[self.model]["times"]:
+            return None
+
+        with self.lock:
+            if name not in self.files:
+                self.files[name] = fake_gfs_file(self.model_dt, _forecast_time, self.message_size)
+            return self.files[name]
+
+    def handle_request(self, handler, head=False):
+        """ Respond to a HEAD or GET request """
+        with self.lock:
+            self.stats["requests"] += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        _prefix = "/gfs.%s/%02d/atmos/" % (self.model_dt.strftime("%Y%m%d"), self.model_dt.hour)
+        _file = None
+        _index = False
+        if handler.path.startswith(_prefix):
+            _name = handler.path[len(_prefix) :]
+            _index = _name.endswith(".idx")
+            if _index:
+                _file = self.get_file(_name[:-4])
+                _data = _file[1].encode() if _file is not None else None
+            else:
+                _file = self.get_file(_name)
+                _data = _file[0] if _file is not None else None
+
+        if _file is None:
+            handler.send_response(404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        _status = 200
+        _start = 0
+        _end = len(_data) - 1
+        _range = handler.headers.get("Range")
+        if _range is not None:
+            _match = re.match(r"^bytes=(\d+)-(\d*)$", _range)
+            if _match is None:
+                handler.send_response(416)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            _status = 206
+            _start = int(_match.group(1))
+            if _match.group(2) != "":
+                _end = min(_end, int(_match.group(2)))
+
+        handler.send_response(_status)
+        handler.send_header("Content-Length", str(_end - _start + 1))
+        handler.send_header("Accept-Ranges", "bytes")
+        if _status == 206:
+            handler.send_header("Content-Range", "bytes %d-%d/%d" % (_start, _end, len(_data)))
+        handler.end_headers()
+
+        if head:
+            return
+
+        # Drop some GRIB file downloads part-way through.
+        _drop_at = None
+        if (not _index) and (random.random() < self.failure_rate):
+            _drop_at = _start + random.randint(0, _end - _start)
+
+        try:
+            _block = 16384
+            for _offset in range(_start, _end + 1, _block):
+                _block_end = min(_end + 1, _offset + _block)
+                if (_drop_at is not None) and (_block_end > _drop_at):
+                    handler.wfile.write(_data[_offset:_drop_at])
+                    with self.lock:
+                        self.stats["dropped"] += 1
+                    handler.close_connection = True
+                    return
+
+                handler.wfile.write(_data[_offset:_block_end])
+                with self.lock:
+                    self.stats["bytes"] += _block_end - _offset
+                if self.bandwidth > 0:
+                    time.sleep((_block_end - _offset) / self.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True
+
+    def start(self):
+        """ Start serving requests in a background thread """
+        self.server_thread = Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def stop(self):
+        """ Stop the server """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # Run the GFS downloader against the stand-in, and report throughput, resume and install behaviour.
+    #   python -m chasemapper.gfsstandin [--hours 12] [--bandwidth 2000000]
+    import argparse
+    import os
+    import shutil
+    import tempfile
+    from .gfsdownload import GFSDownloader, GFSDownloadError, verify_grib_file
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=12, help="Forecast hours to download.")
+    parser.add_argument("--bandwidth", type=int, default=2000000, help="Per-connection bandwidth, bytes/second.")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.ERROR)
+
+    def _fake_converter(grib_file, output_dir, lat, lon, latdelta, londelta):
+        # The stand-in GRIB messages have random contents, so only check the framing, and write a placeholder.
+        _count = verify_grib_file(grib_file)
+        _name = os.path.join(output_dir, "gfs_%s.dat" % os.path.basename(grib_file).split(".")[0])
+        with open(_name, "w") as _f:
+            _f.write("%d messages\n" % _count)
+        return _name
+
+    _standin = GFSStandIn(bandwidth=args.bandwidth)
+    _standin.start()
+    _work = tempfile.mkdtemp()
+    _gfs_dir = os.path.join(_work, "gfs")
+
+    def _downloader(connections, retries=5, progress=None):
+        return GFSDownloader(
+            _gfs_dir,
+            -34.9,
+            138.6,
+            forecast_hours=args.hours,
+            connections=connections,
+            base_url=_standin.url,
+            chunk_size=256 * 1024,
+            retries=retries,
+            progress_callback=progress,
+            converter=_fake_converter,
+        )
+
+    for _connections in (1, 4, 8):
+        shutil.rmtree(_work)
+        os.makedirs(_work)
+        _start = time.time()
+        _downloader(_connections).run()
+        print("%d connection(s): %.2f seconds" % (_connections, time.time() - _start))
+
+    print("Installed: %s" % sorted(os.listdir(_gfs_dir)))
+
+    # Interrupted download - some downloads are dropped part-way through, and there are no retries.
+    _standin.failure_rate = 0.02
+    _progress = []
+    try:
+        _downloader(4, retries=0, progress=_progress.append).run(force=True)
+    except GFSDownloadError as e:
+        _last = _progress[-1]
+        print(
+            "Interrupted download: %s (%.1f%% downloaded, previous dataset still installed: %s)"
+            % (
+                str(e),
+                100.0 * _last["bytes_done"] / _last["bytes_total"],
+                os.path.exists(os.path.join(_gfs_dir, "dataset.txt")),
+            )
+        )
+
+    # Resume the download.
+    _standin.failure_rate = 0.0
+    _bytes = _standin.stats["bytes"]
+    _progress = []
+    print("Resumed download: %s" % _downloader(4, progress=_progress.append).run(force=True))
+    print(
+        "Resume fetched %.1f MB of %.1f MB, %d progress events, stages %s"
+        % (
+            (_standin.stats["bytes"] - _bytes) / 1e6,
+            _progress[-1]["bytes_total"] / 1e6,
+            len(_progress),
+            sorted(set([_p["stage"] for _p in _progress])),
+        )
+    )
+
+    # Flaky server - 15% of downloads dropped, recovered by retries.
+    _standin.failure_rate = 0.15
+    print("15%% dropped connections: %s" % _downloader(4).run(force=True))
+
+    _standin.stop()
+    shutil.rmtree(_work)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Bearing Likelihood Heatmap
+#
+#   Accumulate the likelihood of the transmitter location over a grid around the chase car, using a
+#   von Mises model of the bearing errors, and render it as an image for display on the map.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import base64
+import struct
+import zlib
+import numpy as np
+from .triangulation import METRES_PER_DEGREE
+
+
+def png_encode(rgba):
+    """ Encode an RGBA image (an NxMx4 uint8 array, top row first) as a PNG """
+
+    def _chunk(name, data):
+        return struct.pack(">I", len(data)) + name + data + struct.pack(">I", zlib.crc32(name + data) & 0xFFFFFFFF)
+
+    (_height, _width, _) = rgba.shape
+    # Each row is prefixed with a filter type byte (0 - no filtering).
+    _raw = np.zeros((_height, _width * 4 + 1), dtype=np.uint8)
+    _raw[:, 1:] = rgba.reshape(_height, _width * 4)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", struct.pack(">IIBBBBB", _width, _height, 8, 6, 0, 0, 0))
+        + _chunk(b"IDAT", zlib.compress(_raw.tobytes(), 6))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def render_snapshot(snapshot):
+    """ Render a heatmap snapshot (see SourceHeatmap.snapshot) as an image, for display on the map.
+
+    The likelihood of the joint bearings becomes very sharply peaked as bearings accumulate, so the image shows
+    the geometric mean of the bearing likelihoods (exp(log-likelihood / N)), relative to the most likely cell.
+
+    Returns:
+        dict: Source, bounds ([[south, west], [north, east]]), and the image as a PNG data URL
+            (None if the grid holds no bearings).
+    """
+    if snapshot["bearings"] == 0:
+        return {"source": snapshot["source"], "bearings": 0, "bounds": None, "image": None}
+
+    _grid = snapshot["grid"]
+    _p = np.exp((_grid - _grid.max()) / snapshot["bearings"])
+
+    # Transparent where unlikely, through red to yellow where most likely.
+    _rgba = np.zeros(_grid.shape + (4,), dtype=np.uint8)
+    _rgba[:, :, 0] = 255
+    _rgba[:, :, 1] = (255 * _p**4).astype(np.uint8)
+    _rgba[:, :, 3] = (200 * _p**2).astype(np.uint8)
+
+    return {
+        "source": snapshot["source"],
+        "bearings": snapshot["bearings"],
+        "bounds": snapshot["bounds"],
+        "image": "data:image/png;base64," + base64.b64encode(png_encode(_rgba)).decode(),
+    }
+
+
+class SourceHeatmap(object):
+    """ Bearing log-likelihood grid for a single source of bearings.
+
+    Each bearing from (x0,y0) with true bearing t adds kappa * cos(a - t) to every cell, where a is the bearing
+    from (x0,y0) to the cell. This is the log of the von Mises likelihood of the bearing, less a constant, so
+    the grid holds the log-likelihood of each cell being the transmitter location. Removed bearings subtract
+    their contribution, so each update costs one pass over the grid, independent of the number of bearings.
+
+    Once the car moves out of the middle half of the grid, the grid should be re-centred on the car, which means
+    rebuilding it from all of the bearings. This is slow, so rather than doing it as a bearing is added, the owner
+    re-centres the grid when convenient (see start_recentre), and can do so without blocking updates.
+    """
+
+    def __init__(self, source, lat, lon, extent=20000.0, resolution=256, sigma=10.0):
+        """ Create a SourceHeatmap.
+
+        Args:
+            source (str): Bearing source.
+            lat, lon (float): Centre of the grid.
+            extent (float): Distance from the centre to the edge of the grid, in metres.
+            resolution (int): Number of grid cells along each side.
+            sigma (float): Standard deviation of the bearing errors, in degrees.
+        """
+        self.source = source
+        self.extent = extent
+        self.resolution = resolution
+        self.kappa = 1.0 / np.radians(sigma) ** 2
+
+        # Cell centres, in metres east and north of the grid centre. Row 0 is the northern edge.
+        # Contributions are calculated in single precision, which is ample, and halves the update time. The grid
+        # accumulates in double precision, so removing a bearing exactly cancels its contribution.
+        _cells = ((np.arange(resolution) + 0.5) * (2.0 * extent / resolution) - extent).astype(np.float32)
+        (self.x, self.y) = np.meshgrid(_cells, _cells[::-1])
+
+        # Bearings in the grid, keyed by bearing key, as (lat, lon, true bearing).
+        self.bearings = {}
+        # Position the grid should be re-centred on, if the car has moved out of the middle half of the grid.
+        self.recentre = None
+        self.recentring = False
+        self.set_centre(lat, lon)
+
+    def set_centre(self, lat, lon):
+        """ Move the grid centre, and rebuild the grid from the stored bearings """
+        self.grid = self.build_grid(lat, lon, self.bearings)
+        (self.lat, self.lon, self.scale) = self.get_centre(lat, lon)
+
+    def get_centre(self, lat, lon):
+        """ Return the centre (lat, lon, metres per degree of longitude) of a grid centred on lat, lon """
+        return (lat, lon, METRES_PER_DEGREE * np.cos(np.radians(lat)))
+
+    def build_grid(self, lat, lon, bearings):
+        """ Build a grid centred on lat, lon from a dictionary of bearings. This does not modify the heatmap. """
+        _centre = self.get_centre(lat, lon)
+        _grid = np.zeros((self.resolution, self.resolution))
+
+        for (_lat, _lon, _bearing) in bearings.values():
+            _grid += self.contribution(_lat, _lon, _bearing, _centre)
+
+        return _grid
+
+    def start_recentre(self):
+        """ Start re-centring the grid on the car, if it has moved out of the middle half of the grid.
+
+        Returns:
+            tuple: The new centre and a copy of the bearings (lat, lon, bearings), to build the new grid from
+                (using build_grid) and pass to finish_recentre, or None if the grid does not need re-centring.
+        """
+        if (self.recentre is None) or self.recentring:
+            return None
+
+        self.recentring = True
+        return (self.recentre[0], self.recentre[1], dict(self.bearings))
+
+    def finish_recentre(self, lat, lon, bearings, grid):
+        """ Move the grid centre to lat, lon, using a grid built from the copy of the bearings returned by
+        start_recentre. Bearings added or removed since the copy was made are applied to the new grid.
+
+        Returns:
+            bool: True if the grid was re-centred. If many bearings have changed since the copy was made, applying
+                them would take nearly as long as rebuilding the grid, so the new grid is discarded, and the grid
+                is left to be re-centred later. The current grid remains valid, just off-centre.
+        """
+        self.recentring = False
+
+        _added = [_bearing for (_key, _bearing) in self.bearings.items() if _key not in bearings]
+        _removed = [_bearing for (_key, _bearing) in bearings.items() if _key not in self.bearings]
+        if len(_added) + len(_removed) > max(10, len(self.bearings) // 10):
+            return False
+
+        _centre = self.get_centre(lat, lon)
+        for _bearing in _added:
+            grid += self.contribution(*_bearing, centre=_centre)
+        for _bearing in _removed:
+            grid -= self.contribution(*_bearing, centre=_centre)
+
+        (self.lat, self.lon, self.scale) = _centre
+        self.grid = grid
+
+        # The car may have moved on, out of the middle of the new grid.
+        if (self.recentre is not None) and not self.outside_middle(*self.recentre):
+            self.recentre = None
+
+        return True
+
+    def outside_middle(self, lat, lon):
+        """ Check if a position is outside the middle half of the grid """
+        _x = ((lon - self.lon + 180.0) % 360.0 - 180.0) * self.scale
+        _y = (lat - self.lat) * METRES_PER_DEGREE
+        return max(abs(_x), abs(_y)) > self.extent / 2.0
+
+    def contribution(self, lat, lon, bearing, centre=None):
+        """ Calculate the log-likelihood contribution of a bearing to each grid cell, for the current grid centre
+        or the supplied centre (lat, lon, metres per degree of longitude) """
+        (_lat0, _lon0, _scale) = (self.lat, self.lon, self.scale) if centre is None else centre
+        _dx = self.x - np.float32(((lon - _lon0 + 180.0) % 360.0 - 180.0) * _scale)
+        _dy = self.y - np.float32((lat - _lat0) * METRES_PER_DEGREE)
+
+        # cos(a - t) = cos(a)cos(t) + sin(a)sin(t), where sin(a) = dx/range and cos(a) = dy/range.
+        _t = np.radians(bearing)
+        _range = _dx * _dx + _dy * _dy
+        np.maximum(_range, np.float32(1.0), out=_range)
+        np.sqrt(_range, out=_range)
+        _dx *= np.float32(self.kappa * np.sin(_t))
+        _dy *= np.float32(self.kappa * np.cos(_t))
+        _dx += _dy
+        _dx /= _range
+        return _dx
+
+    def add(self, key, lat, lon, bearing):
+        """ Add a bearing to the grid """
+        self.bearings[key] = (lat, lon, bearing)
+        self.grid += self.contribution(lat, lon, bearing)
+
+        if self.outside_middle(lat, lon):
+            self.recentre = (lat, lon)
+
+    def remove(self, key):
+        """ Remove a bearing from the grid """
+        _bearing = self.bearings.pop(key, None)
+        if _bearing is None:
+            return
+
+        if len(self.bearings) == 0:
+            self.grid[:] = 0.0
+        else:
+            self.grid -= self.contribution(*_bearing)
+
+    def snapshot(self, downsample=2):
+        """ Copy what is needed to render the grid (using render_snapshot), downsampling it by the supplied factor.
+        This is much quicker than rendering, so the heatmap can be rendered without holding up updates. """
+        if len(self.bearings) == 0:
+            return {"source": self.source, "bearings": 0}
+
+        _n = self.resolution // downsample
+        _grid = self.grid[: _n * downsample, : _n * downsample]
+        _dlat = self.extent / METRES_PER_DEGREE
+        _dlon = self.extent / self.scale
+        return {
+            "source": self.source,
+            "bearings": len(self.bearings),
+            "bounds": [[self.lat - _dlat, self.lon - _dlon], [self.lat + _dlat, self.lon + _dlon]],
+            "grid": _grid.reshape(_n, downsample, _n, downsample).mean(axis=(1, 3)),
+        }
+
+    def render(self, downsample=2):
+        """ Render the grid as an image, for display on the map (see render_snapshot) """
+        return render_snapshot(self.snapshot(downsample))
+
+
+class BearingHeatmaps(object):
+    """ Maintain a bearing likelihood heatmap for each source of bearings (including each time-sequenced fox source).
+    Bearings from stationary cars (heading_valid False) are excluded, as their true bearing is unreliable.
+    """
+
+    def __init__(self, extent=20000.0, resolution=256, sigma=10.0, downsample=2):
+        """ Create a BearingHeatmaps store.
+
+        Args:
+            extent (float): Distance from the centre to the edge of each grid, in metres.
+            resolution (int): Number of grid cells along each side.
+            sigma (float): Standard deviation of the bearing errors, in degrees.
+            downsample (int): Downsampling factor of the rendered images.
+        """
+        self.extent = extent
+        self.resolution = resolution
+        self.sigma = sigma
+        self.downsample = downsample
+        self.sources = {}
+
+    def add(self, bearing):
+        """ Add a bearing (a bearing store record) to the heatmap for its source.
+
+        Returns:
+            str: The source of the bearing, or None if the bearing was not used.
+        """
+        if not bearing["heading_valid"]:
+            return None
+
+        _source = bearing["source"]
+        if _source not in self.sources:
+            self.sources[_source] = SourceHeatmap(
+                _source, bearing["lat"], bearing["lon"], self.extent, self.resolution, self.sigma
+            )
+
+        self.sources[_source].add(bearing["key"], bearing["lat"], bearing["lon"], bearing["true_bearing"])
+        return _source
+
+    def remove(self, bearing):
+        """ Remove a bearing (a bearing store record) from the heatmap for its source.
+
+        Returns:
+            str: The source of the bearing, or None if the bearing was not used.
+        """
+        _heatmap = self.sources.get(bearing["source"])
+        if (_heatmap is None) or (bearing["key"] not in _heatmap.bearings):
+            return None
+
+        _heatmap.remove(bearing["key"])
+        return bearing["source"]
+
+    def snapshot(self, source):
+        """ Copy the heatmap for a source, for rendering using render_snapshot """
+        return self.sources[source].snapshot(self.downsample)
+
+    def snapshot_all(self):
+        """ Copy the heatmaps for all sources, as a dictionary keyed by source """
+        return {_source: self.snapshot(_source) for _source in self.sources}
+
+    def render(self, source):
+        """ Render the heatmap for a source """
+        return render_snapshot(self.snapshot(source))
+
+    def render_all(self):
+        """ Render the heatmaps for all sources, as a dictionary keyed by source """
+        return {_source: render_snapshot(_snapshot) for (_source, _snapshot) in self.snapshot_all().items()}
+
+    def start_recentres(self):
+        """ Start re-centring the heatmaps which need it (see SourceHeatmap.start_recentre).
+
+        Returns:
+            list: (heatmap, lat, lon, bearings) for each heatmap to re-centre.
+        """
+        _recentres = []
+        for _heatmap in self.sources.values():
+            _recentre = _heatmap.start_recentre()
+            if _recentre is not None:
+                _recentres.append((_heatmap,) + _recentre)
+
+        return _recentres
+
+    def finish_recentre(self, heatmap, lat, lon, bearings, grid):
+        """ Finish re-centring a heatmap (see SourceHeatmap.finish_recentre).
+
+        Returns:
+            str: The source of the heatmap, or None if it was not re-centred (e.g. the heatmaps have been flushed since).
+        """
+        if (self.sources.get(heatmap.source) is not heatmap) or not heatmap.finish_recentre(lat, lon, bearings, grid):
+            return None
+
+        return heatmap.source
+
+    def flush(self):
+        """ Clear all heatmaps """
+        self.sources = {}
+
+
+if __name__ == "__main__":
+    # Time heatmap updates, and compare the incrementally-updated grid with one rebuilt from scratch.
+    #   python -m chasemapper.heatmap [--resolution 256]
+    import argparse
+    import time
+    from .earthmaths import position_info
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolution", type=int, default=256, help="Grid resolution.")
+    args = parser.parse_args()
+
+    _rng = np.random.default_rng(1)
+    _tx = (-34.85, 138.66)
+    _count = 2000
+    _window = 300
+
+    _heatmap = SourceHeatmap("sim", -34.9, 138.6, resolution=args.resolution)
+    _times = []
+    _recentre_times = []
+    _recentre = None
+    for _i in range(_count):
+        # Drive in circles which drift east, so the grid has to be re-centred.
+        _lat = -34.9 + 0.02 * np.sin(_i / 200.0)
+        _lon = 138.6 + 0.02 * np.cos(_i / 200.0) + 0.0001 * _i
+        _bearing = position_info((_lat, _lon, 0), (_tx[0], _tx[1], 0))["bearing"] + _rng.normal(0, 10.0)
+
+        _start = time.time()
+        _heatmap.add(_i, _lat, _lon, _bearing)
+        if _i >= _window:
+            _heatmap.remove(_i - _window)
+        _times.append(time.time() - _start)
+
+        # Re-centre as the owner would, with the grid built from the copy of the bearings 'in the background'
+        # while the next bearing is added and the oldest removed.
+        if _recentre is not None:
+            _heatmap.finish_recentre(*_recentre)
+            _recentre = None
+        _start_recentre = _heatmap.start_recentre()
+        if _start_recentre is not None:
+            _start = time.time()
+            _recentre = _start_recentre + (_heatmap.build_grid(*_start_recentre),)
+            _recentre_times.append(time.time() - _start)
+
+    if _recentre is not None:
+        _heatmap.finish_recentre(*_recentre)
+
+    _start = time.time()
+    _snapshot = _heatmap.snapshot()
+    _snapshot_time = time.time() - _start
+    _start = time.time()
+    _image = render_snapshot(_snapshot)
+    _render_time = time.time() - _start
+
+    _incremental = _heatmap.grid.copy()
+    _start = time.time()
+    _heatmap.set_centre(_heatmap.lat, _heatmap.lon)
+    _rebuild_time = time.time() - _start
+
+    # Location of the most likely cell.
+    _row, _col = np.unravel_index(np.argmax(_heatmap.grid), _heatmap.grid.shape)
+    _peak_lat = _heatmap.lat + _heatmap.y[_row, 0] / METRES_PER_DEGREE
+    _peak_lon = _heatmap.lon + _heatmap.x[0, _col] / _heatmap.scale
+    _error = position_info((_tx[0], _tx[1], 0), (_peak_lat, _peak_lon, 0))["great_circle_distance"]
+
+    print(
+        "%dx%d grid: %.2f ms per update (add + evict, max %.1f ms), rebuild of %d bearings %.1f ms, %d re-centres"
+        % (
+            args.resolution,
+            args.resolution,
+            np.mean(_times) * 1000,
+            np.max(_times) * 1000,
+            _window,
+            _rebuild_time * 1000,
+            len(_recentre_times),
+        )
+    )
+    print(
+        "Snapshot: %.2f ms, render: %.2f ms, %d byte data URL. Incremental vs rebuilt grid max difference %.2e. Peak error %.0f m"
+        % (
+            _snapshot_time * 1000,
+            _render_time * 1000,
+            len(_image["image"]),
+            np.abs(_incremental - _heatmap.grid).max(),
+            _error,
+        )
+    )
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Prediction Cache
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import logging
+from collections import OrderedDict
+from threading import Lock
+from .geometry import datetime_to_epoch
+
+
+class PredictionCache(object):
+    """ Least-recently-used cache of prediction results, keyed on a quantised flight state.
+
+    If a payload has barely moved since its last prediction (or its telemetry has stalled),
+    the quantised state will be unchanged, and the previous result can be re-used
+    instead of re-running the predictor.
+    """
+
+    def __init__(
+        self,
+        max_entries=64,
+        latlon_step=0.001,
+        alt_step=50.0,
+        rate_step=0.5,
+        burst_step=100.0,
+        time_bucket=300.0,
+    ):
+        """ Create a PredictionCache.
+
+        Args:
+            max_entries (int): Maximum number of cached results. 0 disables the cache.
+            latlon_step (float): Launch latitude/longitude quantisation, in degrees.
+            alt_step (float): Launch altitude quantisation, in metres.
+            rate_step (float): Ascent/descent rate quantisation, in m/s.
+            burst_step (float): Burst altitude quantisation, in metres.
+            time_bucket (float): Launch time quantisation, in seconds.
+        """
+        self.max_entries = max_entries
+        self.latlon_step = latlon_step
+        self.alt_step = alt_step
+        self.rate_step = rate_step
+        self.burst_step = burst_step
+        self.time_bucket = time_bucket
+
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, job, dataset, params):
+        """ Produce a cache key for a prediction job.
+
+        Args:
+            job (str): Job type, e.g. 'pred' or 'abort'.
+            dataset (str): Identifier of the dataset in use, e.g. the GFS model name.
+            params (dict): Prediction parameters, with launch_time, launch_lat, launch_lon, launch_alt,
+                ascent_rate, descent_rate, burst_alt and descent_mode fields.
+        """
+        return (
+            job,
+            dataset,
+            round(params["launch_lat"] / self.latlon_step),
+            round(params["launch_lon"] / self.latlon_step),
+            round(params["launch_alt"] / self.alt_step),
+            round(params["ascent_rate"] / self.rate_step),
+            round(params["descent_rate"] / self.rate_step),
+            round(params["burst_alt"] / self.burst_step),
+            bool(params["descent_mode"]),
+            int(datetime_to_epoch(params["launch_time"]) // self.time_bucket),
+        )
+
+    def get(self, key):
+        """ Look up a cached result. Returns None on a cache miss. """
+        if self.max_entries <= 0:
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            else:
+                self.misses += 1
+                return None
+
+    def put(self, key, result):
+        """ Add a result to the cache, evicting the least-recently-used entry if the cache is full """
+        if self.max_entries <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """ Clear all cached results (the hit/miss counters are retained) """
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        """ Return the cache statistics as a dictionary """
+        with self.lock:
+            _total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / _total) if _total > 0 else 0.0,
+            }
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Prediction Path Post-Processing
+#
+#   Simplify predicted flight paths before they are sent to clients, and optionally encode them
+#   in a compact form (Google's Encoded Polyline Algorithm, extended to include altitude).
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import numpy as np
+
+# Approximate metres per degree of latitude.
+METRES_PER_DEGREE = 111320.0
+
+# Encoding precisions (decimal places) for latitude, longitude and altitude.
+# 5 decimal places of latitude/longitude is ~1 metre.
+POLYLINE_PRECISION = (5, 5, 0)
+
+
+def simplify_path(path, tolerance, keep=[]):
+    """ Simplify a path using the Ramer-Douglas-Peucker algorithm, with distances measured horizontally.
+
+    Args:
+        path (np.ndarray): Array of [lat, lon, alt] points.
+        tolerance (float): Maximum horizontal distance of any removed point from the simplified path, in metres.
+        keep (list): Indexes of points which must be retained (e.g. the burst point).
+
+    Returns:
+        np.ndarray: Indexes of the retained points, in order.
+    """
+    _n = len(path)
+    if (_n < 3) or (tolerance <= 0):
+        return np.arange(_n)
+
+    # Project to local flat-earth coordinates, in metres.
+    _lat0 = np.radians(np.mean(path[:, 0]))
+    _xy = np.empty((_n, 2))
+    _xy[:, 0] = path[:, 1] * METRES_PER_DEGREE * np.cos(_lat0)
+    _xy[:, 1] = path[:, 0] * METRES_PER_DEGREE
+
+    _retain = np.zeros(_n, dtype=bool)
+    _retain[0] = True
+    _retain[-1] = True
+
+    # Forced points split the path into sections, which are simplified independently.
+    _breaks = sorted(set([0, _n - 1] + [int(i) for i in keep if 0 <= i < _n]))
+    _retain[_breaks] = True
+    _stack = [(_breaks[i], _breaks[i + 1]) for i in range(len(_breaks) - 1)]
+
+    while _stack:
+        (_start, _end) = _stack.pop()
+        if _end - _start < 2:
+            continue
+
+        # Perpendicular distance of each intermediate point from the start-end segment.
+        _seg = _xy[_end] - _xy[_start]
+        _rel = _xy[_start + 1 : _end] - _xy[_start]
+        _seg_len2 = np.dot(_seg, _seg)
+        if _seg_len2 > 0:
+            _t = np.clip(np.dot(_rel, _seg) / _seg_len2, 0.0, 1.0)
+            _dist = np.hypot(*(_rel - np.outer(_t, _seg)).T)
+        else:
+            _dist = np.hypot(*_rel.T)
+
+        _max_idx = int(np.argmax(_dist))
+        if _dist[_max_idx] > tolerance:
+            _split = _start + 1 + _max_idx
+            _retain[_split] = True
+            _stack.append((_start, _split))
+            _stack.append((_split, _end))
+
+    return np.flatnonzero(_retain)
+
+
+def process_prediction_path(path, current_pos, find_burst=True, tolerance=0.0):
+    """ Convert a predictor output path to a polyline, simplify it, and determine the burst and landing positions.
+
+    Args:
+        path (list): Predictor output, as a list of [timestamp, lat, lon, alt] points.
+        current_pos (list): Current payload position, as [timestamp, lat, lon, alt], which is prepended to the path.
+        find_burst (bool): Determine the burst position (the highest point of the path).
+        tolerance (float): Simplification tolerance in metres. 0 disables simplification.
+
+    Returns:
+        dict: path (list of [lat, lon, alt]), landing ([lat, lon, alt]), and burst ([lat, lon, alt], or [] if not found).
+    """
+    _path = np.empty((len(path) + 1, 3))
+    _path[0] = current_pos[1:4]
+    _path[1:] = np.asarray(path, dtype=np.float64)[:, 1:4]
+
+    _keep = []
+    _burst = []
+    if find_burst:
+        _burst_idx = int(np.argmax(_path[:, 2]))
+        _burst = _path[_burst_idx].tolist()
+        _keep.append(_burst_idx)
+
+    _simplified = _path[simplify_path(_path, tolerance, keep=_keep)]
+
+    return {
+        "path": _simplified.tolist(),
+        "landing": _simplified[-1].tolist(),
+        "burst": _burst,
+    }
+
+
+def encode_polyline(path, precision=POLYLINE_PRECISION):
+    """ Encode a path using Google's Encoded Polyline Algorithm, with an arbitrary number of values per point.
+    Each value is quantised, delta-encoded against the previous point, and written as a base64-like varint.
+
+    Args:
+        path (list): List of points, e.g. [lat, lon, alt].
+        precision (tuple): Number of decimal places to keep for each value.
+
+    Returns:
+        str: Encoded polyline.
+    """
+    if len(path) == 0:
+        return ""
+
+    _scale = 10.0 ** np.array(precision)
+    _quantised = np.round(np.asarray(path, dtype=np.float64) * _scale).astype(np.int64)
+    _deltas = np.diff(_quantised, axis=0, prepend=0).ravel()
+    # Zig-zag encode, so small negative values also encode to short strings.
+    _values = np.where(_deltas < 0, ~(_deltas << 1), _deltas << 1)
+
+    _chars = []
+    for _value in _values.tolist():
+        while _value >= 0x20:
+            _chars.append(chr((0x20 | (_value & 0x1F)) + 63))
+            _value >>= 5
+        _chars.append(chr(_value + 63))
+
+    return "".join(_chars)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """ Decode a polyline produced by encode_polyline. (The web client has an equivalent decoder.) """
+    _values = []
+    _value = 0
+    _shift = 0
+    for _c in encoded:
+        _b = ord(_c) - 63
+        _value |= (_b & 0x1F) << _shift
+        _shift += 5
+        if _b < 0x20:
+            _values.append(~(_value >> 1) if (_value & 1) else (_value >> 1))
+            _value = 0
+            _shift = 0
+
+    _dims = len(precision)
+    _deltas = np.array(_values, dtype=np.int64).reshape(-1, _dims)
+    return (np.cumsum(_deltas, axis=0) / 10.0 ** np.array(precision)).tolist()
+
+
+if __name__ == "__main__":
+    # Report the reduction in predictor_update message size for a synthetic prediction, with the wind
+    # veering with altitude (so the path curves).
+    import json
+    from .gfspredictor import altitude_profile
+
+    (_altitude, _times, _burst_time) = altitude_profile(0, 5.0, 5.0, 30000, timestep=10)
+    _alts = _altitude(_times)
+    _speed = 5.0 + _alts / 1000.0
+    _heading = np.radians(_alts / 100.0)
+    _east = np.cumsum(_speed * np.sin(_heading) * 10.0)
+    _north = np.cumsum(_speed * np.cos(_heading) * 10.0)
+    _lat = -34.9 + _north / METRES_PER_DEGREE
+    _lon = 138.6 + _east / (METRES_PER_DEGREE * np.cos(np.radians(34.9)))
+    _path = np.column_stack((_times, _lat, _lon, _alts)).tolist()
+
+    _full = process_prediction_path(_path[1:], _path[0])
+    print("Full path: %d points, %d bytes" % (len(_full["path"]), len(json.dumps(_full["path"]))))
+
+    for _tolerance in (5, 20, 100):
+        _simple = process_prediction_path(_path[1:], _path[0], tolerance=_tolerance)
+        _encoded = encode_polyline(_simple["path"])
+        _decoded = np.array(decode_polyline(_encoded))
+        print(
+            "Tolerance %d m: %d points, %d bytes, %d bytes encoded (max decode error %.6f deg)"
+            % (
+                _tolerance,
+                len(_simple["path"]),
+                len(json.dumps(_simple["path"])),
+                len(json.dumps(_encoded)),
+                np.max(np.abs(_decoded[:, :2] - np.array(_simple["path"])[:, :2])),
+            )
+        )
+        assert _simple["burst"] == _full["burst"] and _simple["landing"] == _full["landing"]
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Prediction Job Pool
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, RLock, Timer
+
+
+class PredictionPool(object):
+    """ Run flight path prediction jobs concurrently on a pool of worker threads.
+
+    Jobs are submitted in groups (e.g. the main and abort predictions for a payload), and the jobs
+    within a group run in parallel. Once every job in a group has completed, or the group's deadline
+    has passed, the group's callback is run with the results. This happens as each group completes,
+    so a slow prediction for one payload does not hold up the results for other payloads.
+
+    Jobs that have not started by the deadline are cancelled. Jobs still running at the deadline are
+    abandoned, and their results discarded when they eventually finish. The callback is told which
+    jobs timed out, so it can tell them apart from jobs which failed. Until its abandoned jobs have
+    finished, the group is still treated as running, so a stuck job (e.g. a hung predictor) can't be
+    resubmitted over and over until it ties up every worker thread.
+    """
+
+    def __init__(self, workers=4, timeout=20.0):
+        """ Create a PredictionPool.
+
+        Args:
+            workers (int): Number of worker threads.
+            timeout (float): Default per-group deadline, in seconds.
+        """
+        self.workers = workers
+        self.timeout = timeout
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="predictor"
+        )
+
+        # Active job groups, keyed by group ID.
+        self.groups = {}
+        # Sets of abandoned jobs which are still running, keyed by group ID.
+        self.abandoned = {}
+        self.lock = RLock()
+        self.idle = Condition(self.lock)
+
+        # Running job statistics
+        self.stats = {"completed": 0, "failed": 0, "timed_out": 0}
+
+    def submit(self, group_id, jobs, callback, timeout=None):
+        """ Submit a group of prediction jobs.
+
+        Args:
+            group_id (str): Unique ID for this group (e.g. the payload callsign). Only one group
+                with a given ID may be running (or have abandoned jobs still running) at once.
+            jobs (dict): Dictionary of job name -> (function, kwargs)
+            callback (function): Called as callback(group_id, results, timed_out) once all jobs have
+                finished or the deadline has passed. results is a dictionary of job name -> function
+                return value, or None if the job failed or timed out. timed_out is a list of the names
+                of the jobs which timed out. The callback is not run if the group is cancelled.
+            timeout (float): Deadline for this group, in seconds. Defaults to the pool timeout.
+
+        Returns:
+            bool: True if the group was submitted, False if a group with this ID is already running.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        with self.lock:
+            if self._running(group_id):
+                return False
+
+            _group = {
+                "futures": {},
+                "results": {},
+                "callback": callback,
+                "submitted": time.time(),
+                "finished": False,
+                "timer": None,
+            }
+            self.groups[group_id] = _group
+
+            for _name, (_function, _kwargs) in jobs.items():
+                _group["futures"][_name] = self.executor.submit(_function, **_kwargs)
+
+            _group["timer"] = Timer(timeout, self._on_deadline, args=(group_id, _group))
+            _group["timer"].daemon = True
+            _group["timer"].start()
+
+        # Register the completion callbacks outside of the lock, as these may be called
+        # immediately if a job has already completed.
+        for _name, _future in _group["futures"].items():
+            _future.add_done_callback(
+                lambda _f, _name=_name: self._on_job_done(group_id, _group, _name, _f)
+            )
+
+        if len(jobs) == 0:
+            self._finish(group_id, _group)
+
+        return True
+
+    def _on_job_done(self, group_id, group, name, future):
+        """ Record the result of a completed job, and finish the group if all jobs are done. """
+        with self.lock:
+            _abandoned = self.abandoned.get(group_id)
+            if (_abandoned is not None) and (future in _abandoned):
+                _abandoned.discard(future)
+                if len(_abandoned) == 0:
+                    self.abandoned.pop(group_id)
+                logging.info("Prediction Pool - Abandoned job %s/%s has finished." % (group_id, name))
+
+            if group["finished"] or future.cancelled():
+                # The group has already passed its deadline, discard this result.
+                return
+
+            try:
+                group["results"][name] = future.result()
+                self.stats["completed"] += 1
+            except Exception as e:
+                logging.error(
+                    "Prediction Pool - Job %s/%s failed - %s" % (group_id, name, str(e))
+                )
+                group["results"][name] = None
+                self.stats["failed"] += 1
+
+            if len(group["results"]) < len(group["futures"]):
+                return
+
+        self._finish(group_id, group)
+
+    def _on_deadline(self, group_id, group, cancelled=False):
+        """ Handle a group reaching its deadline (or being cancelled). Cancel or abandon any unfinished jobs. """
+        _timed_out = []
+        with self.lock:
+            if group["finished"]:
+                return
+
+            for _name, _future in group["futures"].items():
+                if _name not in group["results"]:
+                    if _future.cancel():
+                        logging.warning(
+                            "Prediction Pool - Cancelled job %s/%s before it started."
+                            % (group_id, _name)
+                        )
+                    else:
+                        logging.warning(
+                            "Prediction Pool - Job %s/%s %s, abandoning."
+                            % (group_id, _name, "cancelled" if cancelled else "exceeded deadline")
+                        )
+                        if not _future.done():
+                            self.abandoned.setdefault(group_id, set()).add(_future)
+                    group["results"][_name] = None
+                    _timed_out.append(_name)
+                    if not cancelled:
+                        self.stats["timed_out"] += 1
+
+        self._finish(group_id, group, timed_out=_timed_out, run_callback=not cancelled)
+
+    def _finish(self, group_id, group, timed_out=(), run_callback=True):
+        """ Mark a group as finished, and run its callback. """
+        with self.lock:
+            if group["finished"]:
+                return
+            group["finished"] = True
+            if group["timer"] is not None:
+                group["timer"].cancel()
+
+        try:
+            if run_callback:
+                group["callback"](group_id, group["results"], list(timed_out))
+        except Exception as e:
+            logging.error(
+                "Prediction Pool - Error in callback for %s - %s"
+                % (group_id, traceback.format_exc())
+            )
+        finally:
+            with self.lock:
+                if self.groups.get(group_id) is group:
+                    self.groups.pop(group_id)
+                self.idle.notify_all()
+
+    def cancel(self, group_id):
+        """ Cancel a running group. Unfinished jobs are cancelled or abandoned, and the callback is not run. """
+        with self.lock:
+            _group = self.groups.get(group_id)
+
+        if _group is not None:
+            self._on_deadline(group_id, _group, cancelled=True)
+
+    def _running(self, group_id=None):
+        """ Check if any job groups (or a specific group) are running, or have abandoned jobs still running.
+        Must be called with the lock held. """
+        if group_id is None:
+            return (len(self.groups) > 0) or (len(self.abandoned) > 0)
+        else:
+            return (group_id in self.groups) or (group_id in self.abandoned)
+
+    def busy(self, group_id=None):
+        """ Check if any job groups (or a specific group) are currently running, including groups which
+        passed their deadline with jobs still running """
+        with self.lock:
+            return self._running(group_id)
+
+    def wait_idle(self, timeout=None):
+        """ Block until no job groups are running. Abandoned jobs are not waited for, as their results are
+        discarded.
+
+        Returns:
+            bool: True if the pool is idle, False if the timeout expired first.
+        """
+        with self.lock:
+            return self.idle.wait_for(lambda: len(self.groups) == 0, timeout=timeout)
+
+    def close(self):
+        """ Cancel all running groups, and shut down the worker threads """
+        with self.lock:
+            _group_ids = list(self.groups.keys())
+
+        for _group_id in _group_ids:
+            self.cancel(_group_id)
+
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Prediction Scheduler
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import logging
+import time
+import traceback
+from threading import Condition, Thread
+
+
+class PredictionScheduler(object):
+    """ Event-driven scheduler for payload predictions.
+
+    New telemetry for a payload is passed in via notify(), which schedules a prediction for that payload.
+    Bursts of telemetry (e.g. the same packet arriving from multiple receivers) are debounced into a single
+    prediction. The interval between predictions for each payload adapts to its flight state: ascending
+    payloads are predicted every max_interval seconds, while descending payloads are predicted more often
+    as they approach the ground, down to min_interval seconds.
+
+    When several payloads are due at the same time, descending payloads are run first, in order of
+    their time to landing.
+    """
+
+    def __init__(
+        self,
+        callback,
+        max_interval=15,
+        min_interval=2.0,
+        debounce=1.0,
+        landing_updates=20,
+        retry_interval=1.0,
+    ):
+        """ Create a PredictionScheduler, and start its scheduling thread.
+
+        Args:
+            callback (function): Called as callback(callsign) when a payload's prediction is due. This should return
+                False if the prediction could not be started (e.g. a previous prediction is still running), in which
+                case it will be retried after retry_interval seconds.
+            max_interval (float): Longest interval between predictions for a payload, in seconds.
+            min_interval (float): Shortest interval between predictions for a payload, in seconds.
+            debounce (float): Time to wait after new telemetry arrives before running a prediction, in seconds.
+            landing_updates (int): Number of predictions to aim for during the remaining descent of a payload.
+            retry_interval (float): Time to wait before retrying a prediction which could not be started, in seconds.
+        """
+        self.callback = callback
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.debounce = debounce
+        self.landing_updates = landing_updates
+        self.retry_interval = retry_interval
+
+        # Per-payload scheduling state, keyed by callsign.
+        self.payloads = {}
+        self.condition = Condition()
+
+        self.running = True
+        self.scheduler_thread = Thread(target=self.scheduler_loop)
+        self.scheduler_thread.daemon = True
+        self.scheduler_thread.start()
+
+    def get_interval(self, is_descending, time_to_landing=None):
+        """ Determine the interval between predictions for a payload, based on its flight state """
+        if (not is_descending) or (time_to_landing is None):
+            return self.max_interval
+
+        # Run predictions more often as the payload gets closer to landing.
+        return min(
+            self.max_interval,
+            max(self.min_interval, time_to_landing / self.landing_updates),
+        )
+
+    def notify(self, callsign, is_descending=False, time_to_landing=None):
+        """ Notify the scheduler that new telemetry has arrived for a payload.
+
+        Args:
+            callsign (str): Payload callsign.
+            is_descending (bool): True if the payload is descending.
+            time_to_landing (float): Estimated time to landing in seconds, if descending.
+        """
+        _now = time.time()
+
+        with self.condition:
+            if callsign not in self.payloads:
+                self.payloads[callsign] = {"due": None, "last_run": 0.0}
+
+            _payload = self.payloads[callsign]
+            _payload["interval"] = self.get_interval(is_descending, time_to_landing)
+            # Descending payloads take priority, with the payload closest to landing first.
+            if is_descending:
+                _payload["priority"] = (
+                    0,
+                    time_to_landing if time_to_landing is not None else float("inf"),
+                )
+            else:
+                _payload["priority"] = (1, 0.0)
+
+            _due = max(_payload["last_run"] + _payload["interval"], _now + self.debounce)
+
+            if (_payload["due"] is None) or (_due < _payload["due"]):
+                _payload["due"] = _due
+                self.condition.notify()
+
+    def remove(self, callsign):
+        """ Stop scheduling predictions for a payload """
+        with self.condition:
+            self.payloads.pop(callsign, None)
+
+    def clear(self):
+        """ Stop scheduling predictions for all payloads """
+        with self.condition:
+            self.payloads = {}
+
+    def scheduler_loop(self):
+        """ Wait for payload predictions to become due, and run them """
+        logging.info("Prediction Scheduler - Started.")
+
+        while self.running:
+            with self.condition:
+                _now = time.time()
+                _due = []
+                _next_due = None
+                for _callsign, _payload in self.payloads.items():
+                    if _payload["due"] is None:
+                        continue
+
+                    if _payload["due"] <= _now:
+                        _due.append(_callsign)
+                    elif (_next_due is None) or (_payload["due"] < _next_due):
+                        _next_due = _payload["due"]
+
+                if len(_due) == 0:
+                    if _next_due is None:
+                        self.condition.wait(timeout=1.0)
+                    else:
+                        self.condition.wait(timeout=_next_due - _now)
+                    continue
+
+                _due.sort(key=lambda _c: self.payloads[_c]["priority"])
+                for _callsign in _due:
+                    self.payloads[_callsign]["due"] = None
+                    self.payloads[_callsign]["last_run"] = _now
+
+            for _callsign in _due:
+                try:
+                    _started = self.callback(_callsign)
+                except Exception as e:
+                    logging.error(
+                        "Prediction Scheduler - Error running prediction for %s - %s"
+                        % (_callsign, traceback.format_exc())
+                    )
+                    _started = True
+
+                if _started is False:
+                    with self.condition:
+                        if (_callsign in self.payloads) and (
+                            self.payloads[_callsign]["due"] is None
+                        ):
+                            self.payloads[_callsign]["due"] = (
+                                time.time() + self.retry_interval
+                            )
+
+        logging.info("Prediction Scheduler - Closed.")
+
+    def close(self):
+        """ Stop the scheduling thread """
+        self.running = False
+        with self.condition:
+            self.condition.notify()
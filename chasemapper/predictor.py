@@ -45,6 +45,31 @@ def predictor_download_model(command, callback):
         return
 
 
+def predictor_builtin_download(downloader, callback):
+    """ Run the built-in GFS downloader (a chasemapper.gfsdownload.GFSDownloader object).
+
+    When the downloader completes, or if an error is thrown, the status is passed to a callback function.
+    """
+    global model_download_running
+
+    if model_download_running:
+        return
+
+    model_download_running = True
+
+    try:
+        _status = downloader.run()
+    except Exception as e:
+        logging.error("Error when attempting to download model - %s" % (str(e)))
+        model_download_running = False
+        callback("Error - See log.")
+        return
+
+    model_download_running = False
+    logging.info("Model Download Completed.")
+    callback(_status)
+
+
 def predictor_spawn_download(command, callback=None):
     """ Spawn a model downloader in a new thread """
     global model_download_running
@@ -61,6 +86,22 @@ def predictor_spawn_download(command, callback=None):
     return "Started downloader."
 
 
+def predictor_spawn_builtin_download(downloader, callback=None):
+    """ Spawn the built-in GFS downloader in a new thread """
+    global model_download_running
+
+    if model_download_running:
+        return "Already Downloading."
+
+    _download_thread = Thread(
+        target=predictor_builtin_download,
+        kwargs={"downloader": downloader, "callback": callback},
+    )
+    _download_thread.start()
+
+    return "Started downloader."
+
+
 if __name__ == "__main__":
     import sys
     from .config import parse_config_file
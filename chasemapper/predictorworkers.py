@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Predictor Worker Processes
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import logging
+import multiprocessing
+import numpy as np
+import queue
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+from threading import Lock, Thread
+from .gfspredictor import GFSPredictor, GFSWindField
+
+
+def _worker_main(generation, gfs_path, requests, results):
+    """ Predictor worker process main loop.
+    Load the GFS dataset once, then run prediction requests until a None request is received.
+    """
+    try:
+        _predictor = GFSPredictor(gfs_path=gfs_path)
+    except Exception as e:
+        results.put(("failed", generation, str(e)))
+        return
+
+    results.put(("ready", generation, None))
+
+    while True:
+        _request = requests.get()
+        if _request is None:
+            break
+
+        (_request_id, _kwargs) = _request
+        try:
+            results.put(("result", _request_id, _predictor.predict(**_kwargs)))
+        except Exception as e:
+            results.put(("error", _request_id, traceback.format_exc()))
+
+
+class PredictorWorkerPool(object):
+    """ Pool of long-lived predictor processes, each of which keeps the GFS dataset loaded.
+
+    Prediction requests are passed to the workers over a shared queue. The pool can be used in place of a
+    cusfpredict.predict.Predictor object - predict() blocks until a worker has returned the result.
+
+    When a new GFS dataset is available, reload() starts a new generation of workers with the new dataset, once
+    the wind data cache has been built in the background. Until then, the previous generation keeps running
+    predictions. It then finishes any requests already queued, and exits.
+
+    If a worker process dies (e.g. it crashes, or is killed by the OOM killer), we can't tell which request it
+    was running, or whether it left the shared results queue locked, so all pending requests fail, and a new
+    generation of workers is started.
+    """
+
+    def __init__(self, gfs_path="./gfs/", processes=2, latency_samples=1000, log_interval=100):
+        """ Create a PredictorWorkerPool, and start the worker processes.
+
+        Args:
+            gfs_path (str): Path to the GFS data directory.
+            processes (int): Number of worker processes.
+            latency_samples (int): Number of recent prediction latencies to keep for the latency statistics.
+            log_interval (int): Log the latency statistics every log_interval predictions.
+        """
+        self.gfs_path = gfs_path
+        self.processes = processes
+
+        # Use spawned (rather than forked) workers, as we are running within a multi-threaded server.
+        self.context = multiprocessing.get_context("spawn")
+        self.results = self.context.Queue()
+
+        self.lock = Lock()
+        self.pending = {}
+        self.next_request_id = 0
+        self.generation = 0
+        self.requests = None
+        self.workers = []
+        self.worker_status = {}
+        # Worker processes of each generation which has not yet exited, keyed by generation.
+        self.generation_workers = {}
+        # Set while a new generation is being started, after a worker of the current generation died.
+        self.restarting = False
+        # Number of reloads which have not yet started their new generation, and the error of the latest reload
+        # which failed to load the GFS dataset. New generations are started one at a time.
+        self.reloads = 0
+        self.reload_error = None
+        self.reload_lock = Lock()
+
+        self.latencies = deque(maxlen=latency_samples)
+        self.log_interval = log_interval
+        self.completed = 0
+
+        self.running = True
+        self.result_thread = Thread(target=self.result_loop)
+        self.result_thread.daemon = True
+        self.result_thread.start()
+
+        self.reload()
+
+    def reload(self):
+        """ Start a new generation of workers with the current contents of the GFS directory, and retire the
+        previous generation. This returns immediately - use wait_ready() to wait for the new generation. """
+        with self.lock:
+            self.reloads += 1
+            self.reload_error = None
+
+        _thread = Thread(target=self.start_generation)
+        _thread.daemon = True
+        _thread.start()
+
+    def start_generation(self):
+        """ Build the wind data cache (if required), then start a new generation of workers, and retire the
+        previous generation. Building the cache can take a while, so this is run in the background. """
+        with self.reload_lock:
+            try:
+                # Build the cache here, rather than having every worker try to build it at once.
+                GFSWindField(self.gfs_path)
+            except Exception as e:
+                logging.error("Predictor Workers - Could not load GFS dataset - %s" % str(e))
+                with self.lock:
+                    self.reloads -= 1
+                    self.reload_error = str(e)
+                return
+
+            self.start_workers()
+
+    def start_workers(self):
+        """ Start a new generation of workers, and retire the previous generation. Called with reload_lock held. """
+        with self.lock:
+            self.reloads -= 1
+            if not self.running:
+                return
+
+            _old_requests = self.requests
+            _old_workers = self.workers
+
+            self.generation += 1
+            self.worker_status[self.generation] = {"ready": 0, "failed": None}
+            self.requests = self.context.Queue()
+            if self.restarting:
+                self.results = self.context.Queue()
+            self.workers = []
+            for i in range(self.processes):
+                _worker = self.context.Process(
+                    target=_worker_main,
+                    args=(self.generation, self.gfs_path, self.requests, self.results),
+                )
+                _worker.daemon = True
+                _worker.start()
+                self.workers.append(_worker)
+            self.generation_workers[self.generation] = self.workers
+            self.restarting = False
+
+        logging.info(
+            "Predictor Workers - Started %d worker processes (generation %d)."
+            % (self.processes, self.generation)
+        )
+
+        # Ask the previous generation to exit, once they have finished any queued requests.
+        if _old_requests is not None:
+            for _worker in _old_workers:
+                _old_requests.put(None)
+
+    def wait_ready(self, timeout=60.0):
+        """ Wait for the current generation of workers (or the new generation, if a reload is in progress) to load
+        the GFS dataset. The timeout starts once the wind data cache has been built.
+
+        Raises:
+            Exception: If the dataset failed to load, or the workers were not ready within the timeout.
+        """
+        _start = time.time()
+        while time.time() - _start < timeout:
+            with self.lock:
+                _status = self.worker_status.get(self.generation)
+                if self.reload_error is not None:
+                    raise Exception("Predictor workers failed to load GFS dataset - %s" % self.reload_error)
+                elif self.reloads > 0:
+                    _start = time.time()
+                elif _status["failed"] is not None:
+                    # If a worker died, wait for the new generation to start.
+                    if not self.restarting:
+                        raise Exception("Predictor worker failed to start - %s" % _status["failed"])
+                elif _status["ready"] >= self.processes:
+                    return
+            time.sleep(0.1)
+
+        raise Exception("Timed out waiting for predictor workers to start.")
+
+    def check_workers(self):
+        """ Check for worker processes which have died (or failed to load the GFS dataset), and fail the requests
+        pending on their generation. If a worker has died, start a new generation. """
+        _failed = []
+        _restart = False
+
+        with self.lock:
+            _broken = []
+            for (_generation, _workers) in list(self.generation_workers.items()):
+                _dead = [_worker for _worker in _workers if _worker.exitcode not in (None, 0)]
+                if len(_dead) > 0:
+                    logging.error(
+                        "Predictor Workers - Worker process of generation %d died (exit code %s)."
+                        % (_generation, ", ".join(str(_worker.exitcode) for _worker in _dead))
+                    )
+                    _restart = True
+                elif self.worker_status[_generation]["failed"] is not None:
+                    _broken.append(_generation)
+                elif all(_worker.exitcode == 0 for _worker in _workers):
+                    # Generation has been retired, and all of its workers have exited cleanly.
+                    self.generation_workers.pop(_generation)
+
+            if _restart:
+                # A worker killed part-way through writing a result leaves the results queue locked, so every
+                # generation (which all share the results queue) is stopped, and the new generation gets a new queue.
+                _broken = list(self.generation_workers.keys())
+                self.worker_status[self.generation]["failed"] = "Worker process died."
+                self.restarting = True
+
+            for _generation in _broken:
+                for _worker in self.generation_workers.pop(_generation):
+                    if _worker.is_alive():
+                        _worker.terminate()
+
+                for (_id, _request) in list(self.pending.items()):
+                    if _request[2] == _generation:
+                        _failed.append(self.pending.pop(_id)[0])
+
+        for _future in _failed:
+            _future.set_exception(Exception("Predictor worker process died, or failed to load the GFS dataset."))
+
+        if _restart and self.running:
+            self.reload()
+
+    def result_loop(self):
+        """ Collect results from the worker processes, and pass them back to the waiting requests """
+        while self.running:
+            try:
+                (_type, _id, _data) = self.results.get(timeout=1.0)
+            except queue.Empty:
+                self.check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            except Exception as e:
+                # e.g. a result which could not be unpickled.
+                logging.error("Predictor Workers - Error reading result - %s" % str(e))
+                self.check_workers()
+                continue
+
+            with self.lock:
+                if _type == "ready":
+                    self.worker_status[_id]["ready"] += 1
+                    continue
+                elif _type == "failed":
+                    self.worker_status[_id]["failed"] = _data
+                    continue
+
+                _request = self.pending.pop(_id, None)
+
+            if _request is None:
+                # Request was abandoned.
+                continue
+
+            (_future, _start, _) = _request
+            if _type == "result":
+                self.latencies.append(time.time() - _start)
+                self.completed += 1
+                _future.set_result(_data)
+
+                if self.completed % self.log_interval == 0:
+                    _stats = self.get_stats()
+                    logging.info(
+                        "Predictor Workers - Prediction latency over last %d predictions: p50 %.1f ms, p95 %.1f ms"
+                        % (_stats["count"], _stats["p50"] * 1000, _stats["p95"] * 1000)
+                    )
+            else:
+                _future.set_exception(Exception("Predictor worker error - %s" % _data))
+
+            self.check_workers()
+
+    def submit(self, **kwargs):
+        """ Submit a prediction request (with the same arguments as GFSPredictor.predict) to the workers.
+
+        Returns:
+            concurrent.futures.Future: Future which will hold the predicted path.
+        """
+        _future = Future()
+        with self.lock:
+            _request_id = self.next_request_id
+            self.next_request_id += 1
+            self.pending[_request_id] = (_future, time.time(), self.generation)
+            self.requests.put((_request_id, kwargs))
+
+        _future.request_id = _request_id
+        return _future
+
+    def abandon(self, future):
+        """ Stop waiting for a submitted request. Its result will be discarded when it arrives. """
+        with self.lock:
+            self.pending.pop(future.request_id, None)
+
+    def predict(self, timeout=None, **kwargs):
+        """ Run a prediction on one of the workers, and wait for the result.
+        The arguments and output match cusfpredict.predict.Predictor.predict.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the result was not available within timeout seconds.
+        """
+        _future = self.submit(**kwargs)
+        try:
+            return _future.result(timeout=timeout)
+        except TimeoutError:
+            self.abandon(_future)
+            raise
+
+    def get_stats(self):
+        """ Return prediction latency statistics (in seconds) over the recent predictions """
+        _latencies = np.array(self.latencies)
+        if len(_latencies) == 0:
+            return {"count": 0, "p50": None, "p95": None}
+
+        return {
+            "count": len(_latencies),
+            "p50": float(np.percentile(_latencies, 50)),
+            "p95": float(np.percentile(_latencies, 95)),
+        }
+
+    def close(self):
+        """ Stop all worker processes """
+        # Stop the result loop first, so the workers being stopped are not restarted.
+        self.running = False
+        with self.lock:
+            for _worker in self.workers:
+                self.requests.put(None)
+
+        for _worker in self.workers:
+            _worker.join(timeout=2.0)
+            if _worker.is_alive():
+                _worker.terminate()
+
+        self.result_thread.join()
+
+
+if __name__ == "__main__":
+    # Compare p50/p95 latency of concurrent main/abort prediction pairs, run by creating a predictor per
+    # prediction run, by a predictor held in the chasemapper process, and by the worker pool.
+    #   python -m chasemapper.predictorworkers gfs_directory [pred_binary]
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+
+    _gfs_path = sys.argv[1]
+    _field = GFSWindField(_gfs_path)
+    _lat = float(np.mean(_field.latitudes))
+    _lon = float(np.mean(_field.longitudes))
+    if _lon > 180.0:
+        _lon -= 360.0
+
+    _main = {
+        "launch_lat": _lat,
+        "launch_lon": _lon,
+        "launch_alt": 1000,
+        "ascent_rate": 5.0,
+        "descent_rate": 5.0,
+        "burst_alt": 30000,
+        "launch_time": _field.start_time,
+        "descent_mode": False,
+    }
+    _abort = dict(_main, burst_alt=1200)
+
+    _executor = ThreadPoolExecutor(max_workers=2)
+
+    def _latency(predict, runs=40):
+        _times = []
+        for i in range(runs):
+            _start = time.time()
+            _futures = [_executor.submit(predict, **_params) for _params in (_main, _abort)]
+            for _f in _futures:
+                _f.result()
+            _times.append(time.time() - _start)
+        return (np.percentile(_times, 50) * 1000, np.percentile(_times, 95) * 1000)
+
+    if len(sys.argv) > 2:
+        from cusfpredict.predict import Predictor
+
+        _binary = Predictor(bin_path=sys.argv[2], gfs_path=_gfs_path)
+        print("CUSF predictor binary: p50 %.1f ms, p95 %.1f ms" % _latency(_binary.predict, runs=10))
+
+    print(
+        "Predictor per run: p50 %.1f ms, p95 %.1f ms"
+        % _latency(lambda **kw: GFSPredictor(gfs_path=_gfs_path).predict(**kw))
+    )
+
+    _predictor = GFSPredictor(gfs_path=_gfs_path)
+    print("In-process predictor: p50 %.1f ms, p95 %.1f ms" % _latency(_predictor.predict))
+
+    _pool = PredictorWorkerPool(gfs_path=_gfs_path, processes=2)
+    _pool.wait_ready()
+    _latency(_pool.predict, runs=5)
+    print("Worker pool: p50 %.1f ms, p95 %.1f ms" % _latency(_pool.predict))
+
+    _pool.reload()
+    _pool.wait_ready()
+    print("Worker pool (after reload): p50 %.1f ms, p95 %.1f ms" % _latency(_pool.predict))
+    _pool.close()
@@ -10,14 +10,268 @@
 #
 import datetime
 import logging
+import numpy as np
 import pytz
+import random
 import requests
-import subprocess
+import requests.adapters
+import time
 from dateutil.parser import parse
-from threading import Thread
+from threading import Lock
 
 TAWHIRI_API_URL = "http://api.v2.sondehub.org/tawhiri"
 
+_EPOCH = pytz.utc.localize(datetime.datetime(1970, 1, 1))
+
+
+class TawhiriServerError(Exception):
+    """ The Tawhiri API returned a server error (HTTP 5xx) """
+
+    pass
+
+
+class TawhiriClient(object):
+    """ Client for the Tawhiri Predictor API.
+
+    Requests are made through a pooled HTTP session, so connections are re-used between predictions, and
+    the client can be shared between threads to make concurrent requests (e.g. main and abort predictions).
+
+    Failed requests (connection errors, timeouts, or server errors) are retried with an exponential backoff.
+    If requests keep failing, a circuit breaker opens, and further requests are rejected immediately for
+    reset_timeout seconds, rather than each waiting out its own timeout. After this time a single trial
+    request is allowed through, which closes the breaker again if it succeeds.
+    """
+
+    def __init__(
+        self,
+        url=TAWHIRI_API_URL,
+        pool_size=10,
+        retries=2,
+        backoff=0.5,
+        max_backoff=8.0,
+        failure_threshold=3,
+        reset_timeout=60.0,
+    ):
+        """ Create a TawhiriClient.
+
+        Args:
+            url (str): Tawhiri API URL.
+            pool_size (int): Maximum number of pooled connections, which should be at least the number of
+                concurrent requests.
+            retries (int): Number of times to retry a failed request.
+            backoff (float): Initial retry backoff, in seconds. This doubles on each retry.
+            max_backoff (float): Maximum retry backoff, in seconds.
+            failure_threshold (int): Number of consecutive failed predictions before the circuit breaker opens.
+            reset_timeout (float): Time the circuit breaker stays open before allowing a trial request, in seconds.
+        """
+        self.url = url
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        _adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", _adapter)
+        self.session.mount("https://", _adapter)
+
+        # Circuit breaker state
+        self.lock = Lock()
+        self.consecutive_failures = 0
+        self.open_until = None
+        self.trial_running = False
+
+        self.stats = {"requests": 0, "failures": 0, "retries": 0, "rejected": 0}
+
+    def allow_request(self):
+        """ Check the circuit breaker, to determine if a request can be made now """
+        with self.lock:
+            if self.open_until is None:
+                return True
+
+            if (time.time() >= self.open_until) and (not self.trial_running):
+                # Half-open - allow a single trial request through.
+                self.trial_running = True
+                return True
+
+            self.stats["rejected"] += 1
+            return False
+
+    def available(self):
+        """ Check if the API is available (i.e. the circuit breaker is closed) """
+        with self.lock:
+            return self.open_until is None
+
+    def record_result(self, success):
+        """ Update the circuit breaker with the result of a request """
+        with self.lock:
+            self.trial_running = False
+
+            if success:
+                if self.open_until is not None:
+                    logging.info("Tawhiri - API available again, closing circuit breaker.")
+                self.consecutive_failures = 0
+                self.open_until = None
+                return
+
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            if (self.open_until is not None) or (
+                self.consecutive_failures >= self.failure_threshold
+            ):
+                logging.warning(
+                    "Tawhiri - %d consecutive failures, not making requests for %d seconds."
+                    % (self.consecutive_failures, self.reset_timeout)
+                )
+                self.open_until = time.time() + self.reset_timeout
+
+    def get_prediction(
+        self,
+        launch_datetime,
+        launch_latitude,
+        launch_longitude,
+        launch_altitude=0,
+        ascent_rate=5.0,
+        burst_altitude=30000.0,
+        descent_rate=5.0,
+        profile="standard_profile",
+        dataset=None,
+        timeout=10,
+        deadline=None,
+    ):
+        """ Request a Prediction from the Tawhiri Predictor API.
+
+        Args:
+            timeout (float): Timeout of each request, in seconds.
+            deadline (float): If provided, the time (as a time.time() value) by which the prediction must
+                complete, including any retries. No retry is started that could not complete by then.
+
+        Returns:
+            dict: The prediction (see parse_tawhiri_data), or None if the prediction failed.
+        """
+
+        if not self.allow_request():
+            logging.error("Tawhiri - API unavailable, skipping prediction request.")
+            return None
+
+        # Localise supplied time to UTC if not already done
+        if launch_datetime.tzinfo is None:
+            launch_datetime = pytz.utc.localize(launch_datetime)
+
+        # Create RFC3339-compliant timestamp
+        _dt_rfc3339 = launch_datetime.isoformat()
+
+        # Normalise longitude to range 0 to 360
+        if launch_longitude < 0:
+            launch_longitude += 360
+
+        _params = {
+            "launch_latitude": launch_latitude,
+            "launch_longitude": launch_longitude,
+            "launch_altitude": launch_altitude,
+            "launch_datetime": _dt_rfc3339,
+            "ascent_rate": ascent_rate,
+            "descent_rate": descent_rate,
+            "burst_altitude": burst_altitude,
+            "profile": profile,
+        }
+
+        if dataset:
+            _params["dataset"] = dataset
+
+        logging.debug("Tawhiri - Requesting prediction using parameters: %s" % str(_params))
+
+        _attempts = 0
+        for _attempt in range(self.retries + 1):
+            _backoff = 0.0
+            if _attempt > 0:
+                # Exponential backoff, with some jitter so concurrent requests don't retry in lock-step.
+                _backoff = min(self.max_backoff, self.backoff * (2 ** (_attempt - 1)))
+                _backoff *= random.uniform(0.5, 1.0)
+
+            _timeout = timeout
+            if deadline is not None:
+                # Don't start a request which would be abandoned by our caller before it completes.
+                _timeout = min(timeout, deadline - time.time() - _backoff)
+                if _timeout <= 0:
+                    logging.warning("Tawhiri - Prediction deadline reached, not retrying.")
+                    break
+
+            if _attempt > 0:
+                time.sleep(_backoff)
+
+            with self.lock:
+                if _attempt > 0:
+                    self.stats["retries"] += 1
+                self.stats["requests"] += 1
+
+            _attempts += 1
+            try:
+                _r = self.session.get(self.url, params=_params, timeout=_timeout)
+
+                if _r.status_code >= 500:
+                    raise TawhiriServerError("HTTP %d" % _r.status_code)
+
+                _json = _r.json()
+
+            except (requests.RequestException, ValueError, TawhiriServerError) as e:
+                logging.warning(
+                    "Tawhiri - Request failed (attempt %d of %d): %s"
+                    % (_attempt + 1, self.retries + 1, str(e))
+                )
+                continue
+
+            # The API has responded, even if it was with an error.
+            self.record_result(True)
+
+            if "error" in _json:
+                # The Tawhiri API has returned an error
+                _error = "%s: %s" % (_json["error"]["type"], _json["error"]["description"])
+
+                logging.error("Tawhiri - %s" % _error)
+
+                return None
+
+            try:
+                return parse_tawhiri_data(_json)
+            except Exception as e:
+                logging.error("Tawhiri - Error parsing prediction: %s" % str(e))
+                return None
+
+        if _attempts == 0:
+            # We never got to make a request, so this tells us nothing about the API.
+            with self.lock:
+                self.trial_running = False
+            return None
+
+        self.record_result(False)
+        logging.error("Tawhiri - Error running prediction, giving up after %d attempts." % _attempts)
+
+        return None
+
+    def close(self):
+        """ Close the pooled connections """
+        self.session.close()
+
+
+# Client shared by all calls to get_tawhiri_prediction
+_default_client = None
+_default_client_lock = Lock()
+
+
+def get_default_client():
+    """ Get the shared TawhiriClient instance, creating it if required """
+    global _default_client
+
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TawhiriClient()
+
+        return _default_client
+
 
 def get_tawhiri_prediction(
     launch_datetime,
@@ -30,97 +284,89 @@ def get_tawhiri_prediction(
     profile="standard_profile",
     dataset=None,
     timeout=10,
+    deadline=None,
 ):
-    """ Request a Prediction from the Tawhiri Predictor API """
-
-    # Localise supplied time to UTC if not already done
-    if launch_datetime.tzinfo is None:
-        launch_datetime = pytz.utc.localize(launch_datetime)
-
-    # Create RFC3339-compliant timestamp
-    _dt_rfc3339 = launch_datetime.isoformat()
-
-    # Normalise longitude to range 0 to 360
-    if launch_longitude < 0:
-        launch_longitude += 360
+    """ Request a Prediction from the Tawhiri Predictor API, using the shared TawhiriClient """
+
+    return get_default_client().get_prediction(
+        launch_datetime,
+        launch_latitude,
+        launch_longitude,
+        launch_altitude=launch_altitude,
+        ascent_rate=ascent_rate,
+        burst_altitude=burst_altitude,
+        descent_rate=descent_rate,
+        profile=profile,
+        dataset=dataset,
+        timeout=timeout,
+        deadline=deadline,
+    )
 
-    _params = {
-        "launch_latitude": launch_latitude,
-        "launch_longitude": launch_longitude,
-        "launch_altitude": launch_altitude,
-        "launch_datetime": _dt_rfc3339,
-        "ascent_rate": ascent_rate,
-        "descent_rate": descent_rate,
-        "burst_altitude": burst_altitude,
-        "profile": profile,
-    }
 
-    if dataset:
-        _params["dataset"] = dataset
+def rfc3339_to_timestamps(datetimes):
+    """ Convert a list of RFC3339 UTC timestamp strings (e.g. '2020-01-01T12:34:56Z') to UNIX timestamps.
 
-    logging.debug("Tawhiri - Requesting prediction using parameters: %s" % str(_params))
+    All timestamps are converted in one go using numpy's ISO8601 parser. If any timestamp is not in UTC,
+    or cannot be parsed this way, we fall back to parsing each timestamp using dateutil.
 
+    Returns:
+        np.ndarray: UNIX timestamps (float64).
+    """
     try:
-        _r = requests.get(TAWHIRI_API_URL, params=_params, timeout=timeout)
-
-        _json = _r.json()
-
-        if "error" in _json:
-            # The Tawhiri API has returned an error
-            _error = "%s: %s" % (_json["error"]["type"], _json["error"]["description"])
-
-            logging.error("Tawhiri - %s" % _error)
-
-            return None
-
-        else:
-            return parse_tawhiri_data(_json)
-
-    except Exception as e:
-        logging.error("Tawhiri - Error running prediction: %s" % str(e))
-
-        return None
+        _stripped = []
+        for _dt in datetimes:
+            if _dt.endswith("Z"):
+                _stripped.append(_dt[:-1])
+            elif _dt.endswith("+00:00"):
+                _stripped.append(_dt[:-6])
+            else:
+                raise ValueError("Non-UTC timestamp: %s" % _dt)
+
+        _times = np.array(_stripped, dtype="datetime64[us]")
+        return (_times - np.datetime64(0, "us")).astype(np.float64) / 1e6
+
+    except ValueError:
+        # Fall back to the slow (but flexible) path.
+        return np.array(
+            [(parse(_dt) - _EPOCH).total_seconds() for _dt in datetimes],
+            dtype=np.float64,
+        )
 
 
 def parse_tawhiri_data(data):
     """ Parse a returned flight trajectory from Tawhiri, and convert it to a cusf_predictor_wrapper compatible format """
 
-    _epoch = pytz.utc.localize(datetime.datetime(1970, 1, 1))
     # Extract dataset information
     _dataset = parse(data["request"]["dataset"])
     _dataset = _dataset.strftime("%Y%m%d%Hz")
 
-    _path = []
-
+    _datetimes = []
+    _points = []
     for _stage in data["prediction"]:
-        _trajectory = _stage["trajectory"]
-
-        for _point in _trajectory:
+        for _point in _stage["trajectory"]:
+            _datetimes.append(_point["datetime"])
+            _points.append((_point["latitude"], _point["longitude"], _point["altitude"]))
 
-            # Normalise longitude to range -180 to 180
-            if _point["longitude"] > 180:
-                _point["longitude"] -= 360
+    _path = np.empty((len(_points), 4), dtype=np.float64)
+    if len(_points) > 0:
+        _path[:, 0] = rfc3339_to_timestamps(_datetimes)
+        _path[:, 1:] = _points
 
-            # Create UTC timestamp without using datetime.timestamp(), for Python 2.7 backwards compatibility.
-            _dt = parse(_point["datetime"])
-            _dt_timestamp = (_dt - _epoch).total_seconds()
-            _path.append(
-                [
-                    _dt_timestamp,
-                    _point["latitude"],
-                    _point["longitude"],
-                    _point["altitude"],
-                ]
-            )
+        # Normalise longitude to range -180 to 180
+        _path[:, 2] = np.where(_path[:, 2] > 180, _path[:, 2] - 360, _path[:, 2])
 
-    _output = {"dataset": _dataset, "path": _path}
+    _output = {"dataset": _dataset, "path": _path.tolist()}
 
     return _output
 
 
 if __name__ == "__main__":
+    # Run some example predictions against the live API.
+    # With --record <filename>, the raw API response is saved, for replay using chasemapper.tawhiristandin
     import datetime
+    import json
     import pprint
+    import sys
 
     logging.basicConfig(
         format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO
@@ -128,6 +374,61 @@ if __name__ == "__main__":
 
     _now = datetime.datetime.utcnow()
 
+    if "--record" in sys.argv:
+        _filename = sys.argv[sys.argv.index("--record") + 1]
+        _r = requests.get(
+            TAWHIRI_API_URL,
+            params={
+                "launch_latitude": -34.9499,
+                "launch_longitude": 138.5194,
+                "launch_altitude": 0,
+                "launch_datetime": pytz.utc.localize(_now).isoformat(),
+                "ascent_rate": 5.0,
+                "descent_rate": 5.0,
+                "burst_altitude": 30000,
+                "profile": "standard_profile",
+            },
+            timeout=10,
+        )
+        with open(_filename, "w") as _f:
+            json.dump(_r.json(), _f)
+        print("Saved response to %s" % _filename)
+        sys.exit(0)
+
+    if "--benchmark" in sys.argv:
+        # Compare parse time of a recorded response against the previous per-point dateutil parser.
+        import timeit
+
+        with open(sys.argv[sys.argv.index("--benchmark") + 1], "r") as _f:
+            _response = json.load(_f)
+
+        def _parse_dateutil(data):
+            _path = []
+            for _stage in data["prediction"]:
+                for _point in _stage["trajectory"]:
+                    _lon = _point["longitude"]
+                    if _lon > 180:
+                        _lon -= 360
+                    _dt = parse(_point["datetime"])
+                    _path.append(
+                        [(_dt - _EPOCH).total_seconds(), _point["latitude"], _lon, _point["altitude"]]
+                    )
+            return {"dataset": parse(data["request"]["dataset"]).strftime("%Y%m%d%Hz"), "path": _path}
+
+        _old = _parse_dateutil(_response)
+        _new = parse_tawhiri_data(_response)
+        assert _old["dataset"] == _new["dataset"]
+        assert np.allclose(np.array(_old["path"]), np.array(_new["path"]), rtol=0, atol=1e-6)
+
+        _runs = 100
+        _old_time = timeit.timeit(lambda: _parse_dateutil(_response), number=_runs) / _runs
+        _new_time = timeit.timeit(lambda: parse_tawhiri_data(_response), number=_runs) / _runs
+        print(
+            "%d points - dateutil: %.2f ms, fast path: %.2f ms (%.1fx)"
+            % (len(_new["path"]), _old_time * 1000, _new_time * 1000, _old_time / _new_time)
+        )
+        sys.exit(0)
+
     # Regular complete-flightpath prediction
     _data = get_tawhiri_prediction(
         launch_datetime=_now,
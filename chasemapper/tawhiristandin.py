@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Tawhiri API Stand-In
+#
+#   A small local HTTP server which stands in for the Tawhiri Predictor API, so that the Tawhiri client's
+#   latency and failure handling can be exercised offline.
+#   Responses recorded from the real API (e.g. using python -m chasemapper.tawhiri --record response.json)
+#   are replayed in turn. If no recorded responses are supplied, a synthetic trajectory is generated from
+#   the request parameters.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+from .gfspredictor import altitude_profile
+
+
+def synthetic_response(params, drift=(10.0, 2.0), interval=60.0):
+    """ Generate a Tawhiri-format response for a request, with the payload drifting at a constant velocity.
+
+    Args:
+        params (dict): Request parameters.
+        drift (tuple): East and north drift velocity, in m/s.
+        interval (float): Time between trajectory points, in seconds (Tawhiri uses one minute).
+    """
+    _launch_alt = float(params["launch_altitude"])
+    _burst_alt = float(params["burst_altitude"])
+    if _burst_alt <= _launch_alt:
+        return {
+            "error": {
+                "type": "RequestException",
+                "description": "Requested burst altitude below launch altitude.",
+            }
+        }
+
+    _launch_time = parse(params["launch_datetime"])
+    _dataset = _launch_time.replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=(_launch_time.hour % 6) + 6
+    )
+
+    (_altitude, _times, _burst_time) = altitude_profile(
+        _launch_alt,
+        float(params["ascent_rate"]),
+        float(params["descent_rate"]),
+        _burst_alt,
+        timestep=interval,
+    )
+    _alts = _altitude(_times)
+
+    _stages = {"ascent": [], "descent": []}
+    for _t, _alt in zip(_times, _alts):
+        _point = {
+            "altitude": float(_alt),
+            "datetime": (_launch_time + timedelta(seconds=float(_t)))
+            .astimezone(timezone.utc)
+            .strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "latitude": float(params["launch_latitude"]) + drift[1] * _t / 111000.0,
+            "longitude": (float(params["launch_longitude"]) + drift[0] * _t / 91000.0) % 360.0,
+        }
+        if _t <= _burst_time:
+            _stages["ascent"].append(_point)
+        if _t >= _burst_time:
+            _stages["descent"].append(_point)
+
+    _request = dict(params)
+    _request["dataset"] = _dataset.strftime("%Y-%m-%dT%H:%M:%SZ")
+    _request["format"] = "json"
+    _request["version"] = 1
+
+    return {
+        "metadata": {
+            "start_datetime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "complete_datetime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        },
+        "prediction": [
+            {"stage": _stage, "trajectory": _trajectory}
+            for (_stage, _trajectory) in _stages.items()
+            if len(_trajectory) > 0
+        ],
+        "request": _request,
+        "warnings": {},
+    }
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server handling each request in a new thread (http.server.ThreadingHTTPServer is Python 3.7+) """
+
+    daemon_threads = True
+
+
+class TawhiriStandIn(object):
+    """ Local stand-in for the Tawhiri Predictor API, with configurable latency and failures.
+
+    Failure modes:
+        error - Respond with a HTTP 500 error.
+        hang - Wait for hang_time seconds before responding (i.e. cause a client timeout).
+        drop - Close the connection without responding.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        responses=[],
+        latency=0.0,
+        failure_rate=0.0,
+        failure_mode="error",
+        hang_time=30.0,
+    ):
+        """ Create a TawhiriStandIn. Call start() to start serving requests.
+
+        Args:
+            host (str): Host to listen on.
+            port (int): Port to listen on. 0 picks a free port.
+            responses (list): Recorded API responses (as decoded JSON) to replay, in turn.
+            latency (float): Time to wait before responding to each request, in seconds.
+            failure_rate (float): Fraction of requests which fail.
+            failure_mode (str): How requests fail - 'error', 'hang' or 'drop'.
+            hang_time (float): How long 'hang' failures wait, in seconds.
+        """
+        self.responses = list(responses)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.hang_time = hang_time
+
+        self.lock = Lock()
+        self.request_count = 0
+        self.failure_count = 0
+
+        _standin = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            # Keep connections alive, as the real API does.
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                _standin.handle_request(self)
+
+            def log_message(self, format, *args):
+                logging.debug("Tawhiri Stand-In - " + format % args)
+
+        self.server = _ThreadingHTTPServer((host, port), _Handler)
+        self.server_thread = None
+
+    @property
+    def url(self):
+        """ URL of the stand-in API endpoint """
+        return "http://%s:%d/tawhiri" % self.server.server_address[:2]
+
+    def handle_request(self, handler):
+        """ Respond to a prediction request """
+        with self.lock:
+            _index = self.request_count
+            self.request_count += 1
+            _fail = random.random() < self.failure_rate
+            if _fail:
+                self.failure_count += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if _fail:
+            if self.failure_mode == "drop":
+                handler.close_connection = True
+                return
+            elif self.failure_mode == "hang":
+                time.sleep(self.hang_time)
+            else:
+                self.send_json(handler, 500, {"error": {"type": "InternalError", "description": "Stand-in failure."}})
+                return
+
+        if len(self.responses) > 0:
+            _response = self.responses[_index % len(self.responses)]
+        else:
+            _params = {
+                _key: _value[0]
+                for (_key, _value) in parse_qs(urlparse(handler.path).query).items()
+            }
+            try:
+                _response = synthetic_response(_params)
+            except Exception as e:
+                _response = {"error": {"type": "RequestException", "description": str(e)}}
+
+        self.send_json(handler, 400 if "error" in _response else 200, _response)
+
+    def send_json(self, handler, status, data):
+        """ Send a JSON response """
+        _body = json.dumps(data).encode()
+        try:
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(_body)))
+            handler.end_headers()
+            handler.wfile.write(_body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up waiting (e.g. after a 'hang' failure).
+            handler.close_connection = True
+
+    def start(self):
+        """ Start serving requests in a background thread """
+        self.server_thread = Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def stop(self):
+        """ Stop the server """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # Run the stand-in server:
+    #   python -m chasemapper.tawhiristandin [--port 8090] [--latency 0.2] [--failure-rate 0.1] [--failure-mode error] [recorded.json ...]
+    # Or with --demo, run the Tawhiri client against it, and report latency and failure behaviour.
+    import argparse
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+    from .tawhiri import TawhiriClient, parse_tawhiri_data
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("responses", nargs="*", help="Recorded Tawhiri responses (JSON) to replay.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-mode", default="error", choices=["error", "hang", "drop"])
+    parser.add_argument("--demo", action="store_true", help="Run the Tawhiri client against the stand-in.")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+
+    _responses = []
+    for _filename in args.responses:
+        with open(_filename, "r") as _f:
+            _responses.append(json.load(_f))
+
+    _standin = TawhiriStandIn(
+        port=0 if args.demo else args.port,
+        responses=_responses,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        failure_mode=args.failure_mode,
+        hang_time=2.0,
+    )
+
+    if not args.demo:
+        logging.info("Tawhiri Stand-In - Serving on %s" % _standin.url)
+        _standin.server.serve_forever()
+
+    _standin.start()
+    _standin.latency = 0.05
+
+    _main = {
+        "launch_datetime": datetime.now(timezone.utc),
+        "launch_latitude": -34.9,
+        "launch_longitude": 138.6,
+        "launch_altitude": 5000,
+        "ascent_rate": 5.0,
+        "burst_altitude": 30000,
+        "descent_rate": 5.0,
+        "timeout": 1.0,
+    }
+    _abort = dict(_main, burst_altitude=5200)
+    _runs = 20
+
+    # Previous behaviour - a new connection per request, with the main and abort predictions run in turn.
+    _start = time.time()
+    for i in range(_runs):
+        for _params in (_main, _abort):
+            _p = dict(_params, launch_datetime=_params["launch_datetime"].isoformat(), profile="standard_profile")
+            _p.pop("timeout")
+            parse_tawhiri_data(requests.get(_standin.url, params=_p, timeout=1.0).json())
+    print("New connection per request, sequential: %.1f ms per payload" % ((time.time() - _start) / _runs * 1000))
+
+    _client = TawhiriClient(url=_standin.url, backoff=0.1, reset_timeout=2.0)
+    _executor = ThreadPoolExecutor(max_workers=2)
+    _start = time.time()
+    for i in range(_runs):
+        _futures = [_executor.submit(_client.get_prediction, **_params) for _params in (_main, _abort)]
+        _results = [_f.result() for _f in _futures]
+    print("Pooled client, concurrent: %.1f ms per payload" % ((time.time() - _start) / _runs * 1000))
+
+    # Failure behaviour
+    for _mode in ("error", "hang", "drop"):
+        _standin.failure_mode = _mode
+        _standin.failure_rate = 0.3
+        _client = TawhiriClient(url=_standin.url, backoff=0.1, reset_timeout=2.0)
+        _ok = 0
+        _start = time.time()
+        for i in range(_runs):
+            if _client.get_prediction(**_main) is not None:
+                _ok += 1
+        print(
+            "30%% '%s' failures: %d/%d predictions succeeded, %.0f ms mean, stats %s"
+            % (_mode, _ok, _runs, (time.time() - _start) / _runs * 1000, str(_client.stats))
+        )
+
+    # API down - the circuit breaker should open, and reject requests quickly until the API returns.
+    _standin.failure_mode = "error"
+    _standin.failure_rate = 1.0
+    _client = TawhiriClient(url=_standin.url, backoff=0.1, reset_timeout=2.0)
+    _start = time.time()
+    for i in range(_runs):
+        _client.get_prediction(**_main)
+    print(
+        "API down: %.0f ms mean per prediction, stats %s"
+        % ((time.time() - _start) / _runs * 1000, str(_client.stats))
+    )
+    _standin.failure_rate = 0.0
+    time.sleep(2.0)
+    print("API restored: prediction %s" % ("succeeded" if _client.get_prediction(**_main) else "failed"))
+
+    _standin.stop()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Bearing Triangulation
+#
+#   Estimate transmitter locations from the stored bearings, as a weighted least-squares intersection of
+#   the bearing lines, with a covariance estimate of the fix.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import numpy as np
+from math import atan2, cos, degrees, hypot, radians, sin, sqrt
+from .earthmaths import EARTH_RADIUS
+
+METRES_PER_DEGREE = np.radians(1.0) * EARTH_RADIUS
+
+# Scaling from a 1-sigma error ellipse to a 95% confidence ellipse, for a 2D normal distribution.
+ELLIPSE_95 = np.sqrt(5.991)
+
+# Number of removals after which a source's sums are recomputed, to avoid accumulating rounding errors.
+RESYNC_INTERVAL = 1000
+
+
+def bearing_contributions(x, y, bearings, weights):
+    """ Calculate the contribution of bearing lines to the least-squares normal equations.
+
+    A bearing line from (x,y) with true bearing t has unit normal n = (cos t, -sin t), and a point p lies on
+    the line when n.p = n.(x,y) = d. The weighted least-squares fix minimises sum(w * (n.p - d)^2), and is
+    the solution of A p = b, where A = sum(w * n n^T) and b = sum(w * n * d).
+
+    Args:
+        x, y (ndarray): Bearing line origins, in metres east and north of a reference point.
+        bearings (ndarray): True bearings, in degrees.
+        weights (ndarray): Bearing weights.
+
+    Returns:
+        ndarray: Nx7 array (or a 7-tuple, for scalar inputs) of (w*nx*nx, w*nx*ny, w*ny*ny, w*nx*d, w*ny*d, w*d*d, w) rows.
+    """
+    if np.isscalar(bearings):
+        _nx = cos(radians(bearings))
+        _ny = -sin(radians(bearings))
+        _d = _nx * x + _ny * y
+        return (
+            weights * _nx * _nx,
+            weights * _nx * _ny,
+            weights * _ny * _ny,
+            weights * _nx * _d,
+            weights * _ny * _d,
+            weights * _d * _d,
+            weights,
+        )
+
+    _t = np.radians(bearings)
+    _nx = np.cos(_t)
+    _ny = -np.sin(_t)
+    _d = _nx * x + _ny * y
+    return np.column_stack(
+        (
+            weights * _nx * _nx,
+            weights * _nx * _ny,
+            weights * _ny * _ny,
+            weights * _nx * _d,
+            weights * _ny * _d,
+            weights * _d * _d,
+            weights,
+        )
+    )
+
+
+def solve_fix(sums, count, min_bearings=3):
+    """ Solve the least-squares normal equations for a fix.
+
+    Args:
+        sums (list): Sum of bearing_contributions rows.
+        count (int): Number of bearings in the sums.
+        min_bearings (int): Minimum number of bearings required for a fix.
+
+    Returns:
+        dict: Fix position (x, y, in metres), 2x2 covariance (in m^2, as nested lists), and weighted RMS distance of the
+            bearing lines from the fix (in metres), or None if there is no usable fix.
+    """
+    (_axx, _axy, _ayy, _bx, _by, _c, _w) = sums
+    _det = _axx * _ayy - _axy * _axy
+
+    # Reject fixes from too few bearings, or from (nearly) parallel bearings.
+    if (count < max(2, min_bearings)) or (_w <= 0) or (_det <= 1e-9 * (_axx + _ayy) ** 2):
+        return None
+
+    # Solve the 2x2 system directly - this is called on every bearing, where numpy's overheads dominate.
+    _x = (_ayy * _bx - _axy * _by) / _det
+    _y = (_axx * _by - _axy * _bx) / _det
+
+    # Weighted sum of squared distances between the fix and the bearing lines.
+    _ssr = max(0.0, _c - 2.0 * (_x * _bx + _y * _by) + _axx * _x * _x + 2.0 * _axy * _x * _y + _ayy * _y * _y)
+
+    # Covariance = s^2 A^-1, with s^2 estimated from the residuals.
+    _scale = _ssr / (count - 2) / _det if count > 2 else 0.0
+    _covariance = [[_ayy * _scale, -_axy * _scale], [-_axy * _scale, _axx * _scale]]
+
+    return {"x": float(_x), "y": float(_y), "covariance": _covariance, "rms": sqrt(_ssr / _w)}
+
+
+def triangulate(lats, lons, bearings, weights, min_bearings=3):
+    """ Calculate a weighted least-squares fix from a set of bearing lines, in a single pass.
+
+    Args:
+        lats, lons (ndarray): Bearing line origins.
+        bearings (ndarray): True bearings, in degrees.
+        weights (ndarray): Bearing weights.
+        min_bearings (int): Minimum number of bearings required for a fix.
+
+    Returns:
+        tuple: (lat, lon, covariance, rms), or None if there is no usable fix.
+    """
+    _lats = np.asarray(lats, dtype=float)
+    _lons = np.asarray(lons, dtype=float)
+    _ref_lat = _lats[0]
+    _ref_lon = _lons[0]
+    _scale = METRES_PER_DEGREE * np.cos(np.radians(_ref_lat))
+
+    _x = ((_lons - _ref_lon + 180.0) % 360.0 - 180.0) * _scale
+    _y = (_lats - _ref_lat) * METRES_PER_DEGREE
+    _sums = bearing_contributions(_x, _y, np.asarray(bearings, dtype=float), np.asarray(weights, dtype=float)).sum(
+        axis=0
+    )
+    _fix = solve_fix(_sums.tolist(), len(_lats), min_bearings)
+    if _fix is None:
+        return None
+
+    return (
+        _ref_lat + _fix["y"] / METRES_PER_DEGREE,
+        (_ref_lon + _fix["x"] / _scale + 180.0) % 360.0 - 180.0,
+        np.array(_fix["covariance"]),
+        _fix["rms"],
+    )
+
+
+class SourceFix(object):
+    """ Incrementally-updated least-squares fix for the bearings from a single source.
+
+    Bearing positions are projected onto a local flat-earth plane, centred on the first bearing from the source.
+    The sums of the normal equations are updated as bearings are added and removed, so each update costs
+    O(1), independent of the number of bearings stored.
+    """
+
+    def __init__(self, source, ref_lat, ref_lon, min_bearings=3):
+        self.source = source
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.scale = METRES_PER_DEGREE * np.cos(np.radians(ref_lat))
+        self.min_bearings = min_bearings
+
+        # Contribution of each bearing to the sums, keyed by bearing key.
+        self.contributions = {}
+        self.sums = [0.0] * 7
+        self.removals = 0
+
+    def add(self, key, lat, lon, bearing, weight):
+        """ Add a bearing line to the fix """
+        _x = ((lon - self.ref_lon + 180.0) % 360.0 - 180.0) * self.scale
+        _y = (lat - self.ref_lat) * METRES_PER_DEGREE
+        _row = bearing_contributions(_x, _y, float(bearing), float(weight))
+        self.contributions[key] = _row
+        self.sums = [_a + _b for (_a, _b) in zip(self.sums, _row)]
+
+    def remove(self, key):
+        """ Remove a bearing line from the fix """
+        _row = self.contributions.pop(key, None)
+        if _row is None:
+            return
+
+        self.removals += 1
+        if (self.removals % RESYNC_INTERVAL == 0) or (len(self.contributions) == 0):
+            self.sums = [sum(_column) for _column in zip(*self.contributions.values())] or [0.0] * 7
+        else:
+            self.sums = [_a - _b for (_a, _b) in zip(self.sums, _row)]
+
+    def get_fix(self):
+        """ Return the current fix, as a dictionary suitable for passing to web clients """
+        _fix = solve_fix(self.sums, len(self.contributions), self.min_bearings)
+        if _fix is None:
+            return {"source": self.source, "valid": False, "bearings": len(self.contributions)}
+
+        # Error ellipse (1-sigma), from the eigenvalues and eigenvectors of the covariance matrix.
+        ((_cxx, _cxy), (_, _cyy)) = _fix["covariance"]
+        _mean = (_cxx + _cyy) / 2.0
+        _spread = hypot((_cxx - _cyy) / 2.0, _cxy)
+        # Angle of the major axis from the x (east) axis.
+        _angle = atan2(2.0 * _cxy, _cxx - _cyy) / 2.0
+
+        return {
+            "source": self.source,
+            "valid": True,
+            "bearings": len(self.contributions),
+            "lat": float(self.ref_lat + _fix["y"] / METRES_PER_DEGREE),
+            "lon": float((self.ref_lon + _fix["x"] / self.scale + 180.0) % 360.0 - 180.0),
+            "covariance": _fix["covariance"],
+            "error_major": sqrt(max(0.0, _mean + _spread)),
+            "error_minor": sqrt(max(0.0, _mean - _spread)),
+            "error_orientation": (90.0 - degrees(_angle)) % 180.0,
+            "rms": _fix["rms"],
+        }
+
+
+class Triangulator(object):
+    """ Maintain a least-squares fix for each source of bearings (including each time-sequenced fox source).
+
+    Bearings from stationary cars (heading_valid False) are excluded, as their true bearing is unreliable.
+    Bearings are weighted by their confidence value.
+
+    Note that bearing lines are treated as infinite lines, so bearings from a poorly-spread set of positions
+    may produce a fix 'behind' the bearings.
+    """
+
+    def __init__(self, min_bearings=3):
+        """ Create a Triangulator.
+
+        Args:
+            min_bearings (int): Minimum number of bearings from a source required for a fix.
+        """
+        self.min_bearings = min_bearings
+        self.sources = {}
+
+    def add(self, bearing):
+        """ Add a bearing (a bearing store record) to the fix for its source.
+
+        Returns:
+            str: The source of the bearing, or None if the bearing was not used.
+        """
+        if not bearing["heading_valid"] or (bearing["confidence"] <= 0):
+            return None
+
+        _source = bearing["source"]
+        if _source not in self.sources:
+            self.sources[_source] = SourceFix(_source, bearing["lat"], bearing["lon"], self.min_bearings)
+
+        self.sources[_source].add(
+            bearing["key"], bearing["lat"], bearing["lon"], bearing["true_bearing"], bearing["confidence"]
+        )
+        return _source
+
+    def remove(self, bearing):
+        """ Remove a bearing (a bearing store record) from the fix for its source.
+
+        Returns:
+            str: The source of the bearing, or None if the bearing was not used.
+        """
+        _source_fix = self.sources.get(bearing["source"])
+        if (_source_fix is None) or (bearing["key"] not in _source_fix.contributions):
+            return None
+
+        _source_fix.remove(bearing["key"])
+        return bearing["source"]
+
+    def get_fix(self, source):
+        """ Return the current fix for a source """
+        return self.sources[source].get_fix()
+
+    def get_fixes(self):
+        """ Return the current fixes for all sources, as a dictionary keyed by source """
+        return {_source: _fix.get_fix() for (_source, _fix) in self.sources.items()}
+
+    def flush(self):
+        """ Clear all fixes """
+        self.sources = {}
+
+
+if __name__ == "__main__":
+    # Simulate bearings from a car driving past a transmitter, and compare the incremental fix with a
+    # batch solution, and with the true transmitter location.
+    import time
+    from .earthmaths import position_info
+
+    _rng = np.random.default_rng(1)
+    _tx = (-34.80, 138.70)
+    _count = 10000
+    _window = 300
+
+    # Car drives back and forth along a 40 km road south of the transmitter, with bearing errors of
+    # 5 degrees RMS at a confidence of 10.
+    _lats = np.full(_count, -34.95) + _rng.normal(0, 0.001, _count)
+    _lons = 138.5 + 0.4 * np.abs(np.sin(np.linspace(0, np.pi * _count / _window, _count)))
+    _true = np.array(
+        [position_info((_lats[_i], _lons[_i], 0), (_tx[0], _tx[1], 0))["bearing"] for _i in range(_count)]
+    )
+    _confidence = _rng.uniform(5, 30, _count)
+    _bearings = (_true + _rng.normal(0, 5.0, _count) * 10.0 / _confidence) % 360.0
+
+    # Incremental updates, with a rolling window of stored bearings.
+    _triangulator = Triangulator()
+    _start = time.time()
+    for _i in range(_count):
+        _triangulator.add(
+            {
+                "key": "%d" % _i,
+                "source": "sim",
+                "lat": _lats[_i],
+                "lon": _lons[_i],
+                "true_bearing": _bearings[_i],
+                "confidence": _confidence[_i],
+                "heading_valid": True,
+            }
+        )
+        if _i >= _window:
+            _triangulator.remove({"key": "%d" % (_i - _window), "source": "sim"})
+        _fix = _triangulator.get_fix("sim")
+    _incremental_time = (time.time() - _start) / _count
+
+    _start = time.time()
+    _batch = triangulate(
+        _lats[-_window:], _lons[-_window:], _bearings[-_window:], _confidence[-_window:]
+    )
+    _batch_time = time.time() - _start
+
+    _error = position_info((_tx[0], _tx[1], 0), (_fix["lat"], _fix["lon"], 0))["great_circle_distance"]
+    _difference = position_info((_batch[0], _batch[1], 0), (_fix["lat"], _fix["lon"], 0))["great_circle_distance"]
+    print("Incremental update + solve: %.1f us per bearing" % (_incremental_time * 1e6))
+    print("Batch solve of %d bearings: %.1f us" % (_window, _batch_time * 1e6))
+    print(
+        "Fix error %.0f m (95%% ellipse %.0f x %.0f m), incremental vs batch difference %.3f m"
+        % (_error, _fix["error_major"] * ELLIPSE_95, _fix["error_minor"] * ELLIPSE_95, _difference)
+    )
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+#
+#   Project Horus - Browser-Based Chase Mapper - Ascent Wind Profile Estimation
+#
+#   Estimate the wind profile (wind velocity vs altitude) from a payload's own track, and use it to
+#   predict the landing position of a descending payload without needing any GFS data.
+#
+#   Copyright (C) 2026  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+import numpy as np
+from .gfspredictor import METRES_PER_DEGREE, altitude_profile
+
+
+class WindProfile(object):
+    """ Wind profile of a single payload, estimated from its track.
+
+    The horizontal velocity of the payload between each pair of track points is taken to be the wind velocity
+    at the mean altitude of the two points. Only ascending steps are used - on the launch pad, after landing, or
+    while being carried around, the payload isn't moving with the wind. Velocities are accumulated into fixed-size
+    altitude bins, so the profile can be updated in constant time on each new telemetry packet.
+    """
+
+    def __init__(self, bin_size=250.0, max_alt=50000.0, max_step_time=120.0, min_ascent_rate=1.0):
+        """ Create a WindProfile.
+
+        Args:
+            bin_size (float): Altitude bin size, in metres.
+            max_alt (float): Maximum altitude of the profile, in metres.
+            max_step_time (float): Ignore pairs of track points further apart than this, in seconds.
+            min_ascent_rate (float): Ignore pairs of track points with a lower ascent rate than this, in m/s.
+        """
+        self.bin_size = bin_size
+        self.max_step_time = max_step_time
+        self.min_ascent_rate = min_ascent_rate
+
+        _bins = int(np.ceil(max_alt / bin_size))
+        self.altitudes = (np.arange(_bins) + 0.5) * bin_size
+        self.u_sum = np.zeros(_bins)
+        self.v_sum = np.zeros(_bins)
+        self.counts = np.zeros(_bins, dtype=np.int64)
+
+        # Number of track points which have been added to the profile.
+        self.processed = 0
+
+    def update(self, track):
+        """ Add any new points of a GenericTrack to the profile """
+        (_times, _lats, _lons, _alts) = track.get_track_arrays()
+        _n = len(_times)
+        if _n < 2:
+            self.processed = _n
+            return
+
+        # Steps between the last processed point and the end of the track.
+        _start = max(0, self.processed - 1)
+        self.processed = _n
+        _dt = np.diff(_times[_start:])
+        _dlat = np.diff(_lats[_start:])
+        _dlon = (np.diff(_lons[_start:]) + 180.0) % 360.0 - 180.0
+        _mid_lat = (_lats[_start:-1] + _lats[_start + 1 :]) / 2.0
+        _mid_alt = (_alts[_start:-1] + _alts[_start + 1 :]) / 2.0
+
+        _dalt = np.diff(_alts[_start:])
+
+        _valid = (_dt > 0) & (_dt <= self.max_step_time) & (_mid_alt >= 0) & (_dalt >= self.min_ascent_rate * _dt)
+        if not np.any(_valid):
+            return
+
+        _dt = _dt[_valid]
+        _u = _dlon[_valid] * METRES_PER_DEGREE * np.cos(np.radians(_mid_lat[_valid])) / _dt
+        _v = _dlat[_valid] * METRES_PER_DEGREE / _dt
+        _bins = np.minimum((_mid_alt[_valid] // self.bin_size).astype(np.int64), len(self.counts) - 1)
+
+        np.add.at(self.u_sum, _bins, _u)
+        np.add.at(self.v_sum, _bins, _v)
+        np.add.at(self.counts, _bins, 1)
+
+    def coverage(self):
+        """ Return the (min, max) altitude covered by the profile, or None if the profile is empty """
+        _filled = np.flatnonzero(self.counts)
+        if len(_filled) == 0:
+            return None
+
+        return (_filled[0] * self.bin_size, (_filled[-1] + 1) * self.bin_size)
+
+    def get_profile(self):
+        """ Return the wind profile as a tuple of (altitudes, u, v) arrays, for the altitude bins holding data.
+        u and v are the eastward and northward wind velocities, in m/s.
+        """
+        _filled = self.counts > 0
+        return (
+            self.altitudes[_filled],
+            self.u_sum[_filled] / self.counts[_filled],
+            self.v_sum[_filled] / self.counts[_filled],
+        )
+
+    def wind(self, altitudes):
+        """ Interpolate the wind profile at an array of altitudes. Outside of the profile, the nearest value is used.
+
+        Returns:
+            tuple: (u, v) wind velocity arrays, in m/s.
+        """
+        (_alts, _u, _v) = self.get_profile()
+        return (np.interp(altitudes, _alts, _u), np.interp(altitudes, _alts, _v))
+
+    def predict_descent(self, launch_time, lat, lon, alt, descent_rate, ground_alt=0.0, timestep=10.0):
+        """ Predict the descent of a payload through the wind profile.
+
+        Args:
+            launch_time (float): Current time, as a UNIX timestamp.
+            lat, lon, alt (float): Current payload position.
+            descent_rate (float): Sea-level descent rate, in m/s.
+            ground_alt (float): Ground altitude, in metres.
+            timestep (float): Output time step, in seconds.
+
+        Returns:
+            list: Predicted path as a list of [timestamp, lat, lon, alt] points (the same format as the
+                predictor output), or None if the profile is empty.
+        """
+        if self.coverage() is None:
+            return None
+
+        (_altitude, _times, _burst_time) = altitude_profile(
+            alt, 5.0, descent_rate, alt, descent_mode=True, ground_alt=ground_alt, timestep=timestep
+        )
+        _alts = _altitude(_times)
+        (_u, _v) = self.wind(_alts)
+
+        # Integrate the wind velocities over time (trapezoidal rule).
+        _dt = np.diff(_times)
+        _east = np.concatenate(([0.0], np.cumsum((_u[:-1] + _u[1:]) / 2.0 * _dt)))
+        _north = np.concatenate(([0.0], np.cumsum((_v[:-1] + _v[1:]) / 2.0 * _dt)))
+
+        _lats = lat + _north / METRES_PER_DEGREE
+        _lons = lon + _east / (METRES_PER_DEGREE * np.cos(np.radians(_lats)))
+        _lons = (_lons + 180.0) % 360.0 - 180.0
+
+        return np.column_stack((launch_time + _times, _lats, _lons, _alts)).tolist()
+
+
+if __name__ == "__main__":
+    # Simulate a flight through a known wind profile, and compare the landing predicted from the
+    # ascent-derived profile with the true landing.
+    import time
+    from datetime import datetime, timezone
+    from .geometry import GenericTrack
+    from .earthmaths import position_info
+
+    def _true_wind(alts):
+        return (5.0 + alts / 1000.0, 10.0 * np.sin(alts / 5000.0))
+
+    _track = GenericTrack()
+    _profile = WindProfile()
+    _lat, _lon, _alt, _t = -34.9, 138.6, 0.0, 1.7e9
+    _update_times = []
+
+    # 10 minutes on the launch pad, then ascent at 5 m/s to 30 km, with a packet every 5 seconds.
+    for _i in range(120):
+        _t += 5.0
+        _track.add_telemetry(
+            {"time": datetime.fromtimestamp(_t, timezone.utc), "lat": _lat, "lon": _lon, "alt": _alt}
+        )
+        _profile.update(_track)
+
+    while _alt < 30000:
+        (_u, _v) = _true_wind(_alt)
+        _lat += _v * 5.0 / METRES_PER_DEGREE
+        _lon += _u * 5.0 / (METRES_PER_DEGREE * np.cos(np.radians(_lat)))
+        _alt += 25.0
+        _t += 5.0
+        _track.add_telemetry(
+            {"time": datetime.fromtimestamp(_t, timezone.utc), "lat": _lat, "lon": _lon, "alt": _alt}
+        )
+        _start = time.time()
+        _profile.update(_track)
+        _update_times.append(time.time() - _start)
+
+    # Truth - descend through the true wind profile.
+    (_altitude, _times, _burst_time) = altitude_profile(_alt, 5.0, 5.0, _alt, descent_mode=True, timestep=1.0)
+    _alts = _altitude(_times)
+    (_u, _v) = _true_wind(_alts)
+    _true_lat = _lat + np.sum(_v[:-1] * np.diff(_times)) / METRES_PER_DEGREE
+    _true_lon = _lon + np.sum(_u[:-1] * np.diff(_times)) / (METRES_PER_DEGREE * np.cos(np.radians(_true_lat)))
+
+    _start = time.time()
+    _path = _profile.predict_descent(_t, _lat, _lon, _alt, 5.0)
+    _predict_time = time.time() - _start
+
+    _error = position_info((_true_lat, _true_lon, 0), (_path[-1][1], _path[-1][2], 0))["great_circle_distance"]
+    print("Profile update: %.3f ms mean per packet" % (np.mean(_update_times) * 1000))
+    print("Descent prediction: %.2f ms, %d points, landing error %.0f m" % (_predict_time * 1000, len(_path), _error))
@@ -15,6 +15,7 @@ if sys.version_info < (3, 6):
 import json
 import logging
 import flask
+import gzip
 from flask_socketio import SocketIO
 import os.path
 import pytz
@@ -33,7 +34,16 @@ from chasemapper.gps import SerialGPS
 from chasemapper.gpsd import GPSDAdaptor
 from chasemapper.atmosphere import time_to_landing
 from chasemapper.listeners import OziListener, UDPListener, fix_datetime
-from chasemapper.predictor import predictor_spawn_download, model_download_running
+from chasemapper.predictor import predictor_spawn_download, predictor_spawn_builtin_download, model_download_running
+from chasemapper.gfsdownload import GFSDownloader
+from chasemapper.predictionpool import PredictionPool
+from chasemapper.predictioncache import PredictionCache
+from chasemapper.predictionscheduler import PredictionScheduler
+from chasemapper.ensemble import EnsemblePredictor
+from chasemapper.gfspredictor import GFSPredictor
+from chasemapper.predictorworkers import PredictorWorkerPool
+from chasemapper.predictionpath import process_prediction_path, encode_polyline
+from chasemapper.windprofile import WindProfile
 from chasemapper.habitat import (
     HabitatChaseUploader,
     initListenerCallsign,
@@ -43,7 +53,8 @@ from chasemapper.sondehub import SondehubChaseUploader
 from chasemapper.logger import ChaseLogger
 from chasemapper.logread import read_last_balloon_telemetry
 from chasemapper.bearings import Bearings
-from chasemapper.tawhiri import get_tawhiri_prediction
+from chasemapper.deltasync import ArchiveChangeLog
+from chasemapper.tawhiri import get_tawhiri_prediction, get_default_client
 
 
 # Define Flask Application, and allow automatic reloading of templates for dev work
@@ -83,6 +94,9 @@ current_payloads = {}  #  Archive data which will be passed to the web client
 current_payload_tracks = (
     {}
 )  # Store of payload Track objects which are used to calculate instantaneous parameters.
+current_payload_winds = {}  # Store of payload WindProfile objects, estimated from each payload's track.
+# Sequence numbers of changes to the archive, so reconnecting clients can request only what has changed.
+archive_log = ArchiveChangeLog()
 
 # Chase car position
 car_track = GenericTrack()
@@ -139,9 +153,56 @@ def split_kml_overlay_settings(overlays):
     return _public_overlays, _overlay_settings
 
 
+def flask_json_response(etag, get_data):
+    """ Respond with JSON data, tagged with an ETag. If the client already holds the data (If-None-Match matches
+    the ETag), respond with 304 Not Modified without generating the data. Large responses are gzip-compressed,
+    if the client accepts it.
+
+    Args:
+        etag (str): Entity tag of the data.
+        get_data (function): Function returning the data to send.
+    """
+    if flask.request.if_none_match.contains(etag):
+        _response = flask.Response(status=304)
+        _response.set_etag(etag)
+        return _response
+
+    _body = json.dumps(get_data()).encode()
+    _response = flask.Response(_body, mimetype="application/json")
+    _response.set_etag(etag)
+    _response.headers["Vary"] = "Accept-Encoding"
+
+    if (len(_body) > 1400) and ("gzip" in flask.request.accept_encodings):
+        _response.set_data(gzip.compress(_body, compresslevel=5))
+        _response.headers["Content-Encoding"] = "gzip"
+
+    return _response
+
+
+def flask_get_cursor():
+    """ Read a delta sync cursor (since and instance parameters) from the request.
+    Returns (None, None) if no cursor was supplied, in which case the client is sent the whole store.
+    """
+    try:
+        _since = int(flask.request.args["since"])
+    except (KeyError, ValueError):
+        return (None, None)
+
+    return (_since, flask.request.args.get("instance"))
+
+
 @app.route("/get_telemetry_archive")
 def flask_get_telemetry_archive():
-    return json.dumps(current_payloads)
+    """ Return the telemetry archive. If a cursor (?since=<seq>&instance=<id>) is supplied, return only the
+    changes since the cursor, and the new cursor. """
+    (_since, _instance) = flask_get_cursor()
+    if _since is None:
+        return flask_json_response(archive_log.etag(), lambda: current_payloads)
+
+    return flask_json_response(
+        archive_log.etag(_since, _instance),
+        lambda: archive_log.get_changes(current_payloads, _since, _instance),
+    )
 
 
 @app.route("/get_config")
@@ -151,7 +212,41 @@ def flask_get_config():
 
 @app.route("/get_bearings")
 def flask_get_bearings():
-    return json.dumps(bearing_store.bearings)
+    """ Return the bearing store. If a cursor (?since=<seq>&instance=<id>) is supplied, return only the
+    changes since the cursor, and the new cursor. """
+    (_since, _instance) = flask_get_cursor()
+    if _since is None:
+        return flask_json_response(bearing_store.change_log.etag(), lambda: bearing_store.bearings)
+
+    return flask_json_response(
+        bearing_store.change_log.etag(_since, _instance),
+        lambda: bearing_store.get_changes(_since, _instance),
+    )
+
+
+@app.route("/get_bearing_stats")
+def flask_get_bearing_stats():
+    return json.dumps(bearing_store.get_change_stats())
+
+
+@app.route("/get_doa_angle_grids")
+def flask_get_doa_angle_grids():
+    return json.dumps(bearing_store.doa_angle_grids)
+
+
+@app.route("/get_bearing_filter_stats")
+def flask_get_bearing_filter_stats():
+    return json.dumps(bearing_store.get_filter_stats())
+
+
+@app.route("/get_bearing_fixes")
+def flask_get_bearing_fixes():
+    return json.dumps(bearing_store.get_fixes())
+
+
+@app.route("/get_bearing_heatmaps")
+def flask_get_bearing_heatmaps():
+    return json.dumps(bearing_store.get_heatmaps())
 
 
 # Some features of the web interface require comparisons with server time,
@@ -263,16 +358,18 @@ def client_settings_update(data):
     sync_bearing_store_time_seq()
     sync_bearing_store_confidence_threshold()
 
+    # The configured update rate is the longest interval between predictions.
+    if prediction_scheduler is not None:
+        prediction_scheduler.max_interval = chasemapper_config["pred_update_rate"]
+
     if _predictor_change == "restart":
         # Wait until any current predictions have finished.
-        while predictor_semaphore:
-            time.sleep(0.1)
+        wait_for_predictions()
         # Attempt to start the predictor.
         initPredictor()
     elif _predictor_change == "stop":
         # Wait until any current predictions have finished.
-        while predictor_semaphore:
-            time.sleep(0.1)
+        wait_for_predictions()
 
         predictor = None
 
@@ -387,17 +484,18 @@ def handle_new_payload_position(data, log_position=True):
     # more than once. Discard anything that isn't newer than the last track point,
     # otherwise the zero/negative time-step corrupts the ascent rate and turn rate.
     if _callsign in current_payload_tracks:
-        _track_history = current_payload_tracks[_callsign].track_history
-        if len(_track_history) > 0 and _time_dt <= _track_history[-1][0]:
+        _last_state = current_payload_tracks[_callsign].get_latest_state()
+        if _last_state is not None and _time_dt <= _last_state["time"]:
             logging.debug(
                 "Discarding duplicate/out-of-order telemetry for %s (packet time %s, last track point %s)."
-                % (_callsign, _time_dt.isoformat(), _track_history[-1][0].isoformat())
+                % (_callsign, _time_dt.isoformat(), _last_state["time"].isoformat())
             )
             return
 
     if _callsign not in current_payloads:
         # New callsign! Create entries in data stores.
         current_payload_tracks[_callsign] = GenericTrack(ascent_averaging=chasemapper_config["ascent_rate_averaging"])
+        current_payload_winds[_callsign] = WindProfile()
 
         current_payloads[_callsign] = {
             "telem": {
@@ -416,6 +514,7 @@ def handle_new_payload_position(data, log_position=True):
             "burst": [],
             "abort_path": [],
             "abort_landing": [],
+            "pred_ensemble": {},
             "max_alt": 0.0,
             "snr": -255.0,
         }
@@ -425,6 +524,8 @@ def handle_new_payload_position(data, log_position=True):
         {"time": _time_dt, "lat": _lat, "lon": _lon, "alt": _alt, "comment": _callsign}
     )
     _state = current_payload_tracks[_callsign].get_latest_state()
+    current_payload_winds[_callsign].update(current_payload_tracks[_callsign])
+    _ttl_seconds = None
     if _state != None:
         _vel_v = _state["ascent_rate"]
         _speed = _state["speed"]
@@ -440,6 +541,7 @@ def handle_new_payload_position(data, log_position=True):
 
             # Calculate
             _ttl = time_to_landing(_alt, _vel_v, ground_asl=_ground_asl)
+            _ttl_seconds = _ttl
             if _ttl is None:
                 _ttl = ""
             elif _ttl == 0:
@@ -482,6 +584,11 @@ def handle_new_payload_position(data, log_position=True):
         "max_alt"
     ]
 
+    # Record the change, so reconnecting clients are sent it. Clients track the sequence number from the telemetry.
+    current_payloads[_callsign]["telem"]["archive_seq"] = archive_log.update(
+        _callsign, ("telem", "path", "max_alt")
+    )
+
     # Update the web client.
     flask_emit_event("telemetry_event", current_payloads[_callsign]["telem"])
 
@@ -491,6 +598,23 @@ def handle_new_payload_position(data, log_position=True):
     else:
         logging.debug("Point not logged.")
 
+    # Schedule a prediction run for this payload.
+    if prediction_scheduler is not None:
+        prediction_scheduler.notify(
+            _callsign, is_descending=(_vel_v < -1.0), time_to_landing=_ttl_seconds
+        )
+
+    # If no predictor is available, predict the descent using the payload's ascent winds instead.
+    if (_vel_v < -1.0) and wind_profile_fallback_required():
+        _path = wind_profile_prediction(_callsign, _state)
+        if _path is not None:
+            handle_prediction_results(
+                _callsign,
+                _state,
+                [0, _lat, _lon, _alt],
+                {"pred": {"path": _path, "dataset": WIND_PROFILE_DATASET}},
+            )
+
 
 def handle_modem_stats(data):
     """ Basic handling of modem statistics data. If it matches a known payload, send the info to the client. """
@@ -505,32 +629,23 @@ def handle_modem_stats(data):
 #   Predictor Code
 #
 predictor = None
-predictor_semaphore = False
+# Pool of worker threads which run the prediction jobs (Initialised in main)
+prediction_pool = None
+# Cache of recent prediction results (Initialised in main)
+prediction_cache = None
+# Scheduler which triggers predictions as new telemetry arrives (Initialised in main)
+prediction_scheduler = None
+# Landing uncertainty ensemble runner (Initialised in main, if enabled)
+ensemble_predictor = None
+# Persistent predictor worker processes (Initialised by initPredictor, if enabled)
+predictor_workers = None
 # End time of the current offline GFS dataset, used to detect when it goes stale mid-session.
 predictor_model_end = None
 
-predictor_thread_running = True
-predictor_thread = None
-
-
-def predictorThread():
-    """ Run the predictor on a regular interval """
-    global predictor_thread_running, chasemapper_config
-    logging.info("Predictor loop started.")
-
-    while predictor_thread_running:
-        run_prediction()
-        for i in range(int(chasemapper_config["pred_update_rate"])):
-            time.sleep(1)
-            if predictor_thread_running == False:
-                break
-
-    logging.info("Closed predictor loop.")
-
 
 def fallback_to_tawhiri(reason):
     """ Fall back to online (Tawhiri) predictions, e.g. if GFS data is missing, stale, or failed to download. """
-    global predictor, predictor_thread, predictor_model_end, chasemapper_config
+    global predictor, predictor_model_end, chasemapper_config
 
     logging.warning("Falling back to online (Tawhiri) predictions - %s." % reason)
     predictor = "Tawhiri"
@@ -541,21 +656,85 @@ def fallback_to_tawhiri(reason):
         "predictor_model_update", {"model": chasemapper_config["pred_model"]}
     )
 
-    # Start up the predictor thread if it is not running.
-    if predictor_thread is None:
-        predictor_thread = Thread(target=predictorThread)
-        predictor_thread.start()
+
+def wait_for_predictions(timeout=None):
+    """ Wait until any running prediction jobs have finished """
+    if prediction_pool is not None:
+        prediction_pool.wait_idle(timeout=timeout)
+
+
+def run_predictor_job(
+    predictor,
+    launch_time,
+    launch_lat,
+    launch_lon,
+    launch_alt,
+    ascent_rate,
+    descent_rate,
+    burst_alt,
+    descent_mode,
+    timeout=10,
+    deadline=None,
+):
+    """ Run a single flight path prediction, using either Tawhiri or the offline predictor.
+    This is run from within a PredictionPool worker thread. If a deadline (a time.time() value) is provided,
+    the prediction is abandoned once it has passed, freeing up the worker thread.
+
+    Returns a dictionary containing the predicted path, as a list of [timestamp, lat, lon, alt] entries,
+    and the dataset used (if known).
+    """
+
+    if predictor == "Tawhiri":
+        # Tawhiri requires that the ascent rate be > 0 for standard profiles.
+        if ascent_rate < 0.1:
+            ascent_rate = 0.1
+
+        _tawhiri = get_tawhiri_prediction(
+            launch_datetime=launch_time,
+            launch_latitude=launch_lat,
+            launch_longitude=launch_lon,
+            launch_altitude=launch_alt,
+            burst_altitude=burst_alt,
+            ascent_rate=ascent_rate,
+            descent_rate=descent_rate,
+            timeout=timeout,
+            deadline=deadline,
+        )
+
+        if _tawhiri:
+            return {"path": _tawhiri["path"], "dataset": _tawhiri["dataset"] + " (Online)"}
+        else:
+            return {"path": [], "dataset": None}
+
+    else:
+        _predict_args = {}
+        if isinstance(predictor, PredictorWorkerPool) and (deadline is not None):
+            # Don't wait forever on a worker process.
+            _predict_args["timeout"] = max(0.0, deadline - time.time())
+
+        _path = predictor.predict(
+            launch_lat=launch_lat,
+            launch_lon=launch_lon,
+            launch_alt=launch_alt,
+            ascent_rate=ascent_rate,
+            descent_rate=descent_rate,
+            burst_alt=burst_alt,
+            launch_time=launch_time,
+            descent_mode=descent_mode,
+            **_predict_args
+        )
+        return {"path": _path, "dataset": None}
 
 
-def run_prediction():
-    """ Run a Flight Path prediction """
-    global chasemapper_config, current_payloads, current_payload_tracks, predictor, predictor_semaphore, predictor_model_end
+def predictor_ready():
+    """ Check if the predictor is enabled and available to run predictions """
+    global chasemapper_config, predictor, predictor_model_end
 
     if chasemapper_config["pred_enabled"] == False:
-        return
+        return False
 
-    if (chasemapper_config["offline_predictions"] == True) and (predictor == None):
-        return
+    if predictor == None:
+        return False
 
     # If the offline predictor is in use, check the GFS dataset still covers the
     # near future, and fall back to online predictions once it goes stale.
@@ -567,213 +746,418 @@ def run_prediction():
         if (datetime.now(UTC) + timedelta(hours=4)) > predictor_model_end:
             fallback_to_tawhiri("GFS data expired")
 
-    # Set the semaphore so we don't accidentally kill the predictor object while it's running.
-    predictor_semaphore = True
-    _payload_list = list(current_payload_tracks.keys())
-    for _payload in _payload_list:
-
-        # Check the age of the data.
-        # No point re-running the predictor if the data is older than 30 seconds.
-        _pos_age = current_payloads[_payload]["telem"]["server_time"]
-        if (time.time() - _pos_age) > 30.0:
-            logging.debug("Skipping prediction for %s due to old data." % _payload)
-            continue
-
-        _current_pos = current_payload_tracks[_payload].get_latest_state()
-        _current_pos_list = [
-            0,
-            _current_pos["lat"],
-            _current_pos["lon"],
-            _current_pos["alt"],
-        ]
-        if current_payload_tracks[_payload].length() <= 1:
-            logging.info(
-                "Only %i point in this payload's track, skipping prediction.",
-                current_payload_tracks[_payload].length(),
-            )
-            continue
+    return True
+
+
+# Dataset name reported to clients for predictions made using a payload's ascent winds.
+WIND_PROFILE_DATASET = "Ascent Winds"
+
+
+def wind_profile_fallback_required():
+    """ Check if descent predictions should be made using payload ascent winds, as no other predictor is available """
+    if (chasemapper_config["pred_enabled"] == False) or (
+        chasemapper_config["pred_wind_fallback"] == False
+    ):
+        return False
+
+    if predictor is None:
+        return True
+
+    if (predictor == "Tawhiri") and (not get_default_client().available()):
+        return True
+
+    return False
+
+
+def wind_profile_prediction(_payload, _current_pos):
+    """ Predict the descent of a payload through the wind profile estimated from its ascent.
+
+    Returns:
+        list: Predicted path, in the predictor output format, or None if no wind profile is available.
+    """
+    if (_payload not in current_payload_winds) or (not _current_pos["is_descending"]):
+        return None
+
+    # Use the chase car altitude as the expected ground level, as for the time-to-landing calculation.
+    _car_state = car_track.get_latest_state()
+    _ground_asl = _car_state["alt"] if _car_state is not None else 0.0
+
+    return current_payload_winds[_payload].predict_descent(
+        time.time(),
+        _current_pos["lat"],
+        _current_pos["lon"],
+        _current_pos["alt"],
+        _current_pos["landing_rate"],
+        ground_alt=_ground_asl,
+    )
+
+
+def run_scheduled_prediction(_payload):
+    """ Run a Flight Path prediction for a payload. This is called by the prediction scheduler when a
+    payload's prediction is due, and the results are sent to the clients once the prediction completes.
+
+    Returns:
+        bool: False if a previous prediction for this payload is still running, and this prediction should
+            be retried shortly.
+    """
+
+    if not predictor_ready():
+        return True
+
+    if prediction_pool.busy(_payload):
+        return False
+
+    try:
+        submit_payload_prediction(_payload)
+    except KeyError:
+        # Payload was removed from the data stores while we were working on it.
+        pass
 
-        _pred_ok = False
-        _abort_pred_ok = False
+    return True
 
+
+def submit_payload_prediction(_payload):
+    """ Submit the main and (if required) abort prediction jobs for a payload to the prediction pool.
+
+    Returns:
+        bool: True if prediction jobs were submitted.
+    """
+
+    if prediction_pool.busy(_payload):
+        logging.debug("Prediction for %s still running, skipping." % _payload)
+        return False
+
+    # Check the age of the data.
+    # No point re-running the predictor if the data is older than 30 seconds.
+    _pos_age = current_payloads[_payload]["telem"]["server_time"]
+    if (time.time() - _pos_age) > 30.0:
+        logging.debug("Skipping prediction for %s due to old data." % _payload)
+        return False
+
+    if current_payload_tracks[_payload].length() <= 1:
+        logging.info(
+            "Only %i point in this payload's track, skipping prediction.",
+            current_payload_tracks[_payload].length(),
+        )
+        return False
+
+    _current_pos = current_payload_tracks[_payload].get_latest_state()
+
+    if _current_pos["is_descending"]:
+        _desc_rate = _current_pos["landing_rate"]
+    else:
+        _desc_rate = chasemapper_config["pred_desc_rate"]
+
+    if _current_pos["alt"] > chasemapper_config["pred_burst"]:
+        _burst_alt = _current_pos["alt"] + 100
+    else:
+        _burst_alt = chasemapper_config["pred_burst"]
+
+    if predictor == "Tawhiri":
+        logging.info("Requesting Prediction from Tawhiri for %s." % _payload)
+        # Tawhiri requires that the burst altitude always be higher than the starting altitude.
         if _current_pos["is_descending"]:
-            _desc_rate = _current_pos["landing_rate"]
-        else:
-            _desc_rate = chasemapper_config["pred_desc_rate"]
+            _burst_alt = _current_pos["alt"] + 1
+    else:
+        logging.info("Running Offline Predictor for %s." % _payload)
+
+    _job_params = {
+        "predictor": predictor,
+        "launch_time": _current_pos["time"],
+        "launch_lat": _current_pos["lat"],
+        "launch_lon": _current_pos["lon"],
+        "launch_alt": _current_pos["alt"],
+        "ascent_rate": _current_pos["ascent_rate"],
+        "descent_rate": _desc_rate,
+        "burst_alt": _burst_alt,
+        "descent_mode": _current_pos["is_descending"],
+        "deadline": time.time() + pred_settings["pred_timeout"],
+    }
 
-        if _current_pos["alt"] > chasemapper_config["pred_burst"]:
-            _burst_alt = _current_pos["alt"] + 100
-        else:
-            _burst_alt = chasemapper_config["pred_burst"]
+    _jobs = {"pred": (run_predictor_job, _job_params)}
 
+    # Abort predictions
+    if (
+        chasemapper_config["show_abort"]
+        and (_current_pos["alt"] < chasemapper_config["pred_burst"])
+        and (_current_pos["is_descending"] == False)
+    ):
         if predictor == "Tawhiri":
-            logging.info("Requesting Prediction from Tawhiri for %s." % _payload)
-            # Tawhiri requires that the burst altitude always be higher than the starting altitude.
-            if _current_pos["is_descending"]:
-                _burst_alt = _current_pos["alt"] + 1
-
-            # Tawhiri requires that the ascent rate be > 0 for standard profiles.
-            if _current_pos["ascent_rate"] < 0.1:
-                _current_pos["ascent_rate"] = 0.1
-
-            _tawhiri = get_tawhiri_prediction(
-                launch_datetime=_current_pos["time"],
-                launch_latitude=_current_pos["lat"],
-                launch_longitude=_current_pos["lon"],
-                launch_altitude=_current_pos["alt"],
-                burst_altitude=_burst_alt,
-                ascent_rate=_current_pos["ascent_rate"],
-                descent_rate=_desc_rate,
-            )
+            logging.info("Requesting Abort Prediction from Tawhiri for %s." % _payload)
+        else:
+            logging.info("Running Offline Abort Predictor for: %s." % _payload)
 
-            if _tawhiri:
-                _pred_path = _tawhiri["path"]
-                _dataset = _tawhiri["dataset"] + " (Online)"
-                # Inform the client of the dataset age
-                flask_emit_event("predictor_model_update", {"model": _dataset})
+        _abort_params = _job_params.copy()
+        _abort_params["burst_alt"] = _current_pos["alt"] + 200
+        _jobs["abort"] = (run_predictor_job, _abort_params)
 
-            else:
-                _pred_path = []
+    _current_pos_list = [
+        0,
+        _current_pos["lat"],
+        _current_pos["lon"],
+        _current_pos["alt"],
+    ]
+
+    # Check for cached results from a prediction run with near-identical parameters,
+    # and only submit the jobs we don't already have results for.
+    _cache_keys = {}
+    _cached_results = {}
+    for _name, (_function, _params) in list(_jobs.items()):
+        _cache_keys[_name] = prediction_cache.make_key(
+            _name, chasemapper_config["pred_model"], _params
+        )
+        _cached = prediction_cache.get(_cache_keys[_name])
+        if _cached is not None:
+            _cached_results[_name] = _cached
+            _jobs.pop(_name)
+
+    if len(_cached_results) > 0:
+        logging.info(
+            "Using cached prediction results for %s (%s). Cache stats: %s"
+            % (_payload, ", ".join(_cached_results.keys()), str(prediction_cache.get_stats()))
+        )
+
+    def _handle_results(_callsign, _results, _timed_out):
+        # Store any new valid results in the cache.
+        for _name, _result in _results.items():
+            if (_result is not None) and (len(_result["path"]) > 1):
+                prediction_cache.put(_cache_keys[_name], _result)
+
+        _results.update(_cached_results)
+        handle_prediction_results(_callsign, _current_pos, _current_pos_list, _results, _timed_out)
+
+    if len(_jobs) == 0:
+        # Everything was in the cache, re-emit the cached prediction.
+        _handle_results(_payload, {}, [])
+        _submitted = True
+    else:
+        _submitted = prediction_pool.submit(
+            _payload,
+            _jobs,
+            _handle_results,
+            timeout=pred_settings["pred_timeout"],
+        )
+
+    if _submitted:
+        submit_ensemble_prediction(_payload, _job_params)
+
+    return _submitted
+
+
+def ensemble_group_id(_payload):
+    """ Prediction pool group ID for a payload's ensemble runs """
+    return "%s ensemble" % _payload
+
+
+def submit_ensemble_prediction(_payload, _job_params):
+    """ Submit a landing uncertainty ensemble for a payload to the prediction pool, if ensembles are enabled.
+    Ensembles are run as a separate group, so they do not hold up the main prediction results.
+
+    Returns:
+        bool: True if the ensemble was submitted.
+    """
+
+    # Ensembles are only run using the offline predictor.
+    if (ensemble_predictor is None) or (_job_params["predictor"] == "Tawhiri"):
+        return False
+
+    _group_id = ensemble_group_id(_payload)
+    if prediction_pool.busy(_group_id):
+        logging.debug("Ensemble for %s still running, skipping." % _payload)
+        return False
+
+    logging.info("Running Offline Ensemble Predictor for %s." % _payload)
+
+    _ensemble_params = _job_params.copy()
+    _ensemble_params.pop("predictor")
+    _ensemble_params.pop("deadline")
+    _ensemble_params["timeout"] = pred_settings["pred_timeout"]
 
+    def _handle_results(_group_id, _results, _timed_out):
+        handle_ensemble_results(_payload, _results.get("ensemble"))
+
+    return prediction_pool.submit(
+        _group_id,
+        {"ensemble": (ensemble_predictor.run, _ensemble_params)},
+        _handle_results,
+        timeout=pred_settings["pred_timeout"],
+    )
+
+
+def handle_ensemble_results(_payload, summary):
+    """ Update the payload data store with the results of an ensemble run, and send them to the web clients """
+
+    if (_payload not in current_payloads) or (summary is None):
+        return
+
+    current_payloads[_payload]["pred_ensemble"] = summary
+    archive_log.update(_payload, ("pred_ensemble",))
+
+    logging.info(
+        "Ensemble Updated for %s, %d%% landing ellipse %.0f x %.0f m."
+        % (
+            _payload,
+            summary["ellipse"]["confidence"] * 100,
+            summary["ellipse"]["semi_major"],
+            summary["ellipse"]["semi_minor"],
+        )
+    )
+
+    _client_data = {"callsign": _payload}
+    _client_data.update(summary)
+    flask_emit_event("predictor_ensemble_update", _client_data)
+
+
+def handle_prediction_results(_payload, _current_pos, _current_pos_list, results, timed_out=()):
+    """ Process the results of a payload's prediction jobs, update the payload data store, and send the results to the web clients.
+    If a job timed out (listed in timed_out), the payload's previous prediction is kept. """
+
+    if _payload not in current_payloads:
+        # Payload data has been cleared while the prediction was running.
+        return
+
+    _pred_ok = False
+    _abort_pred_ok = False
+    _updated_fields = []
+
+    if "pred" in timed_out:
+        # The predictor is just slow - keep the previous prediction rather than reporting it as failed.
+        logging.warning("Prediction for %s timed out, keeping previous prediction." % _payload)
+    else:
+        _pred_result = results.get("pred")
+        if ((_pred_result is None) or (len(_pred_result["path"]) <= 1)) and chasemapper_config["pred_wind_fallback"]:
+            # Prediction failed (e.g. the online predictor is unreachable, or returned an empty path) - try using
+            # the payload's ascent winds.
+            _path = wind_profile_prediction(_payload, _current_pos)
+            if _path is not None:
+                logging.warning("Prediction failed for %s, using ascent wind profile." % _payload)
+                _pred_result = {"path": _path, "dataset": WIND_PROFILE_DATASET}
+
+        if _pred_result is not None:
+            _pred_path = _pred_result["path"]
+            if _pred_result["dataset"] is not None:
+                # Inform the client of the dataset age
+                flask_emit_event("predictor_model_update", {"model": _pred_result["dataset"]})
         else:
-            logging.info("Running Offline Predictor for %s." % _payload)
-            _pred_path = predictor.predict(
-                launch_lat=_current_pos["lat"],
-                launch_lon=_current_pos["lon"],
-                launch_alt=_current_pos["alt"],
-                ascent_rate=_current_pos["ascent_rate"],
-                descent_rate=_desc_rate,
-                burst_alt=_burst_alt,
-                launch_time=_current_pos["time"],
-                descent_mode=_current_pos["is_descending"],
-            )
+            _pred_path = []
 
         if len(_pred_path) > 1:
             # Valid Prediction!
-            _pred_path.insert(0, _current_pos_list)
-            # Convert from predictor output format to a polyline.
-            _pred_output = []
-            for _point in _pred_path:
-                _pred_output.append([_point[1], _point[2], _point[3]])
-
-            current_payloads[_payload]["pred_path"] = _pred_output
-            current_payloads[_payload]["pred_landing"] = _pred_output[-1]
-
-            if _current_pos["is_descending"]:
-                current_payloads[_payload]["burst"] = []
-            else:
-                # Determine the burst position.
-                _cur_alt = 0.0
-                _cur_idx = 0
-                for i in range(len(_pred_output)):
-                    if _pred_output[i][2] > _cur_alt:
-                        _cur_alt = _pred_output[i][2]
-                        _cur_idx = i
+            # Build a new list rather than modifying the result, as it may be held in the prediction cache.
+            # Convert from predictor output format to a (simplified) polyline, and determine the burst position.
+            _pred_output = process_prediction_path(
+                _pred_path,
+                _current_pos_list,
+                find_burst=not _current_pos["is_descending"],
+                tolerance=chasemapper_config["pred_path_tolerance"],
+            )
 
-                current_payloads[_payload]["burst"] = _pred_output[_cur_idx]
+            current_payloads[_payload]["pred_path"] = _pred_output["path"]
+            current_payloads[_payload]["pred_landing"] = _pred_output["landing"]
+            current_payloads[_payload]["burst"] = _pred_output["burst"]
+            _updated_fields += ["pred_path", "pred_landing", "burst"]
 
             _pred_ok = True
-            logging.info("Prediction Updated, %d data points." % len(_pred_path))
+            logging.info(
+                "Prediction Updated, %d data points (%d after simplification)."
+                % (len(_pred_path) + 1, len(_pred_output["path"]))
+            )
         else:
             current_payloads[_payload]["pred_path"] = []
             current_payloads[_payload]["pred_landing"] = []
             current_payloads[_payload]["burst"] = []
+            _updated_fields += ["pred_path", "pred_landing", "burst"]
             logging.error("Prediction Failed, possible invalid or missing dataset.")
             flask_emit_event("predictor_model_update", {"model": "Dataset invalid."})
 
-        # Abort predictions
-        if (
-            chasemapper_config["show_abort"]
-            and (_current_pos["alt"] < chasemapper_config["pred_burst"])
-            and (_current_pos["is_descending"] == False)
-        ):
-
-            if predictor == "Tawhiri":
-                logging.info(
-                    "Requesting Abort Prediction from Tawhiri for %s." % _payload
-                )
-
-                # Tawhiri requires that the ascent rate be > 0 for standard profiles.
-                if _current_pos["ascent_rate"] < 0.1:
-                    _current_pos["ascent_rate"] = 0.1
-
-                _tawhiri = get_tawhiri_prediction(
-                    launch_datetime=_current_pos["time"],
-                    launch_latitude=_current_pos["lat"],
-                    launch_longitude=_current_pos["lon"],
-                    launch_altitude=_current_pos["alt"],
-                    burst_altitude=_current_pos["alt"] + 200,
-                    ascent_rate=_current_pos["ascent_rate"],
-                    descent_rate=_desc_rate,
-                )
-
-                if _tawhiri:
-                    _abort_pred_path = _tawhiri["path"]
-
-                else:
-                    _abort_pred_path = []
-
-            else:
-                logging.info("Running Offline Abort Predictor for: %s." % _payload)
-
-                _abort_pred_path = predictor.predict(
-                    launch_lat=_current_pos["lat"],
-                    launch_lon=_current_pos["lon"],
-                    launch_alt=_current_pos["alt"],
-                    ascent_rate=_current_pos["ascent_rate"],
-                    descent_rate=_desc_rate,
-                    burst_alt=_current_pos["alt"] + 200,
-                    launch_time=_current_pos["time"],
-                    descent_mode=_current_pos["is_descending"],
-                )
+    if "abort" in timed_out:
+        logging.warning("Abort prediction for %s timed out, keeping previous abort prediction." % _payload)
+    elif "abort" in results:
+        if results["abort"] is not None:
+            _abort_pred_path = results["abort"]["path"]
+        else:
+            _abort_pred_path = []
 
-            if len(_pred_path) > 1:
-                # Valid Prediction!
-                _abort_pred_path.insert(0, _current_pos_list)
-                # Convert from predictor output format to a polyline.
-                _abort_pred_output = []
-                for _point in _abort_pred_path:
-                    _abort_pred_output.append([_point[1], _point[2], _point[3]])
+        if len(_abort_pred_path) > 1:
+            # Valid Prediction!
+            _abort_pred_output = process_prediction_path(
+                _abort_pred_path,
+                _current_pos_list,
+                find_burst=False,
+                tolerance=chasemapper_config["pred_path_tolerance"],
+            )
 
-                current_payloads[_payload]["abort_path"] = _abort_pred_output
-                current_payloads[_payload]["abort_landing"] = _abort_pred_output[-1]
+            current_payloads[_payload]["abort_path"] = _abort_pred_output["path"]
+            current_payloads[_payload]["abort_landing"] = _abort_pred_output["landing"]
+            _updated_fields += ["abort_path", "abort_landing"]
 
-                _abort_pred_ok = True
-                logging.info(
-                    "Abort Prediction Updated, %d data points." % len(_pred_path)
-                )
-            else:
-                current_payloads[_payload]["abort_path"] = []
-                current_payloads[_payload]["abort_landing"] = []
-                logging.error("Prediction Failed, possible invalid or missing dataset.")
-                flask_emit_event("predictor_model_update", {"model": "Dataset invalid."})
+            _abort_pred_ok = True
+            logging.info(
+                "Abort Prediction Updated, %d data points (%d after simplification)."
+                % (len(_abort_pred_path) + 1, len(_abort_pred_output["path"]))
+            )
         else:
-            # Zero the abort path and landing
             current_payloads[_payload]["abort_path"] = []
             current_payloads[_payload]["abort_landing"] = []
-
-        # Send the web client the updated prediction data.
-        if _pred_ok or _abort_pred_ok:
-            _client_data = {
-                "callsign": _payload,
-                "pred_path": current_payloads[_payload]["pred_path"],
-                "pred_landing": current_payloads[_payload]["pred_landing"],
-                "burst": current_payloads[_payload]["burst"],
-                "abort_path": current_payloads[_payload]["abort_path"],
-                "abort_landing": current_payloads[_payload]["abort_landing"],
-            }
+            _updated_fields += ["abort_path", "abort_landing"]
+            logging.error("Prediction Failed, possible invalid or missing dataset.")
+            flask_emit_event("predictor_model_update", {"model": "Dataset invalid."})
+    else:
+        # Zero the abort path and landing
+        current_payloads[_payload]["abort_path"] = []
+        current_payloads[_payload]["abort_landing"] = []
+        _updated_fields += ["abort_path", "abort_landing"]
+
+    if len(_updated_fields) > 0:
+        archive_log.update(_payload, _updated_fields)
+
+    # Send the web client the updated prediction data.
+    if _pred_ok or _abort_pred_ok:
+        _client_data = {
+            "callsign": _payload,
+            "pred_path": current_payloads[_payload]["pred_path"],
+            "pred_landing": current_payloads[_payload]["pred_landing"],
+            "burst": current_payloads[_payload]["burst"],
+            "abort_path": current_payloads[_payload]["abort_path"],
+            "abort_landing": current_payloads[_payload]["abort_landing"],
+        }
+        if chasemapper_config["pred_path_encoding"] == "polyline":
+            # Send the paths as encoded polylines, which the client decodes.
+            _emit_data = dict(_client_data)
+            _emit_data["pred_path"] = encode_polyline(_client_data["pred_path"])
+            _emit_data["abort_path"] = encode_polyline(_client_data["abort_path"])
+            _emit_data["path_encoding"] = "polyline"
+            flask_emit_event("predictor_update", _emit_data)
+        else:
             flask_emit_event("predictor_update", _client_data)
 
-            # Add the prediction run to the logger.
-            if chase_logger:
-                chase_logger.add_balloon_prediction(_client_data)
+        # Add the prediction run to the logger.
+        if chase_logger:
+            chase_logger.add_balloon_prediction(_client_data)
+
+
+def wait_for_predictor_workers():
+    """ Wait for the predictor worker processes to load the GFS dataset, then use them for predictions """
+    global predictor
+
+    try:
+        predictor_workers.wait_ready()
+    except Exception as e:
+        logging.error("Loading predictor failed: " + str(e))
+        fallback_to_tawhiri("Offline predictor failed to load")
+        return
 
-    # Clear the predictor-running semaphore
-    predictor_semaphore = False
+    if chasemapper_config["offline_predictions"]:
+        predictor = predictor_workers
+        logging.info("Predictor Workers - Workers ready, using them for predictions.")
 
 
 def initPredictor():
-    global predictor, predictor_thread, predictor_model_end, chasemapper_config, pred_settings
+    global predictor, predictor_workers, predictor_model_end, chasemapper_config, pred_settings
+
+    # Any cached predictions may have been run with a different dataset.
+    if prediction_cache is not None:
+        prediction_cache.clear()
 
     if chasemapper_config["offline_predictions"]:
         # Attempt to initialize an Offline Predictor instance
@@ -800,17 +1184,36 @@ def initPredictor():
                     flask_emit_event(
                         "predictor_model_update", {"model": _model_age + " (Offline)"}
                     )
-                    predictor = Predictor(
-                        bin_path=pred_settings["pred_binary"],
-                        gfs_path=pred_settings["gfs_path"],
-                    )
+                    if (pred_settings["pred_engine"] == "inprocess") and (
+                        pred_settings["pred_processes"] > 0
+                    ):
+                        # Start up the worker processes, or restart them with the new dataset.
+                        if predictor_workers is None:
+                            predictor_workers = PredictorWorkerPool(
+                                gfs_path=pred_settings["gfs_path"],
+                                processes=pred_settings["pred_processes"],
+                            )
+                        else:
+                            logging.info(
+                                "Predictor worker latency stats: %s" % str(predictor_workers.get_stats())
+                            )
+                            predictor_workers.reload()
+
+                        # Loading the dataset into the workers can take a while, and we may be running in a
+                        # Socket.IO handler, so wait for the workers in the background. Until they are ready,
+                        # predictions are run by the current predictor (if any).
+                        _thread = Thread(target=wait_for_predictor_workers)
+                        _thread.daemon = True
+                        _thread.start()
+                    elif pred_settings["pred_engine"] == "inprocess":
+                        predictor = GFSPredictor(gfs_path=pred_settings["gfs_path"])
+                    else:
+                        predictor = Predictor(
+                            bin_path=pred_settings["pred_binary"],
+                            gfs_path=pred_settings["gfs_path"],
+                        )
                     predictor_model_end = _model_end
 
-                    # Start up the predictor thread if it is not running.
-                    if predictor_thread == None:
-                        predictor_thread = Thread(target=predictorThread)
-                        predictor_thread.start()
-
                     # Set the predictor to enabled, and update the clients.
                     chasemapper_config["offline_predictions"] = True
 
@@ -826,11 +1229,6 @@ def initPredictor():
         predictor = "Tawhiri"
         flask_emit_event("predictor_model_update", {"model": "Tawhiri"})
 
-        # Start up the predictor thread if it is not running.
-        if predictor_thread == None:
-            predictor_thread = Thread(target=predictorThread)
-            predictor_thread.start()
-
     flask_emit_event("server_settings_update", chasemapper_config)
 
 
@@ -850,6 +1248,31 @@ def model_download_finished(result):
             fallback_to_tawhiri("Model download failed")
 
 
+def model_download_progress(progress):
+    """ Callback for progress updates from the built-in model downloader """
+    flask_emit_event("model_download_progress", progress)
+
+
+def spawn_model_download():
+    """ Start a model download, using either the built-in GFS downloader, or the configured download command """
+    if pred_settings["pred_model_download"] == "builtin":
+        _downloader = GFSDownloader(
+            pred_settings["gfs_path"],
+            chasemapper_config["default_lat"],
+            chasemapper_config["default_lon"],
+            latdelta=pred_settings["pred_download_latdelta"],
+            londelta=pred_settings["pred_download_londelta"],
+            forecast_hours=pred_settings["pred_download_hours"],
+            model=pred_settings["pred_download_model"],
+            connections=pred_settings["pred_download_connections"],
+            base_url=pred_settings["pred_download_url"],
+            progress_callback=model_download_progress,
+        )
+        return predictor_spawn_builtin_download(_downloader, model_download_finished)
+    else:
+        return predictor_spawn_download(pred_settings["pred_model_download"], model_download_finished)
+
+
 @socketio.on("download_model", namespace="/chasemapper")
 def download_new_model(data):
     """ Trigger a download of a new weather model """
@@ -863,10 +1286,9 @@ def download_new_model(data):
         flask_emit_event("predictor_model_update", {"model": "No model download cmd."})
         return
     else:
-        _model_cmd = pred_settings["pred_model_download"]
         flask_emit_event("predictor_model_update", {"model": "Downloading Model."})
 
-        _status = predictor_spawn_download(_model_cmd, model_download_finished)
+        _status = spawn_model_download()
         flask_emit_event("predictor_model_update", {"model": _status})
 
 
@@ -881,8 +1303,7 @@ def download_new_model_2():
         logging.info("No GFS model download command specified.")
         return "No model download cmd."
     else:
-        _model_cmd = pred_settings["pred_model_download"]
-        _status = predictor_spawn_download(_model_cmd, model_download_finished)
+        _status = spawn_model_download()
         return _status
 
 
@@ -890,14 +1311,17 @@ def download_new_model_2():
 @socketio.on("payload_data_clear", namespace="/chasemapper")
 def clear_payload_data(data):
     """ Clear the payload data store """
-    global predictor_semaphore, current_payloads, current_payload_tracks
+    global current_payloads, current_payload_tracks, current_payload_winds
     logging.warning("Client requested all payload data be cleared.")
     # Wait until any current predictions have finished running.
-    while predictor_semaphore:
-        time.sleep(0.1)
+    if prediction_scheduler is not None:
+        prediction_scheduler.clear()
+    wait_for_predictions()
 
     current_payloads = {}
     current_payload_tracks = {}
+    current_payload_winds = {}
+    archive_log.reset()
 
 
 @socketio.on("car_data_clear", namespace="/chasemapper")
@@ -1129,7 +1553,7 @@ data_monitor_thread_running = True
 
 def check_data_age():
     """ Regularly check the age of the payload data, and clear if latest position is older than X minutes."""
-    global current_payloads, chasemapper_config, predictor_semaphore
+    global current_payloads, chasemapper_config
 
     while data_monitor_thread_running:
         _now = time.time()
@@ -1142,13 +1566,18 @@ def check_data_age():
                     chasemapper_config["payload_max_age"] * 60.0
                 ):
                     # Data is older than our maximum age!
-                    # Make sure we do not have a predictor cycle running.
-                    while predictor_semaphore:
-                        time.sleep(0.1)
+                    # Make sure we do not have a prediction scheduled or running for this payload.
+                    if prediction_scheduler is not None:
+                        prediction_scheduler.remove(_call)
+                    if prediction_pool is not None:
+                        prediction_pool.cancel(_call)
+                        prediction_pool.cancel(ensemble_group_id(_call))
 
                     # Remove this payload from our global data stores.
                     current_payloads.pop(_call)
                     current_payload_tracks.pop(_call)
+                    current_payload_winds.pop(_call, None)
+                    archive_log.remove(_call)
 
                     logging.info(
                         "Payload %s telemetry older than maximum age - removed from data store."
@@ -1422,8 +1851,45 @@ if __name__ == "__main__":
         "pred_binary": chasemapper_config["pred_binary"],
         "gfs_path": chasemapper_config["pred_gfs_directory"],
         "pred_model_download": chasemapper_config["pred_model_download"],
+        "pred_workers": chasemapper_config["pred_workers"],
+        "pred_timeout": chasemapper_config["pred_timeout"],
+        "pred_cache_size": chasemapper_config["pred_cache_size"],
+        "pred_engine": chasemapper_config["pred_engine"],
+        "pred_processes": chasemapper_config["pred_processes"],
+        "pred_ensemble_size": chasemapper_config["pred_ensemble_size"],
+        "pred_ensemble_workers": chasemapper_config["pred_ensemble_workers"],
+        "pred_ensemble_rate_error": chasemapper_config["pred_ensemble_rate_error"],
+        "pred_ensemble_burst_error": chasemapper_config["pred_ensemble_burst_error"],
+        "pred_download_latdelta": chasemapper_config["pred_download_latdelta"],
+        "pred_download_londelta": chasemapper_config["pred_download_londelta"],
+        "pred_download_hours": chasemapper_config["pred_download_hours"],
+        "pred_download_model": chasemapper_config["pred_download_model"],
+        "pred_download_connections": chasemapper_config["pred_download_connections"],
+        "pred_download_url": chasemapper_config["pred_download_url"],
     }
 
+    # Start up the prediction job pool.
+    prediction_pool = PredictionPool(
+        workers=pred_settings["pred_workers"], timeout=pred_settings["pred_timeout"]
+    )
+    prediction_cache = PredictionCache(max_entries=pred_settings["pred_cache_size"])
+    prediction_scheduler = PredictionScheduler(
+        run_scheduled_prediction,
+        max_interval=chasemapper_config["pred_update_rate"],
+        min_interval=chasemapper_config["pred_min_update_rate"],
+    )
+
+    # Start up the landing uncertainty ensemble runner, if enabled.
+    if pred_settings["pred_ensemble_size"] > 0:
+        ensemble_predictor = EnsemblePredictor(
+            bin_path=pred_settings["pred_binary"],
+            gfs_path=pred_settings["gfs_path"],
+            size=pred_settings["pred_ensemble_size"],
+            workers=pred_settings["pred_ensemble_workers"],
+            rate_error=pred_settings["pred_ensemble_rate_error"],
+            burst_error=pred_settings["pred_ensemble_burst_error"],
+        )
+
     # Copy out Offline Map Settings
     map_settings = {
         "tile_server_enabled": chasemapper_config["tile_server_enabled"],
@@ -1440,6 +1906,19 @@ if __name__ == "__main__":
         time_seq_active=chasemapper_config["time_seq_active"],
         time_seq_cycle=chasemapper_config["time_seq_cycle"],
         doa_confidence_threshold=chasemapper_config["doa_confidence_threshold"],
+        change_window=chasemapper_config["bearing_change_window"],
+        triangulation_enabled=chasemapper_config["triangulation_enabled"],
+        triangulation_min_bearings=chasemapper_config["triangulation_min_bearings"],
+        heatmap_enabled=chasemapper_config["heatmap_enabled"],
+        heatmap_extent=chasemapper_config["heatmap_extent"] * 1000.0,
+        heatmap_resolution=chasemapper_config["heatmap_resolution"],
+        heatmap_sigma=chasemapper_config["heatmap_sigma"],
+        heatmap_interval=chasemapper_config["heatmap_interval"],
+        outlier_filter_enabled=chasemapper_config["outlier_filter_enabled"],
+        outlier_filter_threshold=chasemapper_config["outlier_filter_threshold"],
+        outlier_filter_min_deviation=chasemapper_config["outlier_filter_min_deviation"],
+        outlier_filter_time_constant=chasemapper_config["outlier_filter_time_constant"],
+        outlier_filter_distance=chasemapper_config["outlier_filter_distance"],
     )
 
     # Set speed gate for car position object
@@ -1492,8 +1971,13 @@ if __name__ == "__main__":
         ) 
 
     # Close the predictor and data age monitor threads.
-    predictor_thread_running = False
+    prediction_scheduler.close()
     data_monitor_thread_running = False
+    prediction_pool.close()
+    if ensemble_predictor is not None:
+        ensemble_predictor.close()
+    if predictor_workers is not None:
+        predictor_workers.close()
 
     # Close the chase logger
     if chase_logger:
@@ -171,10 +171,10 @@ def flight_stats(telemetry, ascent_threshold = 3.0, descent_threshold=-5.0,  lan
                     pass
 
             if _flight_segment == "ASCENT":
-                if _track.track_history[-1][3] < _track.track_history[-2][3]:
+                if _track.get_track_point(-1)[3] < _track.get_track_point(-2)[3]:
                     # Possible detection of burst.
                     if 'burst_position' not in _stats:
-                        _stats['burst_position'] = _track.track_history[-2]
+                        _stats['burst_position'] = _track.get_track_point(-2)
                         logging.info("Detected Burst: %s, %.5f, %.5f, %dm" % (
                             _stats['burst_position'][0].isoformat(),
                             _stats['burst_position'][1],
@@ -203,16 +203,20 @@ def flight_stats(telemetry, ascent_threshold = 3.0, descent_threshold=-5.0,  lan
     return _stats
 
 
-def calculate_predictor_error(predictions, landing_time, lat, lon, alt):
-    """ Process a list of predictions, and determine the landing position error for each one """
-
+def score_predictions(predictions, landing_time, lat, lon, alt, path_field='pred_path', landing_field='pred_landing', label="Prediction"):
+    """ Process a list of predictions, and determine the landing position error for each one.
+    The errors for all predictions are calculated in a single array operation. """
 
-    _output = []
+    _times = []
+    _altitudes = []
+    _landings = []
 
-    _landing = (lat, lon, alt)
+    for _predict in predictions:
 
+        # Check there is a prediction available.
+        if len(_predict[landing_field]) == 0:
+            continue
 
-    for _predict in predictions:
         _predict_time = _predict['log_time']
 
         # Append on a timezone indicator if the time doesn't have one.
@@ -221,86 +225,59 @@ def calculate_predictor_error(predictions, landing_time, lat, lon, alt):
         else:
             _predict_time += "Z"
 
+        _predict_time = parse(_predict_time)
+
         if landing_time != None:
-            if parse(_predict_time) > (landing_time-datetime.timedelta(0,30)):
+            if _predict_time > (landing_time-datetime.timedelta(0,30)):
                 break
 
-        _predict_altitude = _predict['pred_path'][0][2]
-        _predict_landing = (_predict['pred_landing'][0], _predict['pred_landing'][1], _predict['pred_landing'][2])
+        _times.append(_predict_time)
+        _altitudes.append(_predict[path_field][0][2])
+        _landings.append(_predict[landing_field][:3])
+
+    if len(_landings) == 0:
+        return []
 
+    _landings = np.array(_landings, dtype=np.float64)
 
-        _pos_info = position_info(_landing, _predict_landing)
+    _pos_info = position_info_array(
+        lat, lon, alt,
+        _landings[:,0], _landings[:,1], _landings[:,2]
+    )
+    _errors = _pos_info['great_circle_distance']/1000.0
+    _bearings = _pos_info['bearing']
+
+    _output = []
 
-        logging.debug("Prediction %s: Altitude %d, Predicted Landing: %.4f, %.4f Prediction Error: %.1f km, %s" % (
-            _predict_time,
-            int(_predict_altitude),
-            _predict['pred_landing'][0],
-            _predict['pred_landing'][1],
-            (_pos_info['great_circle_distance']/1000.0),
-            bearing_to_cardinal(_pos_info['bearing'])
+    for i in range(len(_times)):
+        logging.debug("%s %s: Altitude %d, Predicted Landing: %.4f, %.4f Prediction Error: %.1f km, %s" % (
+            label,
+            _times[i].isoformat(),
+            int(_altitudes[i]),
+            _landings[i,0],
+            _landings[i,1],
+            _errors[i],
+            bearing_to_cardinal(_bearings[i])
             ))
 
         _output.append([
-            parse(_predict_time),
-            _pos_info['great_circle_distance']/1000.0,
-            _pos_info['bearing'],
-            _predict_altitude
+            _times[i],
+            float(_errors[i]),
+            float(_bearings[i]),
+            _altitudes[i]
             ])
 
     return _output
 
 
-def calculate_abort_error(predictions, landing_time, lat, lon, alt):
+def calculate_predictor_error(predictions, landing_time, lat, lon, alt):
     """ Process a list of predictions, and determine the landing position error for each one """
+    return score_predictions(predictions, landing_time, lat, lon, alt, 'pred_path', 'pred_landing', "Prediction")
 
 
-    _output = []
-
-    _landing = (lat, lon, alt)
-
-
-    for _predict in predictions:
-
-        # Check there is an abort prediction available.
-        if len(_predict['abort_landing']) == 0:
-            continue
-
-        _predict_time = _predict['log_time']
-
-
-        # Append on a timezone indicator if the time doesn't have one.
-        if _predict_time.endswith('Z') or _predict_time.endswith('+00:00'):
-            pass
-        else:
-            _predict_time += "Z"
-
-        if landing_time != None:
-            if parse(_predict_time) > (landing_time-datetime.timedelta(0,30)):
-                break
-
-        _predict_altitude = _predict['abort_path'][0][2]
-        _predict_landing = (_predict['abort_landing'][0], _predict['abort_landing'][1], _predict['abort_landing'][2])
-
-
-        _pos_info = position_info(_landing, _predict_landing)
-
-        logging.debug("Abort Prediction %s: Altitude %d, Predicted Landing: %.4f, %.4f Prediction Error: %.1f km, %s" % (
-            _predict_time,
-            int(_predict_altitude),
-            _predict['abort_landing'][0],
-            _predict['abort_landing'][1],
-            (_pos_info['great_circle_distance']/1000.0),
-            bearing_to_cardinal(_pos_info['bearing'])
-            ))
-
-        _output.append([
-            parse(_predict_time),
-            _pos_info['great_circle_distance']/1000.0,
-            _pos_info['bearing'],
-            _predict_altitude
-            ])
-
-    return _output
+def calculate_abort_error(predictions, landing_time, lat, lon, alt):
+    """ Process a list of abort predictions, and determine the landing position error for each one """
+    return score_predictions(predictions, landing_time, lat, lon, alt, 'abort_path', 'abort_landing', "Abort Prediction")
 
 
 def plot_predictor_error(flight_stats, predictor_errors, abort_predictor_errors=None, callsign = ""):
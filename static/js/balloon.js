@@ -5,6 +5,10 @@
 //   Released under GNU GPL v3 or later
 //
 
+// Delta sync cursor (sequence number and server instance ID) of the telemetry archive.
+// On reconnection, only the changes to the archive since the cursor are requested.
+var archive_cursor = {seq: 0, instance: null};
+
 
 function add_new_balloon(data){
     // Add a new balloon to the telemetry store.
@@ -28,7 +32,8 @@ function add_new_balloon(data){
         age: 0,
         colour: colour_values[colour_idx],
         snr: -255.0,
-        visible: true
+        visible: true,
+        ensemble: null
     };
     // Balloon Path
     balloon_positions[callsign].path = L.polyline(data.path,{title:callsign + " Path", color:balloon_positions[callsign].colour}).addTo(map);
@@ -103,11 +108,146 @@ function add_new_balloon(data){
         balloon_positions[callsign].abort_marker = null;
     }
 
-    
+    // Landing uncertainty ensemble, if one has been run.
+    if (data.hasOwnProperty('pred_ensemble') && data.pred_ensemble.hasOwnProperty('contours')){
+        var _ensemble = Object.assign({callsign: callsign}, data.pred_ensemble);
+        handleEnsemble(_ensemble);
+    }
+
     colour_idx = (colour_idx+1)%colour_values.length; 
 
 }
 
+function remove_balloon(callsign){
+    // Remove a balloon, and all of its layers, from the map and the telemetry store.
+    if (balloon_positions.hasOwnProperty(callsign) == false){
+        return;
+    }
+
+    balloon_positions[callsign].marker.remove();
+    balloon_positions[callsign].path.remove();
+    balloon_positions[callsign].pred_path.remove();
+    balloon_positions[callsign].abort_path.remove();
+    // Clear out the markers if they exist.
+    if (balloon_positions[callsign].abort_marker != null){
+        balloon_positions[callsign].abort_marker.remove();
+    }
+    if (balloon_positions[callsign].burst_marker != null){
+        balloon_positions[callsign].burst_marker.remove();
+    }
+    if (balloon_positions[callsign].pred_marker != null){
+        balloon_positions[callsign].pred_marker.remove();
+    }
+    if (balloon_positions[callsign].ensemble != null){
+        balloon_positions[callsign].ensemble.remove();
+    }
+
+    delete balloon_positions[callsign];
+
+    if (balloon_currently_following === callsign){
+        balloon_currently_following = "none";
+    }
+}
+
+function setBalloonIcon(callsign){
+    // Set a balloon's marker icon to a balloon, parachute or payload, depending on its flight state.
+    var _telem = balloon_positions[callsign].latest_data;
+    var _colour = balloon_positions[callsign].colour;
+
+    if (_telem.vel_v < 0){
+        balloon_positions[callsign].marker.setIcon(balloonDescentIcons[_colour]);
+    }else{
+        balloon_positions[callsign].marker.setIcon(balloonAscentIcons[_colour]);
+    }
+
+    if (_telem.position[2] < parachute_min_alt){
+        balloon_positions[callsign].marker.setIcon(balloonPayloadIcons[_colour]);
+    }
+}
+
+function syncTelemetryArchive(callback){
+    // Request the changes to the telemetry archive since our cursor.
+    // With no cursor (i.e. on page load), we will be sent the whole archive.
+    $.ajax({
+          url: "/get_telemetry_archive",
+          data: {since: archive_cursor.seq, instance: archive_cursor.instance},
+          dataType: 'json',
+          async: true,
+          success: function(data) {
+            applyArchiveChanges(data);
+            if (callback != null){
+                callback();
+            }
+          }
+    });
+}
+
+function applyArchiveChanges(data){
+    // Apply the changes to the telemetry archive sent by the server in response to syncTelemetryArchive.
+    // If the server can not determine the changes since our cursor (e.g. it has been restarted),
+    // it sends the whole archive instead.
+    var _callsign;
+    if (data.full == true){
+        for (_callsign in balloon_positions){
+            remove_balloon(_callsign);
+        }
+    } else {
+        data.removed.forEach(function (item, index){
+            remove_balloon(item);
+        });
+    }
+
+    for (_callsign in data.payloads){
+        var _changes = data.payloads[_callsign];
+
+        if (_changes.hasOwnProperty('path')){
+            // This is a whole archive entry, for a payload which is new to us.
+            remove_balloon(_callsign);
+            add_new_balloon(_changes);
+            continue;
+        }
+
+        if (balloon_positions.hasOwnProperty(_callsign) == false){
+            continue;
+        }
+
+        if (_changes.hasOwnProperty('path_append')){
+            // Any positions we have received since reconnecting are included in the new path points.
+            var _path = balloon_positions[_callsign].path.getLatLngs().slice(0, _changes.path_start);
+            balloon_positions[_callsign].path.setLatLngs(_path.concat(_changes.path_append));
+        }
+
+        if (_changes.hasOwnProperty('telem')){
+            balloon_positions[_callsign].latest_data = _changes.telem;
+            balloon_positions[_callsign].age = Date.now();
+            balloon_positions[_callsign].marker.setLatLng(_changes.telem.position).update();
+            setBalloonIcon(_callsign);
+        }
+
+        // Prediction fields are always updated together. Failed predictions are not shown.
+        if (_changes.hasOwnProperty('pred_landing') && (_changes.pred_landing.length == 3)){
+            handlePrediction({
+                callsign: _callsign,
+                pred_path: _changes.pred_path,
+                pred_landing: _changes.pred_landing,
+                burst: _changes.burst,
+                abort_path: _changes.abort_path,
+                abort_landing: _changes.abort_landing
+            });
+        }
+
+        if (_changes.hasOwnProperty('pred_ensemble') && _changes.pred_ensemble.hasOwnProperty('contours')){
+            handleEnsemble(Object.assign({callsign: _callsign}, _changes.pred_ensemble));
+        }
+    }
+
+    archive_cursor = {seq: data.seq, instance: data.instance};
+
+    // Update the telemetry table and summary displays.
+    updateTelemetryTable();
+    updateSummaryDisplay();
+}
+
 function updateSummaryDisplay(){
     
     if (chase_config['unitselection'] == "imperial") {updateSummaryDisplayImperial() ; return ; } // else do everything in metric
@@ -346,16 +486,7 @@ function handleTelemetry(data){
             balloon_positions[data.callsign].age = Date.now();
             balloon_positions[data.callsign].path.addLatLng(data.position);
             balloon_positions[data.callsign].marker.setLatLng(data.position).update();
-
-            if (data.vel_v < 0){
-                balloon_positions[data.callsign].marker.setIcon(balloonDescentIcons[balloon_positions[data.callsign].colour]);
-            }else{
-                balloon_positions[data.callsign].marker.setIcon(balloonAscentIcons[balloon_positions[data.callsign].colour]);
-            }
-
-            if (data.position[2] < parachute_min_alt){
-                balloon_positions[data.callsign].marker.setIcon(balloonPayloadIcons[balloon_positions[data.callsign].colour]);
-            }
+            setBalloonIcon(data.callsign);
 
             if(data.hasOwnProperty('snr') == true){
                 balloon_positions[data.callsign].snr = data.snr;
@@ -363,6 +494,11 @@ function handleTelemetry(data){
 
         }
 
+        // Keep our cursor up to date, so a resync only requests changes we have not seen.
+        if (data.hasOwnProperty('archive_seq') && (data.archive_seq > archive_cursor.seq)){
+            archive_cursor.seq = data.archive_seq;
+        }
+
         // Update the telemetry table display
         updateTelemetryTable();
 
@@ -425,6 +561,9 @@ function hideBalloon(callsign){
                 balloon_positions[callsign].abort_marker.remove();
                 balloon_positions[callsign].abort_path.remove();
             }
+            if(balloon_positions[callsign].ensemble != null){
+                balloon_positions[callsign].ensemble.remove();
+            }
     }
 }
 
@@ -450,5 +589,9 @@ function showBalloon(callsign){
                 balloon_positions[callsign].abort_path.addTo(map);
             }
 
+            if(balloon_positions[callsign].ensemble != null){
+                balloon_positions[callsign].ensemble.addTo(map);
+            }
+
     }
 }
@@ -15,8 +15,22 @@
 
 var bearing_store = {};
 
+// Delta sync cursor (sequence number and server instance ID) of the bearing store.
+// On reconnection, only the changes to the bearing store since the cursor are requested.
+var bearing_cursor = {seq: 0, instance: null};
+
+// Triangulated transmitter location estimates from the server, keyed by bearing source.
+var bearing_fix_store = {};
+
+// Bearing likelihood heatmaps from the server (if enabled), keyed by bearing source.
+var bearing_heatmap_store = {};
+
 var bearing_sources = [];
 
+// Angle grids of raw DOA data, keyed by angle grid ID. Raw DOA data from the server refers to these by ID.
+var doa_angle_grids = {};
+var doa_angle_grids_loading = false;
+
 var bearings_on = true;
 var bearings_only_mode = false;
 
@@ -112,6 +126,18 @@ function destroyAllBearings(){
 
 	bearing_store = {};
 	//bearing_sources = [];
+
+	$.each(bearing_fix_store, function(key, value) {
+		removeBearingFixLayers(bearing_fix_store[key]);
+	});
+
+	bearing_fix_store = {};
+
+	$.each(bearing_heatmap_store, function(key, value) {
+		bearing_heatmap_store[key].overlay.remove();
+	});
+
+	bearing_heatmap_store = {};
 }
 
 
@@ -373,6 +399,14 @@ function redrawBearings(){
 		}
 
 	});
+
+	$.each(bearing_fix_store, function(key, value) {
+		drawBearingFix(key);
+	});
+
+	$.each(bearing_heatmap_store, function(key, value) {
+		drawBearingHeatmap(key);
+	});
 }
 
 
@@ -384,21 +418,147 @@ function initialiseBearings(){
 	// Update the bearing settings.
 	updateBearingSettings();
 
-	// Request the bearings from the client.
+	// Request the bearings from the server. As we have no cursor yet, we will be sent the whole bearing store.
+	bearing_cursor = {seq: 0, instance: null};
+	syncBearings();
+
+	loadDOAAngleGrids();
+
+	loadBearingEstimates();
+
+	refreshServerTime();
+
+}
+
+
+function syncBearings(){
+	// Request the changes to the bearing store since our cursor.
     $.ajax({
           url: "/get_bearings",
+          data: {since: bearing_cursor.seq, instance: bearing_cursor.instance},
+          dataType: 'json',
+          async: true,
+          success: applyBearingChanges
+    });
+}
+
+
+function applyBearingChanges(data){
+	// Apply the changes to the bearing store sent by the server in response to syncBearings.
+	// If the server can not determine the changes since our cursor (e.g. it has been restarted),
+	// it sends the whole bearing store instead.
+	if(data.full == true){
+		$.each(bearing_store, function(key, value) {
+			removeBearingLayers(value);
+		});
+		bearing_store = {};
+
+		$.each(data.bearings, function(key, value) {
+			addBearing(key, value, false);
+		});
+	} else {
+		removeBearings(data.remove);
+
+		$.each(data.add, function(key, value) {
+			// We may already have this bearing, from a bearing_change event received since reconnecting.
+			if(!bearing_store.hasOwnProperty(key)){
+				addBearing(key, value, false);
+			}
+		});
+	}
+
+	bearing_cursor = {seq: data.seq, instance: data.instance};
+}
+
+
+function loadBearingEstimates(){
+	// Request the triangulated fixes.
+    $.ajax({
+          url: "/get_bearing_fixes",
           dataType: 'json',
           async: true,
           success: function(data) {
+			$.each(bearing_fix_store, function(key, value) {
+				removeBearingFixLayers(value);
+			});
+			bearing_fix_store = {};
 
 			$.each(data, function(key, value) {
-                addBearing(key, value, false);
+                bearingFixUpdate(value);
             });
           }
     });
 
+	// Request the likelihood heatmaps.
+    $.ajax({
+          url: "/get_bearing_heatmaps",
+          dataType: 'json',
+          async: true,
+          success: function(data) {
+			$.each(data, function(key, value) {
+                bearingHeatmapUpdate(value);
+            });
+          }
+    });
+}
+
+
+function resyncBearings(){
+	// Request what we have missed while disconnected from the server.
+	syncBearings();
+	loadBearingEstimates();
 	refreshServerTime();
+}
+
+
+function loadDOAAngleGrids(){
+	// Request the raw DOA angle grids from the server.
+	if(doa_angle_grids_loading == true){
+		return;
+	}
+	doa_angle_grids_loading = true;
+
+    $.ajax({
+          url: "/get_doa_angle_grids",
+          dataType: 'json',
+          async: true,
+          success: function(data) {
+			$.each(data, function(key, value) {
+                doa_angle_grids[key] = value;
+            });
+          },
+          complete: function() {
+			doa_angle_grids_loading = false;
+          }
+    });
+}
+
+
+function decodeRawDOA(data){
+	// Decode compact raw DOA data from the server (8-bit values, referring to an angle grid by ID),
+	// into raw_bearing_angles and raw_doa arrays.
+	if(!data.hasOwnProperty('raw_doa_grid')){
+		return;
+	}
+
+	if(doa_angle_grids.hasOwnProperty(data.raw_doa_grid)){
+		var _quantised = new Uint8Array(data.raw_doa_q);
+		var _scale = (data.raw_doa_max - data.raw_doa_min)/255.0;
+		var _doa = new Array(_quantised.length);
+		for(var i = 0; i < _quantised.length; i++){
+			_doa[i] = data.raw_doa_min + _quantised[i]*_scale;
+		}
+		data.raw_bearing_angles = doa_angle_grids[data.raw_doa_grid];
+		data.raw_doa = _doa;
+	} else {
+		// We don't have this angle grid yet (e.g. we connected after it was sent), so request it.
+		loadDOAAngleGrids();
+	}
 
+	delete data.raw_doa_grid;
+	delete data.raw_doa_q;
+	delete data.raw_doa_min;
+	delete data.raw_doa_max;
 }
 
 
@@ -406,18 +566,137 @@ function bearingUpdate(data){
 	// Remove any bearings that have been requested.
 	setServerTime(data.server_timestamp);
 	removeBearings(data.remove);
+	// Keep our cursor up to date, so a resync only requests changes we have not seen.
+	if(data.hasOwnProperty('seq') && (data.seq > bearing_cursor.seq)){
+		bearing_cursor.seq = data.seq;
+	}
 	if(data.add != null){
-		addBearing(data.add.key, data.add, true);
+		// Changes are batched by the server, so we may get a list of added bearings.
+		var _adds = Array.isArray(data.add) ? data.add : [data.add];
+		_adds.forEach(function (item, index){
+			// We may already have this bearing, from a resync which completed before this event arrived.
+			if(bearing_store.hasOwnProperty(item.key)){
+				return;
+			}
+			decodeRawDOA(item);
+			addBearing(item.key, item, true);
+		});
 	}
 }
 
 
 function bearingPlotUpdate(data){
 	setServerTime(data.server_timestamp);
+	decodeRawDOA(data);
+	if(!data.hasOwnProperty('raw_bearing_angles')){
+		return;
+	}
 	updateBearingPlot(data);
 }
 
 
+function removeBearingFixLayers(fix){
+	if(fix.hasOwnProperty('ellipse')){
+		fix.ellipse.remove();
+	}
+	if(fix.hasOwnProperty('marker')){
+		fix.marker.remove();
+	}
+}
+
+
+function drawBearingFix(source){
+	// (Re-)draw the triangulated fix for a bearing source, with its 95% error ellipse.
+	var _fix = bearing_fix_store[source];
+	removeBearingFixLayers(_fix);
+
+	var _center = L.latLng([_fix.lat, _fix.lon]);
+
+	// Scale the 1-sigma error ellipse to a 95% confidence ellipse.
+	var _major = _fix.error_major*2.4477;
+	var _minor = _fix.error_minor*2.4477;
+	var _ellipse = [];
+	for(var _angle = 0; _angle < 360; _angle += 10){
+		var _a = _angle*Math.PI/180.0;
+		var _along = _major*Math.cos(_a);
+		var _across = _minor*Math.sin(_a);
+		var _heading = _fix.error_orientation + Math.atan2(_across, _along)*180.0/Math.PI;
+		_ellipse.push(calculateDestination(_center, _heading, Math.sqrt(_along*_along + _across*_across)));
+	}
+
+	_fix.ellipse = L.polygon(_ellipse, {
+		color: bearing_color,
+		weight: 1,
+		opacity: bearing_max_opacity,
+		fillOpacity: 0.1
+	});
+
+	_fix.marker = L.circleMarker(_center, {
+		radius: 6,
+		color: bearing_color,
+		weight: 2,
+		fillOpacity: 0
+	}).bindTooltip(source + " estimate (" + _fix.bearings + " bearings, ±" + _major.toFixed(0) + "m)");
+
+	var _source_selector = document.getElementById("bearing_source_" + source);
+	if ( (document.getElementById("bearingsEnabled").checked == true) && ((_source_selector == null) || _source_selector.checked) ){
+		_fix.ellipse.addTo(map);
+		_fix.marker.addTo(map);
+	}
+}
+
+
+function drawBearingHeatmap(source){
+	// Show or hide the heatmap for a bearing source, based on user options.
+	var _heatmap = bearing_heatmap_store[source];
+	var _source_selector = document.getElementById("bearing_source_" + source);
+
+	if ( (document.getElementById("bearingsEnabled").checked == true) && (document.getElementById("bearingHeatmapEnabled").checked == true) && ((_source_selector == null) || _source_selector.checked) ){
+		_heatmap.overlay.addTo(map);
+	} else {
+		_heatmap.overlay.remove();
+	}
+}
+
+
+function bearingHeatmapUpdate(data){
+	// Handle an updated likelihood heatmap from the server.
+	if(data.image == null){
+		if(bearing_heatmap_store.hasOwnProperty(data.source)){
+			bearing_heatmap_store[data.source].overlay.remove();
+			delete bearing_heatmap_store[data.source];
+		}
+		return;
+	}
+
+	if(bearing_heatmap_store.hasOwnProperty(data.source)){
+		// Update the existing overlay in place.
+		bearing_heatmap_store[data.source].overlay.setUrl(data.image);
+		bearing_heatmap_store[data.source].overlay.setBounds(L.latLngBounds(data.bounds));
+	} else {
+		bearing_heatmap_store[data.source] = {
+			overlay: L.imageOverlay(data.image, data.bounds, {opacity: 0.7, interactive: false})
+		};
+	}
+
+	drawBearingHeatmap(data.source);
+}
+
+
+function bearingFixUpdate(data){
+	// Handle an updated triangulated fix from the server.
+	if(bearing_fix_store.hasOwnProperty(data.source)){
+		removeBearingFixLayers(bearing_fix_store[data.source]);
+		delete bearing_fix_store[data.source];
+	}
+
+	if(data.valid == true){
+		bearing_fix_store[data.source] = data;
+		drawBearingFix(data.source);
+	}
+}
+
+
 function toggleBearingsEnabled(){
 	// Enable-disable bearing only mode, which hides the summary and telemetry displays
 
@@ -5,9 +5,44 @@
 //   Released under GNU GPL v3 or later
 //
 
+function decodePolyline(encoded){
+    // Decode a path sent as an encoded polyline (see chasemapper/predictionpath.py) into a list of [lat, lon, alt] points.
+    // Each point is encoded as zig-zag varint deltas of latitude and longitude (5 decimal places) and altitude (metres).
+    var _precision = [1e5, 1e5, 1];
+    var _point = [0, 0, 0];
+    var _path = [];
+    var _dim = 0;
+    var _value = 0;
+    var _shift = 0;
+
+    for (var i = 0; i < encoded.length; i++){
+        var _b = encoded.charCodeAt(i) - 63;
+        // Use multiplication rather than bit-shifts, as the intermediate values can exceed 32 bits.
+        _value += (_b & 0x1f) * Math.pow(2, _shift);
+        _shift += 5;
+        if (_b < 0x20){
+            _point[_dim] += (_value % 2) ? -(_value + 1) / 2 : _value / 2;
+            _value = 0;
+            _shift = 0;
+            _dim += 1;
+            if (_dim == 3){
+                _path.push([_point[0] / _precision[0], _point[1] / _precision[1], _point[2] / _precision[2]]);
+                _dim = 0;
+            }
+        }
+    }
+    return _path;
+}
+
 function handlePrediction(data){
     // We expect the fields: callsign, pred_path, pred_landing, and abort_path and abort_landing, if abort predictions are enabled.
+    // If path_encoding is 'polyline', pred_path and abort_path are encoded polylines.
     var _callsign = data.callsign;
+
+    if (data.path_encoding == 'polyline'){
+        data.pred_path = decodePolyline(data.pred_path);
+        data.abort_path = decodePolyline(data.abort_path);
+    }
     var _pred_path = data.pred_path;
     var _pred_landing = data.pred_landing;
 
@@ -88,4 +123,39 @@ function handlePrediction(data){
     //if (balloon_currently_following === data.callsign){
     //    router.setWaypoints([L.latLng(chase_car_position.latest_data[0],chase_car_position.latest_data[1]), L.latLng(data.pred_landing[0], data.pred_landing[1])]);
     //}
-}
\ No newline at end of file
+}
+function handleEnsemble(data){
+    // Draw the landing uncertainty of an ensemble prediction.
+    // We expect the fields: callsign, mean, ellipse (with a polygon field), and contours (a list of percentile/polygon objects).
+    var _callsign = data.callsign;
+
+    if (balloon_positions.hasOwnProperty(_callsign) == false){
+        return;
+    }
+
+    var _colour = balloon_positions[_callsign].colour;
+
+    if (balloon_positions[_callsign].ensemble == null){
+        balloon_positions[_callsign].ensemble = L.layerGroup();
+        if (balloon_positions[_callsign].visible == true){
+            balloon_positions[_callsign].ensemble.addTo(map);
+        }
+    }else{
+        balloon_positions[_callsign].ensemble.clearLayers();
+    }
+
+    // Percentile contours, with the innermost contour shaded the most.
+    for (var i = 0; i < data.contours.length; i++){
+        var _contour = data.contours[i];
+        L.polygon(_contour.polygon, {color:_colour, weight:1, opacity:prediction_opacity, fillOpacity:0.15})
+            .bindTooltip(_callsign + " " + _contour.percentile + "% Landing Contour", {permanent:false, direction:'right'})
+            .addTo(balloon_positions[_callsign].ensemble);
+    }
+
+    // Covariance ellipse
+    var _ellipse_text = _callsign + " " + (data.ellipse.confidence*100).toFixed(0) + "% Landing Ellipse ("
+        + (data.ellipse.semi_major/1000).toFixed(1) + " x " + (data.ellipse.semi_minor/1000).toFixed(1) + " km)";
+    L.polygon(data.ellipse.polygon, {color:_colour, weight:2, dashArray:'5, 5', opacity:prediction_opacity, fill:false})
+        .bindTooltip(_ellipse_text, {permanent:false, direction:'right'})
+        .addTo(balloon_positions[_callsign].ensemble);
+}